@@ -0,0 +1,39 @@
+import pytest
+
+pytest.importorskip('agentopy')
+
+from frankenstein.components.environment.trading.data_provider import DataProvider
+from frankenstein.components.environment.trading.broker import Broker
+from benchmarks.synthetic import STEPS, replay_range
+
+
+@pytest.fixture
+def data_provider(ticks):
+    data_provider = DataProvider()
+    data_provider.load_ticks_store(ticks, 'EURUSD')
+    data_provider.reset(*replay_range(ticks), 'M1')
+    return data_provider
+
+
+@pytest.mark.benchmark(group='Broker.tick')
+@pytest.mark.parametrize('open_position', [False, True], ids=['flat', 'open'])
+def test_tick(benchmark, data_provider, loop, open_position):
+    """Steps the replay and marks the account to market, STEPS steps per round"""
+    broker = Broker(data_provider)
+    loop.run_until_complete(broker.is_on(is_on=True, caller_context=None))
+    data_provider.step()
+    if open_position:
+        # limits far enough to keep the position open for the whole benchmark
+        result = loop.run_until_complete(broker.open(
+            symbol='EURUSD', price=0, volume=0.01, is_long=True, take_profit_pips=10**6, stop_loss_pips=10**6,
+            comment='', caller_context=None))
+        assert result.success
+    start = data_provider.get_time()
+
+    async def replay():
+        data_provider.seek(start)
+        for _ in range(STEPS):
+            data_provider.step()
+            await broker.tick()
+
+    benchmark(lambda: loop.run_until_complete(replay()))
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('agentopy')
+
+from frankenstein.components.environment.trading.data_provider import DataProvider
+from benchmarks.synthetic import STEPS, replay_range
+
+
+@pytest.fixture
+def data_provider(ticks):
+    data_provider = DataProvider()
+    data_provider.load_ticks_store(ticks, 'EURUSD')
+    data_provider.reset(*replay_range(ticks), 'M1')
+    return data_provider
+
+
+@pytest.mark.benchmark(group='DataProvider.price')
+def test_price_replay(benchmark, data_provider):
+    """The price at the current step of the replay, STEPS steps per round"""
+    start = data_provider.get_time()
+
+    def replay():
+        data_provider.seek(start)
+        for _ in range(STEPS):
+            data_provider.step()
+            data_provider.price('EURUSD', 'bid', data_provider.get_time())
+
+    benchmark(replay)
+
+
+@pytest.mark.benchmark(group='DataProvider.price')
+def test_price_random_timestamps(benchmark, data_provider, ticks):
+    """The price at arbitrary timestamps, the binary search path, STEPS lookups per round"""
+    rng = np.random.default_rng(0)
+    timestamps = [pd.Timestamp(ts, tz='UTC').to_pydatetime() for ts in rng.integers(ticks.start() // 1000, ticks.end() // 1000, STEPS) * 1000]
+
+    def lookup():
+        for timestamp in timestamps:
+            data_provider.price('EURUSD', 'bid', timestamp)
+
+    benchmark(lookup)
+
+
+@pytest.mark.benchmark(group='DataProvider.bars')
+def test_bars_uncached(benchmark, data_provider, ticks):
+    """Aggregates all the M10 bars of the symbol, the cache is cleared before every round"""
+    bars = benchmark.pedantic(
+        data_provider.bars, args=('EURUSD', 'M10'), setup=lambda: data_provider.load_ticks_store(ticks, 'EURUSD'), rounds=5)
+    assert len(bars) > 0
+
+
+@pytest.mark.benchmark(group='DataProvider.bars')
+def test_bars_window(benchmark, data_provider, ticks):
+    """The last 100 M10 bars before a timestamp in the middle of the data, from the cache"""
+    timestamp = pd.Timestamp((ticks.start() + ticks.end()) // 2, tz='UTC').to_pydatetime()
+    data_provider.bars('EURUSD', 'M10')
+    bars = benchmark(data_provider.bars, 'EURUSD', 'M10', timestamp, 100)
+    assert 0 < len(bars) <= 100
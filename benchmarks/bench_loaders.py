@@ -0,0 +1,23 @@
+import pytest
+
+from frankenstein.lib.trading.utils import aggregate_prices, load_mt5_bars_csv, load_mt5_ticks_csv
+
+
+@pytest.mark.benchmark(group='load_mt5_ticks_csv')
+def test_load_mt5_ticks_csv(benchmark, ticks_csv):
+    df = benchmark.pedantic(load_mt5_ticks_csv, args=(ticks_csv,), rounds=3)
+    assert len(df) > 0
+
+
+@pytest.mark.benchmark(group='load_mt5_bars_csv')
+def test_load_mt5_bars_csv(benchmark, bars_csv, rows):
+    df = benchmark.pedantic(load_mt5_bars_csv, args=(bars_csv,), rounds=3)
+    assert len(df) == rows
+
+
+@pytest.mark.benchmark(group='aggregate_prices')
+@pytest.mark.parametrize('period', ['M1', 'M10', 'H1'])
+def test_aggregate_prices(benchmark, ticks, period):
+    df = ticks.to_dataframe()
+    bars = benchmark.pedantic(aggregate_prices, args=(df, period), rounds=5)
+    assert len(bars) > 0
@@ -0,0 +1,60 @@
+import pytest
+
+pytest.importorskip('agentopy')
+
+from frankenstein.components.environment.trading.data_provider import DataProvider
+from frankenstein.components.environment.trading.signal_provider import SignalProvider
+from benchmarks.synthetic import STEPS, replay_range
+
+PARAMS = dict(
+    bands_enabled=True,
+    bands_timeframe='M10',
+    bands_window=7,
+    bands_dev=2,
+    rsi_enabled=True,
+    rsi_timeframe='M10',
+    rsi_period=13,
+    stochastic_enabled=True,
+    stochastic_timeframe='M10',
+    stochastic_smooth=3,
+    stochastic_period=14,
+)
+
+
+@pytest.fixture
+def data_provider(ticks):
+    data_provider = DataProvider()
+    data_provider.load_ticks_store(ticks, 'EURUSD')
+    data_provider.reset(*replay_range(ticks), 'M1')
+    return data_provider
+
+
+@pytest.mark.benchmark(group='SignalProvider._prepare')
+def test_prepare(benchmark, data_provider, ticks):
+    """Builds the indicator tables of the whole data, the bars are aggregated again every round"""
+    signal_provider = SignalProvider(data_provider, 'EURUSD')
+    benchmark.pedantic(
+        signal_provider._prepare, kwargs=PARAMS, setup=lambda: data_provider.load_ticks_store(ticks, 'EURUSD'), rounds=5)
+
+
+@pytest.mark.benchmark(group='SignalProvider.tick')
+@pytest.mark.parametrize('precomputed', [False, True], ids=['streamed', 'precomputed'])
+def test_tick(benchmark, data_provider, loop, precomputed):
+    """Steps the replay and ticks the signal provider, STEPS steps per round, from its indicator tables or its precomputed series"""
+    signal_provider = SignalProvider(data_provider, 'EURUSD')
+    signal_provider._prepare(**PARAMS)
+    if precomputed:
+        assert loop.run_until_complete(signal_provider.precompute(caller_context=None)).success
+    start = data_provider.get_time()
+
+    async def replay():
+        data_provider.seek(start)
+        directions = 0
+        for _ in range(STEPS):
+            data_provider.step()
+            await signal_provider.tick()
+            directions += signal_provider._last_direction is not None
+        return directions
+
+    # a round that never gets past the indicator warm-up would only time the early returns
+    assert benchmark(lambda: loop.run_until_complete(replay())) > 0
@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('agentopy')
+
+from frankenstein.components.environment.trading.data_provider import DataProvider
+from frankenstein.components.environment.trading.ml.environement import TradingEnv
+from benchmarks.synthetic import STEPS, replay_range
+
+
+@pytest.mark.benchmark(group='TradingEnv.step')
+def test_step(benchmark, ticks):
+    """Random actions, STEPS steps per round, the episodes that end are reset within the round"""
+    data_provider = DataProvider()
+    data_provider.load_ticks_store(ticks, 'EURUSD')
+    env = TradingEnv(data_provider, *replay_range(ticks), 'M1', 10, episode_length=STEPS)
+    env.reset(seed=0)
+    actions = np.random.default_rng(0).integers(0, 4, STEPS)
+
+    def steps():
+        for action in actions:
+            _, _, terminated, truncated, _ = env.step(action)
+            if terminated or truncated:
+                env.reset()
+
+    benchmark(steps)
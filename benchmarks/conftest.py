@@ -0,0 +1,52 @@
+"""
+Benchmarks of the trading hot paths on synthetic data, run with pytest-benchmark:
+
+    python -m pytest benchmarks -o python_files='bench_*.py' --benchmark-autosave
+
+Runs are saved as json under .benchmarks/ with the commit they ran on, --benchmark-compare=<run> compares with a saved one
+and `pytest-benchmark compare` tabulates any of them.
+BENCH_ROWS is the comma separated list of dataset sizes, 100000,1000000,10000000 by default.
+"""
+import asyncio as aio
+import os
+import pytest
+
+from benchmarks.synthetic import synthetic_ticks, synthetic_bars, write_mt5_ticks_csv, write_mt5_bars_csv
+
+ROWS = [int(rows) for rows in os.environ.get('BENCH_ROWS', '100000,1000000,10000000').split(',')]
+
+
+@pytest.fixture(scope='session', params=ROWS, ids=lambda rows: f'{rows:.0e}')
+def rows(request):
+    return request.param
+
+
+@pytest.fixture(scope='session')
+def ticks(rows):
+    return synthetic_ticks(rows)
+
+
+@pytest.fixture(scope='session')
+def bars(rows):
+    return synthetic_bars(rows)
+
+
+@pytest.fixture(scope='session')
+def ticks_csv(ticks, rows, tmp_path_factory):
+    filename = tmp_path_factory.mktemp('csv') / f'ticks_{rows}.csv'
+    write_mt5_ticks_csv(ticks, filename)
+    return str(filename)
+
+
+@pytest.fixture(scope='session')
+def bars_csv(bars, rows, tmp_path_factory):
+    filename = tmp_path_factory.mktemp('csv') / f'bars_{rows}.csv'
+    write_mt5_bars_csv(bars, filename)
+    return str(filename)
+
+
+@pytest.fixture
+def loop():
+    loop = aio.new_event_loop()
+    yield loop
+    loop.close()
@@ -0,0 +1,75 @@
+from datetime import datetime, UTC
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from frankenstein.lib.trading.tick_store import TickStore
+
+# a monday, so the first replay steps are trading days
+START = pd.Timestamp('2024-01-01', tz='UTC')
+# steps replayed by every round of the per-step benchmarks
+STEPS = 1000
+
+
+def synthetic_ticks(rows: int, seed: int = 0) -> TickStore:
+    """Random walk EURUSD-like ticks, one every 1 to 999 milliseconds"""
+    rng = np.random.default_rng(seed)
+    timestamps = START.value + np.cumsum(rng.integers(1, 1000, rows)) * 10**6
+    bid = 1.1 + np.cumsum(rng.normal(0, 2e-5, rows))
+    ask = bid + rng.integers(1, 20, rows) * 1e-5
+    return TickStore(timestamps.astype(np.int64), ask, bid, rng.integers(0, 10, rows).astype(np.float64))
+
+
+def synthetic_bars(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Random walk M1 bars, one every minute, with the columns of load_mt5_bars_csv"""
+    rng = np.random.default_rng(seed)
+    index = pd.DatetimeIndex(START + pd.to_timedelta(np.arange(rows), unit='min'), name='index')
+    close = 1.1 + np.cumsum(rng.normal(0, 1e-4, rows))
+    spread = rng.integers(1, 20, rows)
+    return pd.DataFrame({
+        'timestamp': index,
+        'ask': close + spread * 1e-5,
+        'bid': close,
+        'volume': rng.integers(1, 500, rows),
+    }, index=index)
+
+
+def _mt5_date_time(timestamps: np.ndarray, unit: str) -> tuple:
+    text = pd.Series(np.datetime_as_string(timestamps.view('datetime64[ns]').astype(f'datetime64[{unit}]')))
+    return text.str[:10].str.replace('-', '.', regex=False), text.str[11:]
+
+
+def write_mt5_ticks_csv(store: TickStore, filename: str | Path) -> None:
+    """Writes the store as an MT5 ticks csv export"""
+    date, time = _mt5_date_time(store.timestamps, 'ms')
+    pd.DataFrame({
+        '<DATE>': date,
+        '<TIME>': time,
+        '<BID>': store.bid,
+        '<ASK>': store.ask,
+        '<LAST>': np.nan,
+        '<VOLUME>': store.volume,
+        '<FLAGS>': 6,
+    }).to_csv(filename, sep='\t', index=False, float_format='%.5f')
+
+
+def write_mt5_bars_csv(bars: pd.DataFrame, filename: str | Path) -> None:
+    """Writes the bars as an MT5 bars csv export"""
+    date, time = _mt5_date_time(pd.DatetimeIndex(bars.index).as_unit('ns').asi8, 's')
+    close = bars['bid'].to_numpy()
+    pd.DataFrame({
+        '<DATE>': date,
+        '<TIME>': time,
+        '<OPEN>': close,
+        '<HIGH>': close,
+        '<LOW>': close,
+        '<CLOSE>': close,
+        '<TICKVOL>': bars['volume'].to_numpy(),
+        '<VOL>': 0,
+        '<SPREAD>': np.rint((bars['ask'].to_numpy() - close) * 1e5).astype(np.int64),
+    }).to_csv(filename, sep='\t', index=False, float_format='%.5f')
+
+
+def replay_range(store: TickStore) -> tuple:
+    """Returns the first and the last second of the store in the format DataProvider.reset takes"""
+    return tuple(datetime.strftime(datetime.fromtimestamp(ts // 10**9, UTC), "%Y-%m-%dT%H:%M:%S.0") for ts in (store.start(), store.end()))
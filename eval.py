@@ -1,22 +1,28 @@
-from train import configure, evaluate_policy, model, eval_env, env
+import argparse
 
-stats = {}
+from frankenstein.components.environment.trading.ml.evaluation import CsvEnvFactory, run_evaluation, write_report
 
-def callback(locals, globals) -> bool:
-    global stats
-    reward = locals["reward"]
-    observation = locals["observations"]
-    env = locals["env"]
-    action = locals["actions"][0]
-    stats[action] = stats.get(action, 0) + 1
-    env_stats = env.env_method("get_stats")
-    print(f"Action: {action}, Reward: {round(reward, 2)}, Stats: {env_stats}")
-    
 if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description="Evaluates trained checkpoints on held-out datasets in parallel processes")
+    argparser.add_argument("--checkpoints", nargs="+", default=["dqn_policy"], help="Paths to the saved PPO models")
+    argparser.add_argument("--datasets", nargs="+", default=["datasets/EURUSD_SB_M1_201901020000_201905300000.csv"],
+                           help="Paths to the MT5 bars csv exports to evaluate on")
+    argparser.add_argument("--freq", default="M5", help="Replay frequency")
+    argparser.add_argument("--n-rolling-observations", type=int, default=10, help="Length of the observation window")
+    argparser.add_argument("--stochastic", action="store_true", help="Sample the actions instead of taking the most likely one")
+    argparser.add_argument("--cache-dir", default=".market_data", help="Directory of the archives the datasets are converted to")
+    argparser.add_argument("--workers", type=int, help="Number of processes, all cores by default")
+    argparser.add_argument("--output", default="evaluation.json", help="Path to the report")
+    args = argparser.parse_args()
 
-    model.load("dqn_policy")
-    new_logger = configure(None, ["stdout", "log", "csv"])
-    model.set_logger(new_logger)
-
-    print(evaluate_policy(model, eval_env, n_eval_episodes=1, return_episode_rewards=True, callback=callback, render=True, deterministic=False))
-    print(stats)
+    results = run_evaluation(
+        args.checkpoints,
+        args.datasets,
+        CsvEnvFactory(args.freq, args.n_rolling_observations, args.cache_dir),
+        deterministic=not args.stochastic,
+        max_workers=args.workers,
+    )
+    write_report(results, args.output)
+    for result in results:
+        print(f"{result['checkpoint']} on {result['dataset']}: equity {result['final_equity']:.2f}, "
+              f"max drawdown {result['max_drawdown']:.2f}, mean reward {result['mean_reward']:.4f}")
@@ -1,8 +1,9 @@
 import sys
 import logging
 import asyncio as aio
-from typing import Dict, List
+from typing import Dict, List, Optional
 import yaml
+from datetime import datetime, UTC
 
 from agentopy import IAgentComponent, IEnvironmentComponent, WithActionSpaceMixin, Action, EntityInfo, Agent, Environment, IAgent, IEnvironment, ActionResult, IState, State
 
@@ -10,6 +11,12 @@ from frankenstein.lib.language.gemini_language_models import GeminiAIChatModel
 from frankenstein.lib.language.openai_language_models import OpenAIChatModel
 from frankenstein.lib.language.embedding_models import OpenAIEmbeddingModel, SentenceTransformerEmbeddingModel
 from frankenstein.lib.trading.utils import load_mt5_ticks_csv, load_mt5_bars_csv
+from frankenstein.lib.trading.dt_store import to_dt_frame
+from frankenstein.lib.trading.archive import load_archive, archive_range
+from frankenstein.lib.trading.feeds import WebsocketTickFeed
+from frankenstein.lib.trading.tick_store import TickStore, to_ns, to_utc
+from frankenstein.lib.trading.market_data import MarketDataService
+from frankenstein.lib.trading.latency import LatencyRecorder, dump_path
 from frankenstein.policies.llm_policy import LLMPolicy
 from frankenstein.policies.human_controlled_policy import HumanControlledPolicy
 from frankenstein.policies.trading_policy import TradingPolicy
@@ -25,6 +32,7 @@ from frankenstein.components.environment.trading.data_provider import DataProvid
 from frankenstein.components.environment.trading.signal_provider import SignalProvider
 from frankenstein.components.environment.trading.config_provider import ConfigProvider
 from frankenstein.components.environment.trading.broker import Broker
+from frankenstein.components.environment.trading.fast_forward import FastForward
 from frankenstein.lib.networking.communication import WebsocketMessagingJsonServer
 from frankenstein.lib.language.protocols import ILanguageModel
 
@@ -41,13 +49,18 @@ logger = logging.getLogger('main')
 class Management(WithActionSpaceMixin, IAgentComponent):
     """Implements a creativity environment component"""
 
-    def __init__(self):
-        """Initializes the creativity environment component"""
+    def __init__(self, latency_dir: str = 'latency'):
+        """
+        Initializes the creativity environment component.
+        The latency histograms are only dumped to files in latency_dir, whatever path a caller asks for.
+        """
         super().__init__()
         
+        self._latency_dir = latency_dir
         self._agents = {}
         self._environments = {}
         self._next_agent_id = 1
+        self._market_data = MarketDataService()
         
         self.action_space.register_actions(
             [
@@ -58,14 +71,17 @@ class Management(WithActionSpaceMixin, IAgentComponent):
                 Action(
                     "launch", "launch a new agent or environment", self.launch, self.info()),
                 Action("kill_agent", "kill an agent", self.kill_agent, self.info()),
-                Action("destroy_environment", "kill an environment", self.destroy_environment, self.info())
+                Action("destroy_environment", "kill an environment", self.destroy_environment, self.info()),
+                Action("latency", "get the stage latencies of an environment.", self.latency, self.info()),
+                Action("dump_latency", "write the stage latency histograms of an environment to a file", self.dump_latency, self.info())
             ])
     
     def __del__(self):
         for _, agent in self._agents.items():
             agent['process'].cancel()
         for _, environment in self._environments.items():
-            environment['process'].cancel()
+            if environment['process'] is not None:
+                environment['process'].cancel()
     
     async def agents(self, *, caller_context: IState) -> ActionResult:
         """Returns the list of running agents"""
@@ -90,9 +106,34 @@ class Management(WithActionSpaceMixin, IAgentComponent):
                 'config_yaml': yaml.safe_dump(environment['config']),
                 'config': environment['config']
             }
+            if 'fast_forward' in environment:
+                environments[environment_id]['fast_forward_result'] = environment.get('fast_forward_result')
         
         return ActionResult(value=environments, success=True)
 
+    async def latency(self, *, environment_id: str, caller_context: IState) -> ActionResult:
+        """Returns the p50, p99 and p999 of every instrumented stage of the environment in microseconds"""
+        environment = self._environments.get(environment_id)
+        if environment is None:
+            return ActionResult(value="No such environment", success=False)
+        if environment['latency'] is None:
+            return ActionResult(value="Latency is not enabled", success=False)
+        return ActionResult(value=environment['latency'].summary(), success=True)
+    
+    async def dump_latency(self, *, environment_id: str, path: str, caller_context: IState) -> ActionResult:
+        """Writes the latency histograms of the environment to a json file, path is relative to the latency directory"""
+        environment = self._environments.get(environment_id)
+        if environment is None:
+            return ActionResult(value="No such environment", success=False)
+        if environment['latency'] is None:
+            return ActionResult(value="Latency is not enabled", success=False)
+        try:
+            path = dump_path(self._latency_dir, path)
+        except ValueError as e:
+            return ActionResult(value=str(e), success=False)
+        environment['latency'].dump(path)
+        return ActionResult(value=str(path), success=True)
+
     async def launch(self, *, config_str: str, caller_context: IState) -> ActionResult:
         """launches an agent or environment"""
         
@@ -111,8 +152,26 @@ class Management(WithActionSpaceMixin, IAgentComponent):
             logger.info(f"Exception {err}")
             
         for environment_config in config.get("environments", []):
-            env = self.create_environment(environment_config)
+            # the stages of the environment and of the policies acting on it are only timed when asked for
+            latency = LatencyRecorder() if environment_config.get("latency", False) else None
+            components = self.create_environment_components(environment_config, latency)
+            env = Environment(components)
             env_id = environment_config.get("id")
+            
+            # a fast-forward environment is not ticked on its own, the agent acting on it drives its components
+            replay = self.fast_forward_replay(environment_config, components)
+            if replay is not None:
+                self._environments[env_id] = {
+                    'process': None,
+                    'env_tasks': [],
+                    'config': environment_config,
+                    'env': env,
+                    'components': components,
+                    'latency': latency,
+                    'fast_forward': replay
+                }
+                continue
+            
             env_tasks = env.start(sync=environment_config.get("sync", False))
             all_tasks.extend(env_tasks)
             task = aio.create_task(aio.wait(env_tasks, return_when=aio.FIRST_EXCEPTION))
@@ -122,13 +181,37 @@ class Management(WithActionSpaceMixin, IAgentComponent):
                 'process': task,
                 'env_tasks': env_tasks,
                 'config': environment_config,
-                'env': env
+                'env': env,
+                'components': components,
+                'latency': latency
             }
             
         for agent_config in config.get("agents", []):
-            agent = self.create_agent(agent_config)
             agent_id = str(self._next_agent_id)
             self._next_agent_id += 1
+            
+            environment = self._environments.get(agent_config.get("environment_id"))
+            if environment is not None and environment.get('fast_forward') is not None:
+                replay = environment['fast_forward']
+                state = State()
+                state.set_nested_item("agent", agent_config.get("state", {}))
+                fast_forward = FastForward(environment['components'], self.create_policy(agent_config, environment['latency']), state)
+                agent_tasks = [aio.create_task(self.run_fast_forward(fast_forward, replay, environment))]
+                all_tasks.extend(agent_tasks)
+                task = aio.create_task(aio.wait(agent_tasks, return_when=aio.FIRST_EXCEPTION))
+                task.add_done_callback(print_result)
+                environment['process'] = task
+                environment['env_tasks'] = agent_tasks
+                
+                self._agents[agent_id] = {
+                    'process': task,
+                    'agent_tasks': agent_tasks,
+                    'config': agent_config,
+                    'agent': None
+                }
+                continue
+            
+            agent = self.create_agent(agent_config)
             agent_tasks = agent.start()
             all_tasks.extend(agent_tasks)
             task = aio.create_task(aio.wait(agent_tasks, return_when=aio.FIRST_EXCEPTION))
@@ -177,16 +260,40 @@ class Management(WithActionSpaceMixin, IAgentComponent):
         
         return ActionResult(value="Environment killed", success=True)
     
+    def fast_forward_replay(self, environment_config: Dict, components: List[IEnvironmentComponent]) -> Optional[Dict]:
+        """
+        Returns the replay fast forward drives the environment over, None when the environment runs its own tick loop.
+        Only an environment with a fast_forward mapping is fast-forwarded: its start, end and freq, the whole data at M1
+        by default, the account the broker is prepared with, broker_on, true by default, and the signal and config
+        parameters set before the replay.
+        """
+        replay = environment_config.get("fast_forward")
+        if replay is None:
+            return None
+        assert FastForward.drives(components), "Fast forward needs exactly one DataProvider and one Broker"
+        assert all((c or {}).get("params", {}).get("feed") is None for c in environment_config.get("components", {}).values()), \
+            "Fast forward only drives replays, not feeds"
+        return replay
+    
+    async def run_fast_forward(self, fast_forward: FastForward, replay: Dict, environment: Dict) -> Dict:
+        """Prepares and runs a fast forward replay, its result is kept with the environment, which outlives it"""
+        await fast_forward.prepare(account=replay.get("account"), broker_on=replay.get("broker_on", True),
+                                   signal=replay.get("signal"), config=replay.get("config"))
+        result = await fast_forward.run(replay.get("start"), replay.get("end"), replay.get("freq", "M1"))
+        environment['fast_forward_result'] = result
+        return result
+
     def create_environment(self, config: Dict) -> IEnvironment:
+        return Environment(self.create_environment_components(config))
+    
+    def create_environment_components(self, config: Dict, latency: Optional[LatencyRecorder] = None) -> List[IEnvironmentComponent]:
             
         environment_components = []
         
         for component_name, component_config in config.get("components", {}).items():
-            environment_components.append(self.create_component(component_name, component_config, environment_components=environment_components))
+            environment_components.append(self.create_component(component_name, component_config, environment_components=environment_components, latency=latency))
 
-        env = Environment(environment_components)
-
-        return env
+        return environment_components
     
     def create_agent(self, config: Dict) -> IAgent:
         
@@ -195,14 +302,14 @@ class Management(WithActionSpaceMixin, IAgentComponent):
         for component_name, component_config in config.get("components", {}).items():
             agent_components.append(self.create_component(component_name, component_config, agent_components=agent_components))
         
-        policy = self.create_policy(config)
-        
         env_id = config.get("environment_id")
         
         if env_id not in self._environments:
             env = Environment([])
+            policy = self.create_policy(config)
         else:
             env = self._environments[env_id]['env']
+            policy = self.create_policy(config, self._environments[env_id]['latency'])
         
         agent = Agent(policy, env, agent_components, heartrate_ms=config.get("heartrate_ms", 1000))
         
@@ -213,7 +320,8 @@ class Management(WithActionSpaceMixin, IAgentComponent):
         return agent
         
 
-    def create_component(self, component_name: str, component_config: Dict, agent_components: List[IAgentComponent] = [], environment_components: List[IEnvironmentComponent] = []):
+    def create_component(self, component_name: str, component_config: Dict, agent_components: List[IAgentComponent] = [], environment_components: List[IEnvironmentComponent] = [],
+                         latency: Optional[LatencyRecorder] = None):
         """
         Creates a component based on the configuration
         """
@@ -230,7 +338,7 @@ class Management(WithActionSpaceMixin, IAgentComponent):
             except Exception as e:
                 raise Exception(f"Failed to create email component: {e}")
         if component_name == "Management":
-            return Management()
+            return Management(self._latency_dir)
         if component_name == "Memory":
             assert component_config.get("embedding_model") is not None, "Embedding model is not set"
             embedding_model = self.create_embedding_model(component_config["embedding_model"])
@@ -264,28 +372,11 @@ class Management(WithActionSpaceMixin, IAgentComponent):
             return RemoteControl(messaging, subscription_update_rate_ms=subscription_update_rate_ms)
         
         if component_name == "DataProvider":
-            filename = component_config.get("params", {}).get("filename")
-            assert filename is not None, "Dataset file is not set"
-            bars = component_config.get("params", {}).get("bars", False)
-            assert bars is not None, "Bars is not set"
-            if bars:
-                df = load_mt5_bars_csv(filename)
-            else:
-                df = load_mt5_ticks_csv(filename)
-            logger.info(f"Loaded {len(df)} rows from {filename}")
-            symbol = component_config.get("params", {}).get("symbol")
-            assert symbol is not None, "Symbol is not set"
-            
-            try:
-                start, end = df['timestamp'].iloc[0], df['timestamp'].iloc[-1]
-            except:
-                start, end = df['timestamp'][0], df['timestamp'][-1]
-            
-            start = start.replace(microsecond=0)
-            end = end.replace(microsecond=0)
-
-            data_provider = DataProvider(time_range=(start, end))
-            data_provider.load_ticks_pd_dataframe(df, symbol)
+            data_provider = self.create_data_provider(component_config, latency)
+            feed = component_config.get("params", {}).get("feed")
+            if feed is not None:
+                assert feed.get("uri") is not None, "Feed uri is not set"
+                data_provider.start_feed(WebsocketTickFeed(feed["uri"]))
             return data_provider
         
         if component_name == "SignalProvider":
@@ -294,7 +385,7 @@ class Management(WithActionSpaceMixin, IAgentComponent):
             assert data_provider is not None, "Data provider is not set"
             symbol = component_config.get("params", {}).get("symbol")
             assert symbol is not None, "Symbol is not set"
-            return SignalProvider(data_provider, symbol)
+            return SignalProvider(data_provider, symbol, latency)
         
         if component_name == "ConfigProvider":
             return ConfigProvider()
@@ -303,11 +394,77 @@ class Management(WithActionSpaceMixin, IAgentComponent):
             data_provider = [c for c in environment_components if isinstance(c, DataProvider)]
             data_provider = data_provider[0] if len(data_provider) > 0 else None
             assert data_provider is not None, "Data provider is not set"
-            return Broker(data_provider)
+            intrabar_fills = component_config.get("params", {}).get("intrabar_fills", False)
+            return Broker(data_provider, intrabar_fills=intrabar_fills, latency=latency)
         
         raise Exception(f"Component {component_name} is not supported")
 
-    def create_policy(self, config: Dict):
+    def create_data_provider(self, component_config: Dict, latency: Optional[LatencyRecorder] = None) -> DataProvider:
+        """
+        Creates a data provider of the archive or the csv file in the configuration,
+        an empty one when its ticks only come from a feed
+        """
+        symbol = component_config.get("params", {}).get("symbol")
+        assert symbol is not None, "Symbol is not set"
+        archive = component_config.get("params", {}).get("archive")
+        filename = component_config.get("params", {}).get("filename")
+        
+        if archive is None and filename is None and component_config.get("params", {}).get("feed") is not None:
+            data_provider = DataProvider(latency=latency)
+            data_provider.load_ticks_store(TickStore.empty(), symbol)
+            return data_provider
+        
+        if archive is not None:
+            store = load_archive(archive)
+            start, end = archive_range(archive)
+            logger.info(f"Mapped {len(store)} rows from {archive}")
+            
+            data_provider = DataProvider(time_range=(start, end), latency=latency)
+            data_provider.load_ticks_store(store, symbol)
+            return data_provider
+        
+        assert filename is not None, "Dataset file is not set"
+        bars = component_config.get("params", {}).get("bars", False)
+        assert bars is not None, "Bars is not set"
+        window = component_config.get("params", {}).get("window")
+        
+        # "pd", the default, replays read-only views of the dataset mapped once by the market data service.
+        # "dt" parses the csv into a private datatable frame for every DataProvider: nothing is shared between
+        # environments on the same dataset, each one holds a full copy, and it does not support window
+        backend = component_config.get("params", {}).get("backend", "pd")
+        assert backend in ["pd", "dt"], "Backend is not supported"
+        
+        if backend == "dt":
+            assert window is None, "Window is not supported by the dt backend"
+            df = load_mt5_bars_csv(filename) if bars else load_mt5_ticks_csv(filename)
+            logger.info(f"Loaded a private copy of {len(df)} rows from {filename}")
+            
+            try:
+                start, end = df['timestamp'].iloc[0], df['timestamp'].iloc[-1]
+            except:
+                start, end = df['timestamp'][0], df['timestamp'][-1]
+            
+            data_provider = DataProvider(time_range=(start.replace(microsecond=0), end.replace(microsecond=0)), latency=latency)
+            data_provider.load_ticks_dt_dataframe(to_dt_frame(df), symbol)
+            return data_provider
+        
+        # every environment replays read-only views of the same mapped dataset
+        if window is not None:
+            assert len(window) == 2, "Window must be a [start, end] pair"
+            window_start, window_end = (to_utc(t) for t in window)
+            store = self._market_data.store(filename, bars, (to_ns(window_start), to_ns(window_end)))
+            assert len(store) > 0, f"No rows between {window_start} and {window_end} in {filename}"
+        else:
+            store = self._market_data.store(filename, bars)
+            assert len(store) > 0, f"No rows in {filename}"
+        logger.info(f"Shared {len(store)} rows from {filename}")
+        
+        start, end = (datetime.fromtimestamp(ts // 10**9, UTC) for ts in (store.start(), store.end()))
+        data_provider = DataProvider(time_range=(start, end), latency=latency)
+        data_provider.load_ticks_store(store, symbol)
+        return data_provider
+
+    def create_policy(self, config: Dict, latency: Optional[LatencyRecorder] = None):
         policy_name = config.get("policy", {}).get("implementation")
         assert policy_name in ["LLMPolicy", "TradingPolicy", "HumanControlledPolicy"], "Policy is not set or not supported"
         if policy_name == "LLMPolicy":
@@ -320,7 +477,7 @@ class Management(WithActionSpaceMixin, IAgentComponent):
         if policy_name == "HumanControlledPolicy":
             return HumanControlledPolicy()
         if policy_name == "TradingPolicy":
-            return TradingPolicy()
+            return TradingPolicy(latency)
         raise Exception("Policy is not set or not supported")
         
 
@@ -375,6 +532,9 @@ class Management(WithActionSpaceMixin, IAgentComponent):
         environments_to_remove = []
         
         for environment_id, environment_data in self._environments.items():
+            # a fast-forward environment is kept once its replay is over, so its components can still be read
+            if environment_data['process'] is None or 'fast_forward' in environment_data:
+                continue
             if environment_data['process'].done() or environment_data['process'].cancelled():
                 environments_to_remove.append(environment_id)
         for environment_id in environments_to_remove:
@@ -1,17 +1,31 @@
 
-from typing import Any, Dict
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from collections import deque
 import time
+import logging
+import numpy as np
 from agentopy import IEnvironmentComponent, IState, WithActionSpaceMixin, Action, EntityInfo, State, ActionResult
 from frankenstein.lib.trading.protocols import IDataProvider
+from frankenstein.lib.trading.ledger import TradeLedger
+from frankenstein.lib.trading.portfolio import PositionBook, conversion_candidates
+from frankenstein.lib.trading.fills import first_crossing
+from frankenstein.lib.trading.latency import LatencyRecorder, instrument
+from frankenstein.lib.trading.tick_store import to_ns
+
+logger = logging.getLogger(__name__)
 
 
 class Broker(WithActionSpaceMixin, IEnvironmentComponent):
-    def __init__(self, data_provider: IDataProvider) -> None:
+    def __init__(self, data_provider: IDataProvider, recent_trades: int = 20, intrabar_fills: bool = False,
+                 latency: Optional[LatencyRecorder] = None) -> None:
         super().__init__()
         self.start_time = time.time()
         
         self._status: Dict[str, Any] = dict()
         self._data_provider = data_provider
+        self._recent_trades = recent_trades
+        self._latency = latency
+        instrument(self, {'_tick': 'broker.tick', 'open': 'broker.open', 'close': 'broker.close'}, latency)
 
         self.action_space.register_actions(
             [
@@ -22,11 +36,16 @@ class Broker(WithActionSpaceMixin, IEnvironmentComponent):
                 Action('broker_is_live', "Sets the live mode", self.is_live, self.info()),
                 Action('broker_is_on', "Sets the broker on/off", self.is_on, self.info()),
                 Action('broker_prepare_account', "Sets the broker parameters", self.prepare_account, self.info()),
+                Action('broker_set_symbol', "Sets the point, the lot size and the quote to account currency rate of a symbol", self.set_symbol, self.info()),
+                Action('broker_intrabar_fills', "Sets the TP/SL fills from the ticks between steps on/off", self.set_intrabar_fills, self.info()),
+                Action('broker_export_trades', "Exports all the trades to a parquet file", self.export_trades, self.info()),
             ]
         )
         
         self._is_on = False
         self._is_live = False
+        self._intrabar_fills = intrabar_fills
+        self._last_tick_ns: int | None = None
         
         self._last_ask = {}
         self._last_bid = {}
@@ -34,18 +53,33 @@ class Broker(WithActionSpaceMixin, IEnvironmentComponent):
         self._leverage = 0
         self._point = 0
         self._lot_in_units = 0
+        self._account_currency = 'USD'
+        # by symbol, the point and the lot size overriding the account ones and an optional fixed quote to account rate
+        self._symbol_params: Dict[str, Dict[str, Optional[float]]] = {}
+        # by symbol, the symbol whose mid converts its quote currency to the account currency and whether to divide by it
+        self._conversion_pairs: Dict[str, Optional[Tuple[str, bool]]] = {}
+        # by list of symbols marked together, the symbols to quote and where their conversion rates come from
+        self._quote_plans: Dict[Tuple[str, ...], Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]] = {}
         self._equity = 0
         self._pl = 0
-        self._positions = {}
-        self._trades = []
+        self._book = PositionBook()
+        self._margin = 0.0
+        self._trades = TradeLedger()
         self._total_trade_count = 0
+        # wall clock nanoseconds from the ticks leaving the feed to the orders placed on them, the latest ones
+        self._order_latencies_ns: Deque[int] = deque(maxlen=1024)
         
         self.set_params()
         self.reset()
         
+        # streamed ticks are marked to market as they arrive
+        self._data_provider.on_ticks(self.on_ticks)
+        
 
     async def set_balance(self, *, balance: float, caller_context: IState) -> ActionResult:
         self._balance = int(balance)
+        # the free margin check runs on the equity, which must follow the new balance right away
+        self._refresh_account()
         return ActionResult(value="OK", success=True)
     
     async def is_live(self, *, is_live: bool, caller_context: IState) -> ActionResult:
@@ -56,63 +90,180 @@ class Broker(WithActionSpaceMixin, IEnvironmentComponent):
         self._is_on = is_on
         return ActionResult(value="OK", success=True)
     
-    async def prepare_account(self, *, balance: float, leverage: int, point: float, lot_in_units: int, caller_context: IState) -> ActionResult:
+    async def set_intrabar_fills(self, *, intrabar_fills: bool, caller_context: IState) -> ActionResult:
+        self._intrabar_fills = intrabar_fills
+        return ActionResult(value="OK", success=True)
+    
+    async def prepare_account(self, *, balance: float, leverage: int, point: float, lot_in_units: int, caller_context: IState,
+                              account_currency: str = 'USD') -> ActionResult:
         
+        self.set_params(balance, leverage, point, lot_in_units, account_currency)
         self.reset()
-        self.set_params(balance, leverage, point, lot_in_units)
         
         return ActionResult(value="OK", success=True)
     
+    async def set_symbol(self, *, symbol: str, point: float, lot_in_units: float, caller_context: IState,
+                         quote_to_account: Optional[float] = None) -> ActionResult:
+        """
+        Sets the point and the lot size of a symbol, the positions opened afterwards use them.
+        quote_to_account fixes the rate converting its quote currency to the account currency, otherwise it is taken
+        from the quotes of the symbol or of a cross with the account currency.
+        """
+        if point <= 0 or lot_in_units <= 0:
+            return ActionResult(value="Point and lot size must be positive", success=False)
+        self._symbol_params[symbol] = {'point': float(point), 'lot_in_units': float(lot_in_units), 'quote_to_account': quote_to_account}
+        self._quote_plans = {}
+        return ActionResult(value="OK", success=True)
+    
     def reset(self) -> None:
-        self._trades = []
-        self._positions = {}
+        self._trades = TradeLedger()
+        self._book = PositionBook()
+        self._margin = 0.0
+        self._last_tick_ns = None
         self._pl = 0
         self._equity = self._balance
         self._total_trade_count = 0
         self._last_ask = {}
         self._last_bid = {}
     
-    def set_params(self, balance: float = 10000, leverage: int = 30, point: float = 1, lot_in_units: int = 1) -> None:
+    def set_params(self, balance: float = 10000, leverage: int = 30, point: float = 1, lot_in_units: int = 1, account_currency: str = 'USD') -> None:
         self._balance = float(balance)
         self._leverage = float(leverage)
         self._point = float(point)
         self._lot_in_units = float(lot_in_units)
+        self._account_currency = account_currency
+        self._conversion_pairs = {}
+        self._quote_plans = {}
+    
+    def _refresh_account(self) -> None:
+        """Recomputes the equity and the margin of the open positions at their last marks"""
+        slots = self._book.open_slots()
+        self._equity = self._balance + float(np.sum(self._book.profits(slots)))
+        if len(slots) == 0:
+            self._margin = 0.0
+            return
+        ask, bid = self._data_provider.quotes([self._book.symbols[slot] for slot in slots], self._data_provider.get_time())
+        self._margin = self._book.margin(slots, ask, bid, self._leverage)
+    
+    def _symbol_point(self, symbol: str) -> Tuple[float, float]:
+        """Returns the point and the lot size of the symbol"""
+        params = self._symbol_params.get(symbol)
+        if params is None:
+            return self._point, self._lot_in_units
+        return params['point'], params['lot_in_units']
+    
+    def _conversion_pair(self, symbol: str) -> Optional[Tuple[str, bool]]:
+        """Returns the symbol whose mid converts the quote currency of the symbol to the account currency and whether to divide by it"""
+        if symbol not in self._conversion_pairs:
+            available = set(self._data_provider.symbols())
+            candidates = [candidate for candidate in conversion_candidates(symbol, self._account_currency)
+                          if candidate[0] == symbol or candidate[0] in available]
+            if not candidates and conversion_candidates(symbol, self._account_currency):
+                logger.warning(f"No quotes convert {symbol} to {self._account_currency}, its amounts are not converted")
+            self._conversion_pairs[symbol] = candidates[0] if candidates else None
+        return self._conversion_pairs[symbol]
+    
+    def _quote_plan(self, symbols: List[str]) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns the symbols to quote, the symbols followed by the crosses converting them, and by symbol the index of
+        the quote converting it, -1 if none does, whether to divide by it and its fixed rate, nan if it has none
+        """
+        key = tuple(symbols)
+        plan = self._quote_plans.get(key)
+        if plan is None:
+            quoted = list(symbols)
+            pairs, invert = np.full(len(symbols), -1, dtype=np.int64), np.zeros(len(symbols), dtype=np.bool_)
+            fixed = np.full(len(symbols), np.nan)
+            for i, symbol in enumerate(symbols):
+                rate = self._symbol_params.get(symbol, {}).get('quote_to_account')
+                if rate is not None:
+                    fixed[i] = rate
+                    continue
+                pair = self._conversion_pair(symbol)
+                if pair is None:
+                    continue
+                pair_symbol, invert[i] = pair
+                if pair_symbol not in quoted:
+                    quoted.append(pair_symbol)
+                pairs[i] = quoted.index(pair_symbol)
+            plan = self._quote_plans[key] = (quoted, pairs, invert, fixed)
+        return plan
+    
+    def _quotes(self, symbols: List[str], timestamp: Any) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns the ask and bid vectors of the symbols with the rates converting amounts in their quote currencies to the
+        account currency, all read from one quote of the symbols and of the crosses converting them
+        """
+        quoted, pairs, invert, fixed = self._quote_plan(symbols)
+        ask, bid = self._data_provider.quotes(quoted, timestamp)
+        mid = (ask[pairs] + bid[pairs]) / 2
+        converted = (pairs >= 0) & (mid > 0)
+        mid = np.where(converted, mid, 1.0)
+        conversions = np.where(converted, np.where(invert, 1 / mid, mid), 1.0)
+        conversions = np.where(np.isnan(fixed), conversions, fixed)
+        n = len(symbols)
+        return ask[:n], bid[:n], conversions
+    
+    async def on_ticks(self, symbol: str) -> None:
+        await self._tick()
+    
+    def _record_order_latency(self) -> None:
+        origin_ns = self._data_provider.tick_origin_ns()
+        if origin_ns is not None:
+            self._order_latencies_ns.append(time.time_ns() - origin_ns)
     
     async def tick(self) -> None:
+        # with a feed attached the ticks are handled as they are pushed, the tick loop would handle them again
+        if self._data_provider.is_fed():
+            return
+        await self._tick()
+    
+    async def _tick(self) -> None:
         timestamp = self._data_provider.get_time()
         if timestamp is None:
             return 
-        positions = self._positions.copy()
+        
+        timestamp_ns = to_ns(timestamp)
+        last_tick_ns, self._last_tick_ns = self._last_tick_ns, timestamp_ns
         
         try:
-
-            for symbol, position in positions.items():
-                if not position['is_open']:
-                    continue
-                
-                ask = self._data_provider.ask(symbol)
-                bid = self._data_provider.bid(symbol)
-                
-                if ask is None or bid is None:
-                    continue
-                
-                ask = round(ask, 5)
-                bid = round(bid, 5)
-
-                pl = bid - \
-                    position['price'] if position['is_long'] else position['price'] - ask
-
-                position['pl'] = pl / self._point
-
-                self._equity = self._balance + \
-                    position['volume'] * position['pl'] * self._point * self._lot_in_units
-
-                if position['pl'] > position['take_profit_pips'] or position['pl'] < -position['stop_loss_pips']:
-                    state = State()
-                    await self.close(symbol=symbol, comment="TP/SL reached", caller_context=state)
+            slots = self._book.open_slots()
+            if self._intrabar_fills and len(slots) > 0 and last_tick_ns is not None and last_tick_ns < timestamp_ns:
+                self._fill_intrabar(slots, last_tick_ns, timestamp_ns)
+                slots = self._book.open_slots()
+            if len(slots) == 0:
+                self._equity = self._balance
+                self._margin = 0.0
+                return
+            
+            # all the open positions are marked to market in one step against the quotes of their symbols
+            ask, bid, conversions = self._quotes([self._book.symbols[slot] for slot in slots], timestamp)
+            pl = self._book.mark_to_market(slots, ask, bid, conversions)
+            self._trades.update(self._book.trades(slots), pl)
+            
+            self._equity = self._balance + float(np.sum(self._book.profits(slots)))
+            self._margin = self._book.margin(slots, ask, bid, self._leverage)
+            
+            for slot in slots[self._book.limits_reached(slots)]:
+                state = State()
+                await self.close(symbol=self._book.symbols[slot], comment="TP/SL reached", caller_context=state)
         except Exception as e:
             print(e)
             raise e
+    
+    def _fill_intrabar(self, slots: np.ndarray, start_ns: int, stop_ns: int) -> None:
+        """Closes the positions whose TP or SL is reached by a tick since the last step, at that tick"""
+        open_timestamps = self._trades.rows['open_timestamp']
+        for slot in slots:
+            symbol = self._book.symbols[slot]
+            position = self._book.position(slot)
+            timestamps, ask, bid = self._data_provider.tick_arrays(symbol)
+            index, pl = first_crossing(
+                timestamps, ask, bid, max(start_ns, int(open_timestamps[position['trade']])), stop_ns,
+                position['is_long'], position['price'], position['take_profit_pips'], position['stop_loss_pips'], position['point'])
+            if index >= 0:
+                self._book.set_pl(slot, pl)
+                self._close_position(symbol, int(timestamps[index]), "TP/SL reached")
 
     async def hold(self, *, caller_context: IState) -> None:
         ...
@@ -120,54 +271,81 @@ class Broker(WithActionSpaceMixin, IEnvironmentComponent):
     async def open(self, *, symbol: str, price: float, volume: float, is_long: bool, take_profit_pips: int, stop_loss_pips: int, comment: str, caller_context: IState) -> ActionResult:
         if not self._is_on:
             return ActionResult(value="Broker is off", success=False)
-        ask = self._data_provider.ask(symbol)
-        bid = self._data_provider.bid(symbol)
-        self._positions[symbol] = {
-            'price': ask if is_long else bid,
-            'volume': volume,
-            'is_long': is_long,
-            'take_profit_pips': take_profit_pips,
-            'stop_loss_pips': stop_loss_pips,
-            'pl': (bid - ask) / self._point,
-            'is_open': True,
-            'open_timestamp': self._data_provider.get_time(),
-            'open_comment': comment
-        }
+        timestamp = self._data_provider.get_time()
+        ask, bid, conversion = (float(values[0]) for values in self._quotes([symbol], timestamp))
+        point, lot_in_units = self._symbol_point(symbol)
+        
+        # the margin is in the account currency, like the equity it is checked against
+        if self._leverage > 0 and volume * lot_in_units * (ask + bid) / 2 * conversion / self._leverage > self._equity - self._margin:
+            return ActionResult(value="Not enough free margin", success=False)
+        
+        price = ask if is_long else bid
+        pl = (bid - ask) / point
+        trade = self._trades.open(
+            symbol, to_ns(timestamp) if timestamp is not None else -1, is_long, price, volume,
+            take_profit_pips, stop_loss_pips, comment, pl)
+        self._book.open(symbol, is_long, price, volume, take_profit_pips, stop_loss_pips, pl, trade, timestamp, comment,
+                        point, lot_in_units, conversion)
         self._total_trade_count += 1
-        self._trades.append(self._positions[symbol])
+        self._record_order_latency()
         return ActionResult(value="OK", success=True)
 
     async def close(self, *, symbol: str, comment: str, caller_context: IState) -> ActionResult:
         if not self._is_on:
             return ActionResult(value="Broker is off", success=False)
+        if not self._book.is_symbol_open(symbol):
+            return ActionResult(value=f"No open position for {symbol}", success=False)
         
-        position = self._positions.pop(symbol, None)
-        
-        position['close_timestamp'] = self._data_provider.get_time()
-        position['close_comment'] = comment
-        
-        if position is not None:
-            position['is_open'] = False
+        timestamp = self._data_provider.get_time()
+        self._close_position(symbol, to_ns(timestamp) if timestamp is not None else -1, comment)
+        # the margin of the position is free for an order in the same step
+        self._refresh_account()
+        self._record_order_latency()
+        return ActionResult(value="OK", success=True)
+    
+    def _close_position(self, symbol: str, timestamp_ns: int, comment: str) -> None:
+        position = self._book.position(self._book.close(symbol))
+        # the position is realized at its last marked pl, the other positions stay in the equity
+        profit = position['volume'] * position['pl'] * position['point'] * position['lot_in_units'] * position['conversion']
+        self._trades.close(position['trade'], timestamp_ns, position['pl'], profit, comment)
         
-        self._pl += self._equity - self._balance
-        self._balance = self._equity
+        self._pl += profit
+        self._balance += profit
         
-        return ActionResult(value="OK", success=True)
+    async def export_trades(self, *, path: str, caller_context: IState) -> ActionResult:
+        self._trades.to_parquet(path)
+        return ActionResult(value=f"Exported {len(self._trades)} trades", success=True)
         
     async def observe(self, caller_context: IState) -> IState:
         state = State()
+        if self._latency is not None:
+            self._status['latency_us'] = self._latency.summary('broker.')
         state.set_item('status', self._status)
-        state.set_item('positions', self._positions)
+        state.set_item('positions', self._book.positions())
         state.set_item('balance', self._balance)
         state.set_item('equity', self._equity)
+        state.set_item('margin', self._margin)
+        state.set_item('free_margin', self._equity - self._margin)
         state.set_item("pl", self._pl)
         state.set_item('leverage', self._leverage)
         state.set_item('point', self._point)
         state.set_item('total_trade_count', self._total_trade_count)
-        state.set_item('trades', self._trades)
+        # only the latest trades are published, the whole ledger is exported with broker_export_trades
+        state.set_item('trades', self._trades.recent(self._recent_trades))
+        state.set_item('trade_stats', self._trades.summary())
         state.set_item('is_live', self._is_live)
         state.set_item('is_on', self._is_on)
         state.set_item('lot_in_units', self._lot_in_units)
+        state.set_item('account_currency', self._account_currency)
+        state.set_item('symbol_params', self._symbol_params)
+        if self._order_latencies_ns:
+            latencies = np.array(self._order_latencies_ns) / 1000
+            state.set_item('tick_to_order_latency_us', {
+                'count': len(latencies),
+                'p50': float(np.percentile(latencies, 50)),
+                'p99': float(np.percentile(latencies, 99)),
+                'max': float(latencies.max()),
+            })
         return state
     
     
@@ -1,25 +1,37 @@
 from datetime import datetime, timedelta, UTC
-from typing import Tuple, Optional, Literal, Dict, Any
-from bisect import bisect_left
+from typing import Awaitable, Callable, Tuple, Optional, Literal, Dict, Any, List
+from collections import OrderedDict
+import asyncio as aio
+import time
+import numpy as np
 import pandas as pd
+from datatable import dt
 
 
 from agentopy import IEnvironmentComponent, WithActionSpaceMixin, IState, State, EntityInfo, Action, ActionResult
-from frankenstein.lib.trading.protocols import IDataProvider
-from frankenstein.lib.trading.utils import aggregate_prices
+from frankenstein.lib.trading.protocols import IDataProvider, ITickFeed
+from frankenstein.lib.trading.utils import bars_dataframe, replay_schedule, steps_with_ticks, TIMEFRAMES
+from frankenstein.lib.trading.tick_store import TickStore, to_ns
+from frankenstein.lib.trading.bar_series import BarSeries
+from frankenstein.lib.trading.dt_store import DtTickStore
+from frankenstein.lib.trading.latency import LatencyRecorder, instrument
 
 import logging
 
 logger = logging.getLogger(__name__)
 
+EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+
 
 class DataProvider(WithActionSpaceMixin, IDataProvider, IEnvironmentComponent):
-    def __init__(self, *, time_range: Optional[Tuple[datetime, datetime]] = None) -> None:
+    def __init__(self, *, time_range: Optional[Tuple[datetime, datetime]] = None, cache_size: int = 16,
+                 latency: Optional[LatencyRecorder] = None) -> None:
         super().__init__()
         
         self._time: datetime = None
         self._live: bool = False
         self._status: Dict[str, Any] = dict()
+        self._time_range = time_range
         
         if time_range is not None:
             start, end = time_range
@@ -31,12 +43,28 @@ class DataProvider(WithActionSpaceMixin, IDataProvider, IEnvironmentComponent):
             self._min_start_time, self._min_end_time = start, end
             self._time = start
         
-        self._cache = {}
+        self._cache: OrderedDict[Tuple[str, str], BarSeries] = OrderedDict()
+        self._cache_size = cache_size
         self._data = {}
         self._last_ask = {}
         self._last_bid = {}
         self._time_freq_str = None
         self._start_time, self._end_time, self._time_freq = None, None, None
+        # the steps of the replay, built once on reset, and the position of the current one
+        self._schedule: Optional[np.ndarray] = None
+        self._cursor = 0
+        self._time_cursor = -1
+        # by symbol, the position in the ticks of the latest tick at or before every step
+        self._positions: Dict[str, np.ndarray] = {}
+        
+        # a streaming feed pushes ticks in live mode, the clock is then the timestamp of the last tick pushed
+        self._feed_task: Optional[aio.Task] = None
+        self._feed_time: Optional[datetime] = None
+        self._tick_origin_ns: Optional[int] = None
+        self._tick_listeners: List[Callable[[str], Awaitable[None]]] = []
+        
+        self._latency = latency
+        instrument(self, {'step': 'data_provider.step', 'price': 'data_provider.price'}, latency)
         
         self.action_space.register_actions(
             [
@@ -47,16 +75,23 @@ class DataProvider(WithActionSpaceMixin, IDataProvider, IEnvironmentComponent):
         )
         
     def load_ticks_pd_dataframe(self, df: pd.DataFrame, symbol: str):
+        self.load_ticks_store(TickStore.from_dataframe(df), symbol)
+    
+    def load_ticks_store(self, store: TickStore, symbol: str):
+        for key in [key for key in self._cache if key[0] == symbol]:
+            del self._cache[key]
+        self._positions.pop(symbol, None)
         self._data[symbol] = {
-            'index': df.index.tolist(),
-            'df': df,
-            'dict': df.to_dict('index'),
+            'store': store,
             'source': 'pd.dataframe'
         }
     
-    def load_ticks_dt_dataframe(self, df: pd.DataFrame, symbol: str):
+    def load_ticks_dt_dataframe(self, df: dt.Frame, symbol: str):
+        for key in [key for key in self._cache if key[0] == symbol]:
+            del self._cache[key]
+        self._positions.pop(symbol, None)
         self._data[symbol] = {
-            'df': df,
+            'store': DtTickStore(df),
             'source': 'dt.dataframe'
         }
     
@@ -64,6 +99,8 @@ class DataProvider(WithActionSpaceMixin, IDataProvider, IEnvironmentComponent):
         self._start_time = None
         self._end_time = None
         self._time_freq = None
+        if self._schedule is not None:
+            self._cursor = len(self._schedule)
         
         return ActionResult(value="OK", success=True)
     
@@ -72,24 +109,11 @@ class DataProvider(WithActionSpaceMixin, IDataProvider, IEnvironmentComponent):
         return ActionResult(value="OK", success=True)
     
     def reset(self, start: str, end: str, freq: str) -> None:
-        timestep_to_freq = {
-            'Tick': timedelta(microseconds=0),
-            'S1': timedelta(seconds=1),
-            'M1': timedelta(minutes=1),
-            'M5': timedelta(minutes=5),
-            'M10': timedelta(minutes=10),
-            'M15': timedelta(minutes=15),
-            'M20': timedelta(minutes=20),
-            'M30': timedelta(minutes=30),
-            'H1': timedelta(hours=1),
-            'H4': timedelta(hours=4),
-            'D1': timedelta(days=1),
-        }
         self._time_freq_str = freq
-        if freq not in timestep_to_freq:
+        if freq not in TIMEFRAMES:
             raise ValueError(f"Invalid frequency {freq}")
         
-        freq_td: timedelta = timestep_to_freq[freq]
+        freq_td: timedelta = TIMEFRAMES[freq]
         
         try:
             start_dt = self._parse_dt(start)
@@ -101,8 +125,12 @@ class DataProvider(WithActionSpaceMixin, IDataProvider, IEnvironmentComponent):
         logger.info(f"Replaying data from {start_dt} to {end_dt} with frequency {freq}")
         
         self._start_time, self._end_time, self._time_freq = start_dt, end_dt, freq_td
-        self._time = start_dt
         self._live = False
+        self._schedule = self._build_schedule(start_dt, end_dt, freq_td)
+        self._schedule.flags.writeable = False
+        self._cursor = 0
+        self._time_cursor = -1
+        self._positions = {}
         
         if freq_td >= timedelta(minutes=1):
             self._start_time = self._start_time.replace(second=0)
@@ -114,6 +142,25 @@ class DataProvider(WithActionSpaceMixin, IDataProvider, IEnvironmentComponent):
             self._start_time = self._start_time.replace(hour=0)
             self._end_time = self._end_time.replace(hour=0)
     
+    def _build_schedule(self, start: datetime, end: datetime, freq: timedelta) -> np.ndarray:
+        """
+        Returns the steps of the replay that have data: the steps of the calendar with a tick of any symbol since the
+        previous one, so weekends, holidays and gaps in the data are not replayed, and the ticks themselves at Tick frequency
+        """
+        timestamps = [self._data[symbol]['store'].timestamps for symbol in self._data]
+        timestamps = [t for t in timestamps if len(t) > 0]
+        if freq == timedelta(0):
+            ticks = timestamps[0] if len(timestamps) == 1 else np.unique(np.concatenate(timestamps)) if timestamps else np.empty(0, dtype=np.int64)
+            return replay_schedule(start, end, freq, ticks)
+        
+        schedule = replay_schedule(start, end, freq)
+        if timestamps:
+            keep = np.zeros(len(schedule), dtype=np.bool_)
+            for ticks in timestamps:
+                keep |= steps_with_ticks(schedule, ticks)
+            schedule = schedule[keep]
+        return schedule
+    
     async def replay(self, *, start: str, end: str, freq: str, caller_context: IState) -> ActionResult:
         
         try:
@@ -138,11 +185,45 @@ class DataProvider(WithActionSpaceMixin, IDataProvider, IEnvironmentComponent):
                     logger.error(e3)
                     raise ValueError(f"Invalid date format {dt_str}")
                 
+    def is_live(self) -> bool:
+        return self._live
+    
     def get_time(self) -> datetime:
         if self._live:
-            return datetime.now(UTC)
+            return self._feed_time if self._feed_time is not None else datetime.now(UTC)
+        if self._schedule is not None and self._time_cursor != self._cursor:
+            self._time = self._step_time(self._cursor)
+            self._time_cursor = self._cursor
         return self._time
     
+    def _step_time(self, cursor: int) -> Optional[datetime]:
+        if cursor >= len(self._schedule):
+            return None
+        return EPOCH + timedelta(microseconds=int(self._schedule[cursor]) // 1000)
+    
+    def _schedule_positions(self, symbol: str) -> np.ndarray:
+        """Returns the positions of the latest ticks of the symbol at every step, searched once per replay"""
+        positions = self._positions.get(symbol)
+        if positions is None:
+            positions = np.searchsorted(self._data[symbol]['store'].timestamps, self._schedule, side='right') - 1
+            self._positions[symbol] = positions
+        return positions
+    
+    def _step_positions(self, symbols: List[str], timestamp: datetime | None) -> Optional[List[int]]:
+        """
+        Returns the positions of the latest ticks of the symbols at the current step, read from the schedule,
+        None if the timestamp is not the current step's
+        """
+        if self._live and self._feed_time is not None:
+            if timestamp is not None and timestamp is not self._feed_time:
+                return None
+            return [len(self._data[symbol]['store']) - 1 for symbol in symbols]
+        if self._live or self._schedule is None or self._cursor >= len(self._schedule):
+            return None
+        if timestamp is not None and timestamp is not self.get_time():
+            return None
+        return [int(self._schedule_positions(symbol)[self._cursor]) for symbol in symbols]
+    
     def ask(self, symbol: str, timestamp: datetime | None = None) -> float:
         return self.price(symbol, 'ask', timestamp)
 
@@ -155,71 +236,154 @@ class DataProvider(WithActionSpaceMixin, IDataProvider, IEnvironmentComponent):
         Returns -1 if the price is not available
         """
         assert symbol in self._data, f"Symbol {symbol} not loaded"
+        positions = self._step_positions([symbol], timestamp)
+        if positions is not None:
+            store = self._data[symbol]['store']
+            return float((store.ask if price_type == 'ask' else store.bid)[positions[0]]) if positions[0] >= 0 else -1
         if timestamp is None:
             timestamp = self.get_time()
-        if self._data[symbol]['source'] == 'pd.dataframe':
-            if timestamp in self._data[symbol]['dict']:
-                return self._data[symbol]['dict'][timestamp][price_type]
-            else:
-                
-                idx = bisect_left(self._data[symbol]['index'], timestamp) - 1
-                
-                if idx < 0:
-                    return -1
-
-                loc = self._data[symbol]['index'][idx]
-                
-                return self._data[symbol]['dict'][loc][price_type]
-            
-        raise NotImplementedError
+        return self._data[symbol]['store'].price(price_type, to_ns(timestamp))
+    
+    def prices(self, symbol: str, price_type: Literal['ask', 'bid'], timestamps_ns: np.ndarray) -> np.ndarray:
+        """
+        Vectorized price lookup for int64 nanosecond timestamps
+        Returns -1 where the price is not available
+        """
+        assert symbol in self._data, f"Symbol {symbol} not loaded"
+        return self._data[symbol]['store'].prices(price_type, timestamps_ns)
+    
+    def quotes(self, symbols: List[str], timestamp: datetime | None = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the ask and bid vectors of the symbols at the given timestamp
+        Prices that are not available are -1
+        """
+        ask, bid = np.full(len(symbols), -1.0), np.full(len(symbols), -1.0)
+        positions = self._step_positions(symbols, timestamp)
+        if positions is None:
+            for i, symbol in enumerate(symbols):
+                ask[i] = self.price(symbol, 'ask', timestamp)
+                bid[i] = self.price(symbol, 'bid', timestamp)
+            return ask, bid
+        
+        # at the current step both prices of a symbol are read at its position in the schedule, looked up once
+        for i, (symbol, position) in enumerate(zip(symbols, positions)):
+            if position >= 0:
+                store = self._data[symbol]['store']
+                ask[i], bid[i] = store.ask[position], store.bid[position]
+        return ask, bid
+    
+    def tick_arrays(self, symbol: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns the int64 nanosecond timestamp, ask and bid arrays of all the ticks of the symbol"""
+        assert symbol in self._data, f"Symbol {symbol} not loaded"
+        store = self._data[symbol]['store']
+        return store.timestamps, store.ask, store.bid
+    
+    def time_range(self) -> Optional[Tuple[datetime, datetime]]:
+        """Returns the first and the last time of the data the provider was created over, None if it was not given one"""
+        return self._time_range
+    
+    def symbols(self) -> List[str]:
+        """Returns the loaded symbols"""
+        return list(self._data)
+    
+    def replay_timestamps(self) -> np.ndarray:
+        """Returns the int64 nanosecond timestamps of all the steps of the current replay"""
+        if self._schedule is None or self._time_freq is None:
+            return np.empty(0, dtype=np.int64)
+        return self._schedule
+    
+    def on_ticks(self, listener: Callable[[str], Awaitable[None]]) -> None:
+        """Registers a coroutine called with the symbol whenever a feed pushes ticks, in registration order"""
+        self._tick_listeners.append(listener)
+    
+    def is_fed(self) -> bool:
+        """Returns whether a feed is attached and still pushing ticks"""
+        return self._feed_task is not None and not self._feed_task.done()
+    
+    def tick_origin_ns(self) -> Optional[int]:
+        """Returns the wall clock nanoseconds when the last ticks pushed left their source, None without a feed"""
+        return self._tick_origin_ns
+    
+    async def push_ticks(self, symbol: str, timestamps: np.ndarray, ask: np.ndarray, bid: np.ndarray, volume: np.ndarray,
+                         origin_ns: Optional[int] = None) -> None:
+        """Appends streamed ticks to the store of the symbol and lets the listeners react to them"""
+        if len(timestamps) == 0:
+            return
+        if symbol not in self._data:
+            self.load_ticks_store(TickStore.empty(), symbol)
+        store = self._data[symbol]['store']
+        assert isinstance(store, TickStore), f"Ticks of {symbol} can not be streamed into a {type(store).__name__}"
+        store.append(timestamps, ask, bid, volume)
+        
+        last_ns = int(timestamps[-1])
+        if self._feed_time is None or last_ns > to_ns(self._feed_time):
+            self._feed_time = EPOCH + timedelta(microseconds=last_ns // 1000)
+        self._tick_origin_ns = origin_ns if origin_ns is not None else time.time_ns()
+        for listener in self._tick_listeners:
+            await listener(symbol)
+    
+    async def run_feed(self, feed: ITickFeed) -> None:
+        """Switches to live mode and pushes the ticks of the feed as they arrive"""
+        self._live = True
+        async for batch in feed.batches():
+            await self.push_ticks(batch.symbol, batch.timestamps, batch.ask, batch.bid, batch.volume, batch.origin_ns)
+    
+    def start_feed(self, feed: ITickFeed) -> aio.Task:
+        self._feed_task = aio.create_task(self.run_feed(feed))
+        return self._feed_task
     
     def ticks(self, symbol: str, timestamp: datetime | None, max_ticks: int | None = 1) -> pd.DataFrame:
         assert symbol in self._data, f"Symbol {symbol} not loaded"
         
-        if self._data[symbol]['source'] == 'pd.dataframe':
-            if timestamp is None:
-                df = self._data[symbol]['df']
-            else:
-                df = self._data[symbol]['df'].loc[:timestamp + timedelta(microseconds=1)]
-            if max_ticks is not None:
-                return df.iloc[-max_ticks:]
-            else:
-                return df
-        raise NotImplementedError
+        store: TickStore | DtTickStore = self._data[symbol]['store']
+        start, stop = store.bounds(to_ns(timestamp) if timestamp is not None else None, max_ticks)
+        return store.to_dataframe(start, stop)
     
     def bars(self, symbol: str, timeframe: str, timestamp: datetime | None = None, max_bars: int | None = None) -> pd.DataFrame:
-        if (symbol, timeframe, timestamp) not in self._cache:
-            self._cache[(symbol, timeframe, timestamp)] = aggregate_prices(self.ticks(symbol, timestamp, None), timeframe)
-        df = self._cache[(symbol, timeframe, timestamp)]
-        if max_bars is not None:
-            df = df.iloc[-max_bars:]
-        return df
+        assert symbol in self._data, f"Symbol {symbol} not loaded"
+        
+        timestamp_ns = to_ns(timestamp) if timestamp is not None else None
+        
+        if self._data[symbol]['source'] == 'dt.dataframe':
+            return bars_dataframe(self._data[symbol]['store'].bars(timeframe, timestamp_ns, max_bars))
+        
+        key = (symbol, timeframe)
+        if key not in self._cache:
+            self._cache[key] = BarSeries(self._data[symbol]['store'], timeframe)
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        self._cache.move_to_end(key)
+        return bars_dataframe(self._cache[key].window(timestamp_ns, max_bars))
     
     def next_time(self) -> Optional[datetime]:
-        
-        if self._time > self._end_time:
+        if self._schedule is None:
             return None
-        if self._time.weekday() in (5,6):
-            return self._time + timedelta(days=1)
-        else:
-            return self._time + self._time_freq
+        return self._step_time(self._cursor + 1)
     
     def step(self) -> None:
-        if self._time_freq is not None and self._time is not None:
-            self._time = self.next_time()
+        if self._schedule is not None and self._time_freq is not None:
+            self._cursor = min(self._cursor + 1, len(self._schedule))
         else:
             self._time = None
     
+    def seek(self, timestamp: datetime) -> None:
+        """Moves the replay straight to the first of its steps at or after the timestamp"""
+        assert self._schedule is not None and self._time_freq is not None, "Replay is not started"
+        self._cursor = int(np.searchsorted(self._schedule, to_ns(timestamp), side='left'))
+    
     async def tick(self) -> None:
         self.step()
     
     async def observe(self, caller_context: IState) -> IState:
         state = State()
         
+        time = self.get_time()
+        if self._latency is not None:
+            self._status['latency_us'] = self._latency.summary('data_provider.')
         state.set_item('status', self._status)
-        state.set_item('time', self._time.strftime("%Y-%m-%dT%H:%M:%S.000") if self._time is not None else None)
+        state.set_item('time', time.strftime("%Y-%m-%dT%H:%M:%S.000") if time is not None else None)
         state.set_item('live', self._live)
-        state.set_item('is_on', (not self._live and self._time is not None) or self._live)
+        state.set_item('is_on', (not self._live and time is not None) or self._live)
         state.set_item('start_time', self._start_time.strftime("%Y-%m-%dT%H:%M:%S.000") if self._start_time is not None else None)
         state.set_item('end_time', self._end_time.strftime("%Y-%m-%dT%H:%M:%S.000") if self._end_time is not None else None)
         state.set_item('freq', self._time_freq_str)
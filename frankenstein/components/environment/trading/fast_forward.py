@@ -0,0 +1,77 @@
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+from datetime import datetime
+import logging
+
+from agentopy import IEnvironmentComponent, IPolicy, IState, State, Action, SharedStateKeys
+from frankenstein.components.environment.trading.broker import Broker
+from frankenstein.components.environment.trading.config_provider import ConfigProvider
+from frankenstein.components.environment.trading.data_provider import DataProvider
+from frankenstein.components.environment.trading.signal_provider import SignalProvider
+from frankenstein.lib.trading.lockstep import LockStep, StepState
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['FastForward', 'StepState']
+
+
+class FastForward(LockStep):
+    """
+    Drives a replay environment and a policy in lock-step, as fast as they run, without the component tick loops
+    and the agent heartbeat. Every step observes all the components and lets the policy act on the broker, then ticks
+    the components in their configuration order, so the DataProvider moves time first, to the next step.
+    """
+
+    def __init__(self, components: Sequence[IEnvironmentComponent], policy: IPolicy, state: Optional[IState] = None,
+                 yield_every: int = 1000) -> None:
+        data_providers = [c for c in components if isinstance(c, DataProvider)]
+        brokers = [c for c in components if isinstance(c, Broker)]
+        assert len(data_providers) == 1, "Fast forward needs exactly one data provider"
+        assert len(brokers) == 1, "Fast forward needs exactly one broker"
+
+        # the trading actions are dispatched straight to the broker, by the identity of the action the policy returns
+        broker = self._broker = brokers[0]
+        trading_actions = (
+            ('open', "Opens a position", broker.open),
+            ('hold', "Holds the position", broker.hold),
+            ('close', "Closes the position", broker.close),
+        )
+        policy.action_space.register_actions([Action(name, description, fn, broker.info()) for name, description, fn in trading_actions])
+        dispatch: Dict[int, Tuple[str, Callable]] = {
+            id(policy.action_space.get_action(name)): (name, fn) for name, _, fn in trading_actions
+        }
+        super().__init__(components, data_providers[0], policy, state if state is not None else State(), dispatch,
+                         SharedStateKeys.AGENT_ACTION_CONTEXT, yield_every)
+
+    async def prepare(self, *, account: Optional[Dict[str, Any]] = None, broker_on: bool = True,
+                      signal: Optional[Dict[str, Any]] = None, config: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Sets the environment up before the replay, as the actions of the remote control would in a ticked one:
+        the broker account and whether the broker takes orders, and the parameters of the signal and config providers
+        """
+        caller_context = self._state.slice_by_prefix(self._context_prefix)
+        results = []
+        if account is not None:
+            results.append(await self._broker.prepare_account(**account, caller_context=caller_context))
+        results.append(await self._broker.is_on(is_on=broker_on, caller_context=caller_context))
+        for component in self._components:
+            if signal is not None and isinstance(component, SignalProvider):
+                results.append(await component.setup(**signal, caller_context=caller_context))
+            if config is not None and isinstance(component, ConfigProvider):
+                results.append(await component.set_params(**config, caller_context=caller_context))
+        failed = [str(result.value) for result in results if not result.success]
+        assert not failed, f"Fast forward setup failed: {', '.join(failed)}"
+
+    async def run(self, start: Optional[str] = None, end: Optional[str] = None, freq: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Replays from start to end at freq, or the replay the data provider is already set up with.
+        A data provider that is not replaying yet replays the whole time range of its data at freq.
+        """
+        time_range = self._data_provider.time_range()
+        if start is None and len(self._data_provider.replay_timestamps()) == 0 and time_range is not None:
+            start, end = (datetime.strftime(t, "%Y-%m-%dT%H:%M:%S.%f") for t in time_range)
+        return await super().run(start, end, freq)
+
+    @staticmethod
+    def drives(components: Sequence[IEnvironmentComponent]) -> bool:
+        """Returns whether the components are a replay environment fast forward can drive"""
+        return sum(isinstance(c, DataProvider) for c in components) == 1 and sum(isinstance(c, Broker) for c in components) == 1
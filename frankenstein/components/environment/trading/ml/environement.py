@@ -1,11 +1,19 @@
 from datetime import datetime
+from typing import Callable, List, Literal, Optional, Sequence
 import gymnasium as gym
 import numpy as np
+import pandas as pd
 from gymnasium import spaces
 from frankenstein.lib.trading.protocols import IDataProvider
+from frankenstein.lib.trading.tick_store import ns_index
 
 class TradingEnv(gym.Env):
-    """Trading Environment that follows gym interface."""
+    """
+    Trading Environment that follows gym interface.
+    Episodes start at the beginning of the replay and run to its end by default. With an episode_length they are
+    truncated after that many steps, and start_mode 'random' or 'stratified' draws their start over the whole replay,
+    'stratified' visiting every one of the strata equal parts of the replay once before drawing from one again.
+    """
 
     metadata = {
         "render.modes": ["human"],
@@ -18,7 +26,11 @@ class TradingEnv(gym.Env):
         time_start: str,
         time_end: str,
         freq: str,
-        n_rolling_observations: int = 6
+        n_rolling_observations: int = 6,
+        features: Sequence[Callable[[datetime], float]] = (),
+        episode_length: Optional[int] = None,
+        start_mode: Literal['start', 'random', 'stratified'] = 'start',
+        strata: int = 10,
 
     ):
         super().__init__()
@@ -34,36 +46,71 @@ class TradingEnv(gym.Env):
         self._position = 0
         self._entry_price = 0
         self._timestep: datetime
-        self._last_n_observations = []
-        self._last_n_observations_abs = []
         self._n_rolling_observations = n_rolling_observations
+        self._features = list(features)
         self._last_action = None
         
+        assert start_mode in ('start', 'random', 'stratified'), f"Invalid start mode {start_mode}"
+        assert episode_length is None or episode_length > 0, "episode_length must be positive"
+        assert strata > 0, "strata must be positive"
+        self._episode_length = episode_length
+        self._start_mode = start_mode
+        self._strata = strata
+        self._strata_order: List[int] = []
+        self._episode_steps = 0
+        # steps and prices of the replay, read once on the first reset
+        self._timestamps: Optional[np.ndarray] = None
+        self._bids: Optional[np.ndarray] = None
+        
+        # price, position, position price and the extra features of a step
+        n_features = 3 + len(self._features)
+        # every row is written twice, n rows apart, so the last n rows are always a contiguous slice
+        self._window = np.zeros((2 * n_rolling_observations, n_features), dtype=np.float16)
+        self._window_pos = 0
+        self._window_count = 0
+        # the full precision rows of the last two steps, used by the reward
+        self._new_row = np.zeros(n_features)
+        self._old_row = np.zeros(n_features)
+        self._price_count = 0
+        self._last_price = 0.0
+        self._last_to_last_price = 0.0
+        
         self._equity = 10000
         
         self.action_space = spaces.Discrete(4) # Buy, Sell, Hold, Close
-        # (self._n_rolling_observations bars, 3 features - price, position, position price)
+        # (self._n_rolling_observations bars, 3 features - price, position, position price - and the extra features)
         self.observation_space = spaces.Box(low=0, high=255,
-                                            shape=(self._n_rolling_observations , 3), dtype=np.float16)            
+                                            shape=(self._n_rolling_observations, n_features), dtype=np.float16)
+    
+    def _observation(self) -> np.ndarray:
+        """Returns the rows of the window in order as a view, valid until the next step"""
+        n = self._n_rolling_observations
+        start = self._window_pos + n - min(self._window_count, n)
+        return self._window[start:self._window_pos + n]
+    
     def _observe(self):
         if self._timestep is None:
             return
-        price = self._data_provider.bid(self.symbol) * self._lot_multiplier
-        self._last_n_observations_abs.append(
-            [
-                price, 
-                self._position,
-            ])
-        
-        if len(self._last_n_observations_abs) > 1:
-            self._last_n_observations.append(
-                [
-                    self._last_n_observations_abs[-1][0] - self._last_n_observations_abs[-2][0], 
-                    self._position, 
-                    (price - self._entry_price) if self._entry_price != 0 else 0
-                ])
-        self._last_n_observations_abs = self._last_n_observations_abs[-self._n_rolling_observations:]
-        self._last_n_observations = self._last_n_observations[-self._n_rolling_observations:]
+        self._push(self._timestep, self._data_provider.bid(self.symbol) * self._lot_multiplier)
+    
+    def _push(self, timestep: datetime, price: float):
+        self._last_to_last_price, self._last_price = self._last_price, price
+        self._price_count += 1
+        
+        if self._price_count > 1:
+            self._old_row, self._new_row = self._new_row, self._old_row
+            row = self._new_row
+            row[0] = self._last_price - self._last_to_last_price
+            row[1] = self._position
+            row[2] = (price - self._entry_price) if self._entry_price != 0 else 0
+            for i, feature in enumerate(self._features):
+                row[3 + i] = feature(timestep)
+            
+            n = self._n_rolling_observations
+            self._window[self._window_pos] = row
+            self._window[self._window_pos + n] = row
+            self._window_pos = (self._window_pos + 1) % n
+            self._window_count += 1
     
     def _reward(self, action, old_observation, new_observation) -> float:
         if self._timestep is None:
@@ -92,17 +139,17 @@ class TradingEnv(gym.Env):
     def step(self, action):
         
         # action: 0 - Buy, 1 - Sell, 2 - Close, 3 - Hold
-        current_position = self._last_n_observations[-1][1]
+        current_position = self._new_row[1]
         if action == 0: # buy
             if current_position == 0:
                 self._position = 1
-                self._entry_price = self._last_n_observations_abs[-1][0]
+                self._entry_price = self._last_price
                 
             
         elif action == 1: # sell
             if current_position == 0:
                 self._position = -1
-                self._entry_price = self._last_n_observations_abs[-1][0]
+                self._entry_price = self._last_price
                 
         elif action == 2: # close
             self._position = 0
@@ -116,31 +163,80 @@ class TradingEnv(gym.Env):
         self._timestep = self._data_provider.get_time()
         
         done = self._timestep is None
-        old_observation = self._last_n_observations[-1]
+        old_observation = self._new_row
         self._observe()
-        new_observation = self._last_n_observations[-1]
+        new_observation = self._new_row
         reward = self._reward(action, old_observation, new_observation)
         
-        observation = np.array(self._last_n_observations, dtype=np.float16)
+        self._episode_steps += 1
+        truncated = done or (self._episode_length is not None and self._episode_steps >= self._episode_length)
+        return self._observation(), reward, done, truncated, {}
+    
+    def _start_step(self) -> int:
+        """Returns the position in the replay of the first observation of the next episode"""
+        n = self._n_rolling_observations
+        # the first step of the replay is skipped and the next n + 1 fill the window
+        first, last = n + 1, len(self._timestamps) - 1
+        if self._episode_length is not None:
+            last -= self._episode_length
+        if self._start_mode == 'start' or last <= first:
+            return first
+        if self._start_mode == 'random':
+            return int(self.np_random.integers(first, last + 1))
         
-        return observation, reward, done, done, {}
+        if not self._strata_order:
+            self._strata_order = [int(stratum) for stratum in self.np_random.permutation(self._strata)]
+        stratum = self._strata_order.pop()
+        bounds = np.linspace(first, last + 1, self._strata + 1).astype(np.int64)
+        return int(self.np_random.integers(bounds[stratum], max(bounds[stratum], bounds[stratum + 1] - 1) + 1))
+    
+    def _warm_up(self, start: int):
+        """Fills the window with the n steps up to start from the replay prices, in one slice"""
+        n = self._n_rolling_observations
+        prices = self._bids[start - n:start + 1]
+        rows = self._new_row
+        rows[:] = 0
+        
+        self._window[:n] = 0
+        self._window[:n, 0] = np.diff(prices)
+        if self._features:
+            timesteps = ns_index(self._timestamps[start - n + 1:start + 1]).to_pydatetime()
+            for i, feature in enumerate(self._features):
+                values = [feature(timestep) for timestep in timesteps]
+                self._window[:n, 3 + i] = values
+                rows[3 + i] = values[-1]
+        self._window[n:] = self._window[:n]
+        self._window_pos = 0
+        self._window_count = n
+        
+        rows[0] = prices[-1] - prices[-2]
+        self._last_to_last_price, self._last_price = prices[-2], prices[-1]
+        self._price_count = n + 1
 
     def reset(self, seed=None, options=None):
-        self._data_provider.reset(self._time_start, self._time_end, self._freq)
+        super().reset(seed=seed)
+        # the schedule is built on the first reset only, the later episodes seek straight to their start in it
+        if self._timestamps is None:
+            self._data_provider.reset(self._time_start, self._time_end, self._freq)
+            self._timestamps = self._data_provider.replay_timestamps()
+            self._bids = self._data_provider.prices(self.symbol, 'bid', self._timestamps) * self._lot_multiplier
+            assert len(self._timestamps) > self._n_rolling_observations + 1, "Not enough steps for the observation window"
         self._equity = 10000
         self._position = 0
-        self._last_n_observations = []
-        
-        while True:
-            self._data_provider.step()
-            self._timestep = self._data_provider.get_time()
-            self._observe()
-            observation = np.array(self._last_n_observations, dtype=np.float16)
-            if np.all(~np.isnan(observation)) and observation.shape[0] == self._n_rolling_observations:
-                break
-            if self._timestep is None:
-                break
-        return observation, {}
+        self._entry_price = 0
+        self._last_action = None
+        self._episode_steps = 0
+        
+        start = self._start_step()
+        self._warm_up(start)
+        # features that are still warming up leave gaps, the episode starts at the first step without any
+        while np.isnan(self._observation()).any() and start + 1 < len(self._timestamps):
+            start += 1
+            self._push(pd.Timestamp(self._timestamps[start], tz='UTC').to_pydatetime(), self._bids[start])
+        
+        self._timestep = pd.Timestamp(self._timestamps[start], tz='UTC').to_pydatetime()
+        self._data_provider.seek(self._timestep)
+        return self._observation(), {}
 
     def render(self, mode='human'):
         print(self.get_stats())
@@ -150,8 +246,8 @@ class TradingEnv(gym.Env):
             'equity': self._equity,
             'position': self._position,
             'last_action': self._last_action,
-            'last_price': self._last_n_observations_abs[-1][0],
-            'last_to_last_price': self._last_n_observations_abs[-2][0],
+            'last_price': self._last_price,
+            'last_to_last_price': self._last_to_last_price,
         }
         
     def reset_stats(self):
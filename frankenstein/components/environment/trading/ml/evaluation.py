@@ -0,0 +1,133 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, UTC
+from itertools import product
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import json
+import os
+import numpy as np
+import torch as th
+from stable_baselines3.common.base_class import BaseAlgorithm
+from stable_baselines3.ppo.ppo import PPO
+
+from frankenstein.components.environment.trading.ml.environement import TradingEnv
+from frankenstein.lib.trading.market_data import MarketDataService
+from frankenstein.lib.trading.protocols import IDataProvider
+from frankenstein.lib.trading.sweep import max_drawdown
+
+ACTIONS = ('buy', 'sell', 'close', 'hold')
+
+# one service per cache directory and process, created on first use,
+# the evaluation processes map the datasets the first one converted instead of parsing them again
+_MARKET_DATA: Dict[Path, MarketDataService] = {}
+
+
+def market_data(cache_dir: str | Path = '.market_data') -> MarketDataService:
+    """Returns the market data service of the process caching its archives under cache_dir"""
+    key = Path(cache_dir).resolve()
+    if key not in _MARKET_DATA:
+        _MARKET_DATA[key] = MarketDataService(key)
+    return _MARKET_DATA[key]
+
+
+def load_data_provider(filename: str, symbol: str = 'EURUSD', bars: bool = True,
+                       cache_dir: str | Path = '.market_data') -> Tuple[IDataProvider, datetime, datetime]:
+    """
+    Loads an MT5 bars or ticks csv export into a DataProvider, converted once into an archive under cache_dir.
+    Returns it with the first and last timestamps.
+    """
+    from frankenstein.components.environment.trading.data_provider import DataProvider
+
+    store = market_data(cache_dir).store(filename, bars)
+    start, end = (datetime.fromtimestamp(ts // 10**9, UTC) for ts in (store.start(), store.end()))
+
+    data_provider = DataProvider()
+    data_provider.load_ticks_store(store, symbol)
+    return data_provider, start, end
+
+
+class CsvEnvFactory:
+    """Builds the TradingEnv of a dataset csv, picklable so the evaluation processes can build their own"""
+
+    def __init__(self, freq: str, n_rolling_observations: int, cache_dir: str | Path = '.market_data') -> None:
+        self.freq = freq
+        self.n_rolling_observations = n_rolling_observations
+        self.cache_dir = str(cache_dir)
+
+    def __call__(self, dataset: str) -> TradingEnv:
+        data_provider, start, end = load_data_provider(dataset, cache_dir=self.cache_dir)
+        return TradingEnv(
+            data_provider,
+            datetime.strftime(start, "%Y-%m-%dT%H:%M:%S.0"),
+            datetime.strftime(end, "%Y-%m-%dT%H:%M:%S.0"),
+            self.freq,
+            self.n_rolling_observations,
+        )
+
+
+def evaluate_episode(model: BaseAlgorithm, env: TradingEnv, deterministic: bool = True) -> Dict[str, Any]:
+    """
+    Plays one episode of the model on the environment in process.
+    Returns the action counts, the reward statistics and the equity curve of the episode.
+    """
+    actions, rewards, equity = [], [], []
+    observation, _ = env.reset()
+    done = False
+    while not done:
+        action, _ = model.predict(observation, deterministic=deterministic)
+        action = int(action)
+        observation, reward, terminated, truncated, _ = env.step(action)
+        done = terminated or truncated
+        actions.append(action)
+        rewards.append(reward)
+        equity.append(env.get_stats()['equity'])
+
+    rewards = np.array(rewards, dtype=np.float64)
+    equity = np.array(equity, dtype=np.float64)
+    counts = np.bincount(np.array(actions, dtype=np.int64), minlength=len(ACTIONS))
+    result: Dict[str, Any] = {'steps': len(rewards)}
+    result.update({f'{name}_count': int(count) for name, count in zip(ACTIONS, counts)})
+    result.update({
+        'total_reward': float(rewards.sum()),
+        'mean_reward': float(rewards.mean()) if len(rewards) else 0.0,
+        'std_reward': float(rewards.std()) if len(rewards) else 0.0,
+        'min_reward': float(rewards.min()) if len(rewards) else 0.0,
+        'max_reward': float(rewards.max()) if len(rewards) else 0.0,
+        'final_equity': float(equity[-1]) if len(equity) else float(env.get_stats()['equity']),
+        'max_drawdown': max_drawdown(equity) if len(equity) else 0.0,
+        'equity': equity,
+    })
+    return result
+
+
+def _init_worker() -> None:
+    # the processes already run side by side, one thread each keeps them from competing for the cores
+    th.set_num_threads(1)
+
+
+def _evaluate_run(job: Tuple[str, str, Callable[[str], TradingEnv], bool]) -> Dict[str, Any]:
+    checkpoint, dataset, make_env, deterministic = job
+    model = PPO.load(checkpoint, device='cpu')
+    result = {'checkpoint': str(checkpoint), 'dataset': str(dataset)}
+    result.update(evaluate_episode(model, make_env(dataset), deterministic))
+    return result
+
+
+def run_evaluation(checkpoints: Sequence[str], datasets: Sequence[str], make_env: Callable[[str], TradingEnv], *,
+                   deterministic: bool = True, max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Evaluates every checkpoint on every dataset, one episode per pair, in parallel processes.
+    make_env builds the environment of a dataset in the worker and must be picklable.
+    Returns the results in checkpoint then dataset order.
+    """
+    jobs = [(checkpoint, dataset, make_env, deterministic) for checkpoint, dataset in product(checkpoints, datasets)]
+    max_workers = min(max_workers or os.cpu_count() or 1, max(1, len(jobs)))
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as executor:
+        return list(executor.map(_evaluate_run, jobs))
+
+
+def write_report(results: List[Dict[str, Any]], path: str | Path) -> None:
+    """Writes the results of an evaluation to one json file, the equity curves as lists"""
+    runs = [{key: value.tolist() if isinstance(value, np.ndarray) else value for key, value in result.items()} for result in results]
+    with open(path, 'w') as file:
+        json.dump({'runs': runs}, file)
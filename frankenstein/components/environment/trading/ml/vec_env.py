@@ -0,0 +1,193 @@
+from typing import Any, Dict, List, Literal, Optional, Sequence
+import numpy as np
+from gymnasium import spaces
+from stable_baselines3.common.vec_env import VecEnv
+from stable_baselines3.common.vec_env.base_vec_env import VecEnvIndices, VecEnvObs, VecEnvStepReturn
+
+from frankenstein.lib.trading.protocols import IDataProvider
+
+BUY, SELL, CLOSE, HOLD = 0, 1, 2, 3
+
+
+class TradingVecEnv(VecEnv):
+    """
+    N independent TradingEnv episodes stepped together over one shared array of replay prices.
+    Observations, rewards and the episode bookkeeping of all the environments are NumPy arrays,
+    a step is a handful of vectorized operations whatever the number of environments.
+    Finished environments are reset automatically, as SB3's VecEnv interface expects.
+    Every environment starts its episodes at its own step of the replay, drawn with its own generator seeded by seed(),
+    or at the step given by the 'start' option of set_options for its next reset. start_mode 'start' replays from the
+    first step like TradingEnv does by default, 'stratified' visits every one of the strata equal parts of the replay
+    once before drawing from one again. With an episode_length the episodes are truncated after that many steps.
+    """
+
+    def __init__(self, prices: np.ndarray, num_envs: int, n_rolling_observations: int = 6, lot_multiplier: float = 10000,
+                 start_mode: Literal['start', 'random', 'stratified'] = 'random', episode_length: Optional[int] = None,
+                 strata: int = 10) -> None:
+        self._prices = np.asarray(prices, dtype=np.float64) * lot_multiplier
+        self._n_rolling_observations = n_rolling_observations
+        assert len(self._prices) > n_rolling_observations + 2, "Not enough steps for the observation window"
+        assert start_mode in ('start', 'random', 'stratified'), f"Invalid start mode {start_mode}"
+        assert episode_length is None or episode_length > 0, "episode_length must be positive"
+        assert strata > 0, "strata must be positive"
+        self._start_mode = start_mode
+        self._episode_length = episode_length
+        self._strata = strata
+        self._rngs = [np.random.default_rng() for _ in range(num_envs)]
+        self._strata_orders: List[List[int]] = [[] for _ in range(num_envs)]
+
+        self.render_mode = None
+        observation_space = spaces.Box(low=0, high=255, shape=(n_rolling_observations, 3), dtype=np.float16)
+        super().__init__(num_envs, observation_space, spaces.Discrete(4))
+
+        self._cursor = np.zeros(num_envs, dtype=np.int64)
+        self._episode_steps = np.zeros(num_envs, dtype=np.int64)
+        self._position = np.zeros(num_envs, dtype=np.float64)
+        self._entry_price = np.zeros(num_envs, dtype=np.float64)
+        self._equity = np.full(num_envs, 10000.0)
+        self._last_action = np.full(num_envs, -1, dtype=np.int64)
+        # (price change, position, unrealized price change) of the last n steps of every environment
+        self._window = np.zeros((num_envs, n_rolling_observations, 3), dtype=np.float64)
+        self._actions = np.full(num_envs, HOLD, dtype=np.int64)
+
+    @classmethod
+    def from_data_provider(cls, data_provider: IDataProvider, symbol: str, time_start: str, time_end: str, freq: str,
+                           num_envs: int, n_rolling_observations: int = 6, **kwargs: Any) -> 'TradingVecEnv':
+        """Precomputes the bid of every step of the replay once, to be shared by all the environments"""
+        data_provider.reset(time_start, time_end, freq)
+        timestamps = data_provider.replay_timestamps()
+        return cls(data_provider.prices(symbol, 'bid', timestamps), num_envs, n_rolling_observations, **kwargs)
+
+    def _start_step(self, env: int) -> int:
+        """Returns the position in the replay of the first observation of the next episode of the environment"""
+        # the first step of a replay is skipped and the next n + 1 fill the window, as TradingEnv.reset does
+        first, last = self._n_rolling_observations + 1, len(self._prices) - 1
+        if self._episode_length is not None:
+            last -= self._episode_length
+        start = self._options[env].get('start')
+        if start is not None:
+            assert first <= start <= max(first, last), f"Start {start} is out of the replay steps {first} to {last}"
+            return int(start)
+        if self._start_mode == 'start' or last <= first:
+            return first
+        rng = self._rngs[env]
+        if self._start_mode == 'random':
+            return int(rng.integers(first, last + 1))
+
+        if not self._strata_orders[env]:
+            self._strata_orders[env] = [int(stratum) for stratum in rng.permutation(self._strata)]
+        stratum = self._strata_orders[env].pop()
+        bounds = np.linspace(first, last + 1, self._strata + 1).astype(np.int64)
+        return int(rng.integers(bounds[stratum], max(bounds[stratum], bounds[stratum + 1] - 1) + 1))
+
+    def _reset_envs(self, envs: np.ndarray) -> None:
+        n = self._n_rolling_observations
+        starts = np.array([self._start_step(env) for env in envs], dtype=np.int64)
+        self._cursor[envs] = starts
+        self._episode_steps[envs] = 0
+        self._position[envs] = 0
+        self._entry_price[envs] = 0
+        self._equity[envs] = 10000
+        self._last_action[envs] = -1
+        # the window of every environment is the price changes of the n steps up to its start, in one gather
+        self._window[envs, :, 0] = np.diff(self._prices[starts[:, None] + np.arange(-n, 1)], axis=1)
+        self._window[envs, :, 1:] = 0
+
+    def reset(self) -> VecEnvObs:
+        for env, seed in enumerate(self._seeds):
+            if seed is not None:
+                self._rngs[env] = np.random.default_rng(seed)
+                self._strata_orders[env] = []
+        self._reset_envs(np.arange(self.num_envs))
+        self._reset_seeds()
+        self._reset_options()
+        return self._window.astype(np.float16)
+
+    def step_async(self, actions: np.ndarray) -> None:
+        self._actions = np.asarray(actions, dtype=np.int64).reshape(self.num_envs)
+
+    def step_wait(self) -> VecEnvStepReturn:
+        actions = self._actions
+        prices = self._prices
+        old_position = self._position.copy()
+        old_unrealized = self._window[:, -1, 2].copy()
+
+        flat = old_position == 0
+        opened = flat & ((actions == BUY) | (actions == SELL))
+        closed = actions == CLOSE
+        self._position = np.where(opened, np.where(actions == BUY, 1.0, -1.0), np.where(closed, 0.0, old_position))
+        self._entry_price = np.where(opened, prices[self._cursor], np.where(closed, 0.0, self._entry_price))
+        self._last_action = actions.copy()
+
+        self._cursor += 1
+        self._episode_steps += 1
+        ended = self._cursor >= len(prices)
+        live = ~ended
+        cursor = np.minimum(self._cursor, len(prices) - 1)
+        change = prices[cursor] - prices[cursor - 1]
+
+        # finished environments keep their last observation until they are reset
+        if live.any():
+            window = self._window[live]
+            window[:, :-1] = window[:, 1:]
+            window[:, -1, 0] = change[live]
+            window[:, -1, 1] = self._position[live]
+            entry_price = self._entry_price[live]
+            window[:, -1, 2] = np.where(entry_price != 0, prices[cursor[live]] - entry_price, 0)
+            self._window[live] = window
+
+        held = old_position != 0
+        raw = np.where(
+            held,
+            np.where(actions == CLOSE, old_position * old_unrealized + old_position * change, np.where(actions == HOLD, -1.0, -10.0)),
+            np.where(actions == CLOSE, -10.0, np.where(actions == HOLD, -1.0, 1.0)),
+        )
+        self._equity += np.where(live & held & (actions == CLOSE), raw, 0)
+        rewards = np.where(live, 2 / (1 + np.exp(-raw)) - 1, 0.0).astype(np.float32)
+
+        truncated = live & (self._episode_steps >= self._episode_length) if self._episode_length is not None else np.zeros_like(live)
+        dones = ended | truncated
+        observations = self._window.astype(np.float16)
+        infos: List[Dict[str, Any]] = [{} for _ in range(self.num_envs)]
+        if dones.any():
+            finished = np.flatnonzero(dones)
+            for env in finished:
+                infos[env]['terminal_observation'] = observations[env].copy()
+                # episodes cut by their length are bootstrapped by SB3, the ones that ran out of replay are not
+                infos[env]['TimeLimit.truncated'] = bool(truncated[env])
+            self._reset_envs(finished)
+            observations[finished] = self._window[finished].astype(np.float16)
+
+        return observations, rewards, dones, infos
+
+    def get_stats(self, env: int = 0) -> Dict[str, Any]:
+        cursor = min(int(self._cursor[env]), len(self._prices) - 1)
+        return {
+            'equity': float(self._equity[env]),
+            'position': int(self._position[env]),
+            'last_action': int(self._last_action[env]) if self._last_action[env] >= 0 else None,
+            'last_price': float(self._prices[cursor]),
+            'last_to_last_price': float(self._prices[cursor - 1]),
+        }
+
+    def close(self) -> None:
+        ...
+
+    def get_attr(self, attr_name: str, indices: VecEnvIndices = None) -> List[Any]:
+        return [getattr(self, attr_name) for _ in self._get_indices(indices)]
+
+    def set_attr(self, attr_name: str, value: Any, indices: VecEnvIndices = None) -> None:
+        # the environments share their attributes, one of them cannot be set apart from the others
+        assert sorted(self._get_indices(indices)) == list(range(self.num_envs)), "Attributes can only be set for all the environments"
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name: str, *method_args: Any, indices: VecEnvIndices = None, **method_kwargs: Any) -> List[Any]:
+        if method_name == 'get_stats':
+            return [self.get_stats(env) for env in self._get_indices(indices)]
+        return [getattr(self, method_name)(*method_args, **method_kwargs) for _ in self._get_indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class: type, indices: VecEnvIndices = None) -> List[bool]:
+        return [False for _ in self._get_indices(indices)]
+
+    def get_images(self) -> Sequence[Optional[np.ndarray]]:
+        return [None for _ in range(self.num_envs)]
@@ -1,16 +1,25 @@
-from typing import Dict, Any
-from ta import volatility, momentum
+from typing import Dict, Any, Optional
+from datetime import datetime
+import numpy as np
+import pandas as pd
 
 from agentopy import IEnvironmentComponent, IState, WithActionSpaceMixin, State, EntityInfo, ActionResult, Action
 
 from frankenstein.lib.trading.schemas import Signal
 from frankenstein.lib.trading.protocols import IDataProvider
+from frankenstein.lib.trading.latency import LatencyRecorder, instrument
+from frankenstein.lib.trading.indicators import IndicatorTable, StreamingBollinger, StreamingRSI, StreamingStochastic
+from frankenstein.lib.trading.utils import timeframe_ns
+from frankenstein.lib.trading.tick_store import to_ns
+from frankenstein.lib.trading.signals import SignalSeries, build_indicators, compute_directions, signal_direction
 
 
 class SignalProvider(WithActionSpaceMixin, IEnvironmentComponent):
-    def __init__(self, data_provider: IDataProvider, symbol: str) -> None:
+    def __init__(self, data_provider: IDataProvider, symbol: str, latency: Optional[LatencyRecorder] = None) -> None:
         super().__init__()
         self._data_provider = data_provider
+        self._latency = latency
+        instrument(self, {'_tick': 'signal_provider.tick'}, latency)
         
         self._status: Dict[str, Any] = dict()
         self._prepared = False
@@ -18,8 +27,11 @@ class SignalProvider(WithActionSpaceMixin, IEnvironmentComponent):
         
         self.symbol = symbol
         
-        self.rsi_bars_dict = {}
-        self.bands_bars_dict = {}
+        self._indicators: Dict[str, IndicatorTable] = {}
+        self._series: Optional[SignalSeries] = None
+        # the replay schedule the series was precomputed on, a reset of the data provider replaces it
+        self._series_schedule: Optional[np.ndarray] = None
+        self._streams: Optional[Dict[str, Any]] = None
         
         self._prepare(
             bands_enabled=True,
@@ -35,11 +47,14 @@ class SignalProvider(WithActionSpaceMixin, IEnvironmentComponent):
             stochastic_period=14
         )
         
-        self._last_signal = Signal(self._data_provider.get_time(), 0, None, None, 'No signal', self.symbol)
-        
         self.action_space.register_actions([
             Action('signal_provider_setup', "Sets the parameters", self.setup, self.info()),
+            Action('signal_provider_precompute', "Precomputes the signals of the current replay", self.precompute, self.info()),
+            Action('signal_provider_save_series', "Saves the precomputed signals to a file", self.save_series, self.info()),
         ])  
+        
+        # streamed ticks of the symbol update the signal as they arrive
+        self._data_provider.on_ticks(self.on_ticks)
     
     async def setup(self, 
         *,
@@ -56,19 +71,22 @@ class SignalProvider(WithActionSpaceMixin, IEnvironmentComponent):
         stochastic_period: int,
         caller_context: IState
     ) -> ActionResult:
-        self._prepare(
-            bands_enabled=bands_enabled,
-            bands_timeframe=bands_timeframe, 
-            bands_window=bands_window, 
-            bands_dev=bands_dev, 
-            rsi_enabled=rsi_enabled,
-            rsi_timeframe=rsi_timeframe, 
-            rsi_period=rsi_period,
-            stochastic_enabled=stochastic_enabled,
-            stochastic_timeframe=stochastic_timeframe,
-            stochastic_period=stochastic_period,
-            stochastic_smooth=stochastic_smooth
-        )
+        try:
+            self._prepare(
+                bands_enabled=bands_enabled,
+                bands_timeframe=bands_timeframe, 
+                bands_window=bands_window, 
+                bands_dev=bands_dev, 
+                rsi_enabled=rsi_enabled,
+                rsi_timeframe=rsi_timeframe, 
+                rsi_period=rsi_period,
+                stochastic_enabled=stochastic_enabled,
+                stochastic_timeframe=stochastic_timeframe,
+                stochastic_period=stochastic_period,
+                stochastic_smooth=stochastic_smooth
+            )
+        except AssertionError as e:
+            return ActionResult(value=str(e), success=False)
         return ActionResult(value="OK", success=True)
     
     def _prepare(self, 
@@ -86,6 +104,11 @@ class SignalProvider(WithActionSpaceMixin, IEnvironmentComponent):
         stochastic_smooth: int,
     ) -> None:
         
+        for name, enabled, timeframe in (('bands', bands_enabled, bands_timeframe), ('rsi', rsi_enabled, rsi_timeframe),
+                                         ('stochastic', stochastic_enabled, stochastic_timeframe)):
+            # the indicators are computed on bars, ticks have no period to stream them by
+            assert not enabled or timeframe_ns(timeframe) > 0, f"{name} needs a bar timeframe, got {timeframe}"
+        
         self._params = {
             'bands_enabled': bands_enabled,
             'bands_timeframe': bands_timeframe,
@@ -100,121 +123,195 @@ class SignalProvider(WithActionSpaceMixin, IEnvironmentComponent):
             'stochastic_smooth': stochastic_smooth,
         }
         
-        # bands
-        if bands_enabled:
-            bands_bars = self._data_provider.bars(self.symbol, bands_timeframe)
-            
-            bands_bars['hband'] = volatility.bollinger_hband(
-                bands_bars['close'], window=int(bands_window), window_dev=int(bands_dev))
-            bands_bars['lband'] = volatility.bollinger_lband(
-                bands_bars['close'], window=int(bands_window), window_dev=int(bands_dev))
-            
-            bands_bars['mband'] = volatility.bollinger_mavg(
-                bands_bars['close'], window=int(bands_window))
-            
-            self.bands_bars_dict = bands_bars.to_dict('index')
+        self._indicators = build_indicators(self._params, lambda timeframe: self._data_provider.bars(self.symbol, timeframe))
         
-        # rsi
-        if rsi_enabled:
-            rsi_bars = self._data_provider.bars(self.symbol, rsi_timeframe)
-            
-            rsi_bars['rsi'] = momentum.rsi(rsi_bars['close'], window=int(rsi_period))
-            
-            self.rsi_bars_dict = rsi_bars.to_dict('index')
+        self._series = None
+        self._series_schedule = None
+        self._streams = None
+        self._last_timestamp = self._data_provider.get_time()
+        self._last_direction = None
+        self._last_values = None
+        self._last_signal = None
+        self._prepared = True
+    
+    def _values(self, timestamp: datetime) -> Optional[Dict[str, float]]:
+        """Returns the bid and the indicator values of the latest completed bars, None if one of them is missing"""
+        values = {'bid': 0, 'hband': 0, 'lband': 0, 'mband': 0, 'rsi': 0, 'stochastic': 0}
+        timestamp_ns = to_ns(timestamp)
         
-        # stochastic
+        for name, columns in (('bands', ('hband', 'lband', 'mband')), ('rsi', ('rsi',)), ('stochastic', ('stoch',))):
+            if not self._params[f'{name}_enabled']:
+                continue
+            table = self._indicators[name]
+            position = table.position(timestamp_ns)
+            if position < 0:
+                return None
+            for column in columns:
+                values['stochastic' if column == 'stoch' else column] = table.value(column, position)
         
-        if stochastic_enabled:
-            stochastic_bars = self._data_provider.bars(self.symbol, stochastic_timeframe)
+        bid = self._data_provider.bid(self.symbol, timestamp)
+        if bid is None:
+            return None
+        values['bid'] = bid
+        return values
+    
+    def indicator(self, column: str, timestamp: datetime) -> float:
+        """
+        Returns one indicator value (hband, lband, mband, rsi or stoch) of the latest completed bar, nan if there is none.
+        Bind it with functools.partial to feed the indicator to TradingEnv as an extra feature.
+        """
+        assert self._prepared, "Signal provider is not prepared"
+        name = 'bands' if column in ('hband', 'lband', 'mband') else 'rsi' if column == 'rsi' else 'stochastic'
+        table = self._indicators[name]
+        position = table.position(to_ns(timestamp))
+        return np.nan if position < 0 else float(table.value(column, position))
+
+    def _create_streams(self, timestamp_ns: int) -> Dict[str, Any]:
+        """
+        Creates the streaming indicators and warms them up on the bars of the indicator tables completed at the timestamp.
+        The bar still forming when the tables were built is dropped from them, it is appended once it completes.
+        """
+        streams = {}
+        for name in ('bands', 'rsi', 'stochastic'):
+            if not self._params[f'{name}_enabled']:
+                continue
+            if name == 'bands':
+                streams[name] = StreamingBollinger(self._params['bands_window'], self._params['bands_dev'])
+            elif name == 'rsi':
+                streams[name] = StreamingRSI(self._params['rsi_period'])
+            else:
+                streams[name] = StreamingStochastic(self._params['stochastic_period'])
             
-            stochastic_bars['stoch'] = momentum.stoch(stochastic_bars['high'], stochastic_bars['low'], stochastic_bars['close'], window=int(stochastic_period), smooth_window=int(stochastic_smooth))
+            table = self._indicators[name]
+            table.truncate(table.position(timestamp_ns) + 1)
+            bars = self._data_provider.bars(self.symbol, self._params[f'{name}_timeframe'])
+            bars = bars[pd.DatetimeIndex(bars.index).as_unit('ns').asi8 <= table.last_bar()]
+            for high, low, close in zip(bars['high'].to_numpy(), bars['low'].to_numpy(), bars['close'].to_numpy()):
+                self._stream_update(streams[name], name, high, low, close)
+        return streams
+    
+    def _stream_update(self, stream: Any, name: str, high: float, low: float, close: float) -> Dict[str, float]:
+        if name == 'bands':
+            hband, lband, mband = stream.update(close)
+            return {'hband': hband, 'lband': lband, 'mband': mband}
+        if name == 'rsi':
+            return {'rsi': stream.update(close)}
+        return {'stoch': stream.update(high, low, close)}
+    
+    def _update_live(self, timestamp: datetime) -> None:
+        """Feeds the bars completed since the last update to the streaming indicators and appends their values"""
+        timestamp_ns = to_ns(timestamp)
+        if self._streams is None:
+            self._streams = self._create_streams(timestamp_ns)
+
+        for name, stream in self._streams.items():
+            table = self._indicators[name]
+            timeframe = self._params[f'{name}_timeframe']
+            period_ns = timeframe_ns(timeframe)
+            last_bar = table.last_bar()
+            # the bar after the last one is not completed yet
+            if timestamp_ns < last_bar + 2 * period_ns:
+                continue
             
-            self.stochastic_bars_dict = stochastic_bars.to_dict('index')
-        
-        self._last_signal = Signal(self._data_provider.get_time(), 0, None, None, 'No signal', self.symbol)
-        self._prepared = True
+            max_bars = (timestamp_ns - last_bar) // period_ns + 1 if last_bar >= 0 else None
+            bars = self._data_provider.bars(self.symbol, timeframe, timestamp, max_bars)
+            starts = pd.DatetimeIndex(bars.index).as_unit('ns').asi8
+            completed = (starts > last_bar) & (starts + period_ns <= timestamp_ns)
+            for start, high, low, close in zip(starts[completed], bars['high'].to_numpy()[completed], bars['low'].to_numpy()[completed], bars['close'].to_numpy()[completed]):
+                table.append(int(start), self._stream_update(stream, name, high, low, close))
+    
+    async def on_ticks(self, symbol: str) -> None:
+        if symbol == self.symbol:
+            await self._tick()
     
     async def tick(self) -> None:
-        stochastic = 0
-        rsi = 0
-        hband = 0
-        lband = 0
-        mband = 0
-        
-        try:
-            timestamp = self._data_provider.get_time()
-            assert timestamp is not None
-            assert self._prepared
-            
-            timestamp = timestamp.replace(microsecond=0, second=0)
-            
-            if self._params['bands_enabled']:
-                
-                hband = self.bands_bars_dict[timestamp]['hband']
-                lband = self.bands_bars_dict[timestamp]['lband']
-                mband = self.bands_bars_dict[timestamp]['mband']
-                
-            if self._params['rsi_enabled']:
-                
-                rsi = self.rsi_bars_dict[timestamp]['rsi']
-            
-            if self._params['stochastic_enabled']:
-                stochastic = self.stochastic_bars_dict[timestamp]['stoch']
-            
-            pass
-        except (AssertionError, KeyError) as e:
-            self._last_signal = Signal(timestamp, 0, None, None, 'No signal', self.symbol)
+        # with a feed attached the ticks are handled as they are pushed, the tick loop would handle them again
+        if self._data_provider.is_fed():
             return
+        await self._tick()
+    
+    async def _tick(self) -> None:
+        timestamp = self._data_provider.get_time()
+        self._last_signal = None
+        self._last_direction = None
+        self._last_values = None
+        self._last_timestamp = timestamp
         
-        direction = 0
-        bid = self._data_provider.bid(self.symbol)
-        if bid is None:
-            self._last_signal = Signal(timestamp, 0, None, None, 'No signal', self.symbol)
+        if timestamp is None or not self._prepared:
             return
         
-        comment = 'Action'
+        if self._data_provider.is_live():
+            self._update_live(timestamp)
         
-        n_indicators = 0
-        direction = 0
+        if self._series is not None and self._data_provider.replay_timestamps() is not self._series_schedule:
+            self._series = None
+            self._series_schedule = None
         
-        if self._params['bands_enabled']:
-            n_indicators += 1
-            if bid > hband:
-                direction -= 100
-                comment = f'Short, because bid > h, bid: {bid}, h: {hband}, bar_ts: {timestamp}'
-            elif bid > mband:
-                direction -= 50
-                comment = f'Short, because bid > m, bid: {bid}, m: {mband}, bar_ts: {timestamp}'
-            
-            if bid < lband:
-                direction += 100
-                comment = f'Long, because bid < l, bid: {bid}, l: {lband}, bar_ts: {timestamp}'
-            elif bid < mband:
-                direction += 50
-                comment = f'Long, because bid < m, bid: {bid}, m: {mband}, bar_ts: {timestamp}'
-        
-        if self._params['rsi_enabled']:
-            n_indicators += 1
-            direction += 100 - 2 * rsi    
-        
-        if self._params['stochastic_enabled']:
-            n_indicators += 1
-            direction += 100 - 2 * stochastic
-        
-        if n_indicators == 0:
-            self._last_signal = Signal(timestamp, 0, None, None, 'No signal', self.symbol)
-            return
-        
-        direction /= n_indicators
-        comment = f'bid: {bid}, rsi: {rsi}, stochastic: {stochastic}, mband: {mband}, hband: {hband}, lband: {lband}, bar_ts: {timestamp}'
+        if self._series is not None:
+            step = self._series.index(to_ns(timestamp))
+            if step >= 0:
+                direction = self._series.directions[step]
+                self._last_direction = None if np.isnan(direction) else float(direction)
+                return
         
-        self._last_signal = Signal(timestamp, direction, None, None, comment, self.symbol)
+        values = self._values(timestamp)
+        if values is None:
+            return
         
+        self._last_values = values
+        direction = signal_direction(self._params, **values)
+        if direction is not None and not np.isnan(direction):
+            self._last_direction = direction
+    
+    def signal(self) -> Signal:
+        """
+        Returns the signal of the last tick, built once per tick on the first request.
+        The comment reuses the values the tick computed, they are only looked up when the tick took its direction
+        from the precomputed series.
+        """
+        if self._last_signal is None:
+            timestamp = self._last_timestamp
+            values = None
+            if self._last_direction is not None:
+                values = self._last_values if self._last_values is not None else self._values(timestamp)
+            if values is None:
+                self._last_signal = Signal(timestamp, 0, None, None, 'No signal', self.symbol)
+            else:
+                comment = f'bid: {values["bid"]}, rsi: {values["rsi"]}, stochastic: {values["stochastic"]}, mband: {values["mband"]}, hband: {values["hband"]}, lband: {values["lband"]}, bar_ts: {timestamp}'
+                self._last_signal = Signal(timestamp, self._last_direction, None, None, comment, self.symbol)
+        return self._last_signal
+    
+    def batch(self, timestamps_ns: Optional[np.ndarray] = None) -> SignalSeries:
+        """
+        Computes the directions of a whole replay window in one vectorized pass.
+        Defaults to the steps of the data provider's current replay.
+        """
+        assert self._prepared, "Signal provider is not prepared"
+        if timestamps_ns is None:
+            timestamps_ns = self._data_provider.replay_timestamps()
+        bid = self._data_provider.prices(self.symbol, 'bid', timestamps_ns)
+        return SignalSeries(timestamps_ns, compute_directions(self._params, self._indicators, timestamps_ns, bid))
+    
+    async def precompute(self, *, caller_context: IState) -> ActionResult:
+        try:
+            self._series = self.batch()
+        except (AssertionError, ValueError) as e:
+            return ActionResult(value=str(e), success=False)
+        self._series_schedule = self._data_provider.replay_timestamps()
+        return ActionResult(value=f"Precomputed {len(self._series)} steps", success=True)
+    
+    async def save_series(self, *, path: str, caller_context: IState) -> ActionResult:
+        if self._series is None:
+            return ActionResult(value="No precomputed series", success=False)
+        self._series.save(path)
+        return ActionResult(value="OK", success=True)
     
     async def observe(self, caller_context: IState) -> IState:
         state = State()
+        if self._latency is not None:
+            self._status['latency_us'] = self._latency.summary('signal_provider.')
         state.set_item('status', self._status)
-        state.set_item('signal', self._last_signal)
+        state.set_item('signal', self.signal())
         state.set_item('symbol', self.symbol)
         state.set_item('params', self._params)
         return state
@@ -0,0 +1,143 @@
+import argparse
+import json
+import shutil
+from datetime import datetime, UTC
+from pathlib import Path
+from typing import Any, Dict, Tuple
+import numpy as np
+
+from frankenstein.lib.trading.tick_store import TickStore
+from frankenstein.lib.trading.utils import iter_mt5_ticks_csv, load_mt5_bars_csv
+
+ARCHIVE_VERSION = 1
+ARCHIVE_COLUMNS = ('timestamps', 'ask', 'bid', 'volume')
+ARCHIVE_DTYPES = {'timestamps': np.dtype(np.int64), 'ask': np.dtype(np.float64), 'bid': np.dtype(np.float64), 'volume': np.dtype(np.float64)}
+META_FILENAME = 'meta.json'
+
+
+def write_archive(path: str | Path, store: TickStore, **meta: Any) -> Dict[str, Any]:
+    """
+    Writes the store as a directory of per-column .npy files plus a meta.json with the row count and time range.
+    Returns the written meta.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+
+    for column in ARCHIVE_COLUMNS:
+        np.save(path / f"{column}.npy", np.ascontiguousarray(getattr(store, column), dtype=ARCHIVE_DTYPES[column]))
+
+    meta = {
+        **meta,
+        'version': ARCHIVE_VERSION,
+        'rows': len(store),
+        'start': store.start(),
+        'end': store.end(),
+    }
+    with open(path / META_FILENAME, 'w', encoding='utf-8') as stream:
+        json.dump(meta, stream)
+    return meta
+
+
+def read_archive_meta(path: str | Path) -> Dict[str, Any]:
+    with open(Path(path) / META_FILENAME, 'r', encoding='utf-8') as stream:
+        meta = json.load(stream)
+    if meta.get('version') != ARCHIVE_VERSION:
+        raise ValueError(f"Unsupported archive version {meta.get('version')} in {path}")
+    return meta
+
+
+def archive_range(path: str | Path) -> Tuple[datetime, datetime]:
+    """Returns the first and last timestamps recorded in the archive without touching the columns"""
+    meta = read_archive_meta(path)
+    if meta['rows'] == 0:
+        raise ValueError(f"Archive {path} is empty")
+    return (
+        datetime.fromtimestamp(meta['start'] // 10**9, UTC),
+        datetime.fromtimestamp(meta['end'] // 10**9, UTC),
+    )
+
+
+def load_archive(path: str | Path, mmap: bool = True) -> TickStore:
+    """Loads the archive as a TickStore, memory-mapping the columns read-only unless mmap is False"""
+    path = Path(path)
+    meta = read_archive_meta(path)
+    columns = [np.load(path / f"{column}.npy", mmap_mode='r' if mmap else None) for column in ARCHIVE_COLUMNS]
+    assert all(len(column) == meta['rows'] for column in columns), f"Archive {path} is corrupted"
+    return TickStore(*columns)
+
+
+class ArchiveWriter:
+    """
+    Writes an archive chunk by chunk without holding it in memory.
+    Columns are streamed to raw part files and turned into .npy files once the row count is known.
+    """
+
+    def __init__(self, path: str | Path, **meta: Any) -> None:
+        self._path = Path(path)
+        self._path.mkdir(parents=True, exist_ok=True)
+        self._meta = meta
+        self._rows = 0
+        self._start: int | None = None
+        self._end: int | None = None
+        self._parts = {column: open(self._path / f"{column}.part", 'wb') for column in ARCHIVE_COLUMNS}
+
+    def append(self, store: TickStore) -> None:
+        if len(store) == 0:
+            return
+        if self._end is not None and store.timestamps[0] < self._end:
+            raise ValueError("Chunks must be appended in time order")
+        for column in ARCHIVE_COLUMNS:
+            values = np.ascontiguousarray(getattr(store, column), dtype=ARCHIVE_DTYPES[column])
+            self._parts[column].write(values.tobytes())
+        if self._start is None:
+            self._start = int(store.timestamps[0])
+        self._end = int(store.timestamps[-1])
+        self._rows += len(store)
+
+    def close(self) -> Dict[str, Any]:
+        """Finalizes the .npy files and writes meta.json, returns the written meta"""
+        for column, part in self._parts.items():
+            part.close()
+            header = {'descr': np.lib.format.dtype_to_descr(ARCHIVE_DTYPES[column]), 'fortran_order': False, 'shape': (self._rows,)}
+            with open(self._path / f"{column}.npy", 'wb') as target, open(self._path / f"{column}.part", 'rb') as source:
+                np.lib.format.write_array_header_1_0(target, header)
+                shutil.copyfileobj(source, target)
+            (self._path / f"{column}.part").unlink()
+
+        meta = {
+            **self._meta,
+            'version': ARCHIVE_VERSION,
+            'rows': self._rows,
+            'start': self._start,
+            'end': self._end,
+        }
+        with open(self._path / META_FILENAME, 'w', encoding='utf-8') as stream:
+            json.dump(meta, stream)
+        return meta
+
+
+def convert_mt5_csv(filename: str | Path, path: str | Path, bars: bool = False, block_size: int = 64 << 20) -> Dict[str, Any]:
+    """
+    Parses an MT5 ticks or bars csv export once and writes it as an archive.
+    Ticks are streamed chunk by chunk so exports larger than memory can be converted.
+    """
+    if bars:
+        df = load_mt5_bars_csv(str(filename))
+        return write_archive(path, TickStore.from_dataframe(df), source=str(filename), bars=bars)
+
+    writer = ArchiveWriter(path, source=str(filename), bars=bars)
+    for chunk in iter_mt5_ticks_csv(str(filename), block_size):
+        writer.append(chunk)
+    return writer.close()
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description="Converts an MT5 csv export to a memory-mappable archive")
+    argparser.add_argument("filename", help="Path to the MT5 csv file")
+    argparser.add_argument("archive", help="Path to the output archive directory")
+    argparser.add_argument("--bars", action="store_true", help="The csv contains bars instead of ticks")
+    argparser.add_argument("--block-size", type=int, default=64 << 20, help="Size in bytes of the csv chunks read at once")
+    args = argparser.parse_args()
+
+    meta = convert_mt5_csv(args.filename, args.archive, bars=args.bars, block_size=args.block_size)
+    print(f"Wrote {meta['rows']} rows to {args.archive}")
@@ -0,0 +1,120 @@
+from typing import Callable, List, Tuple
+import numpy as np
+
+from frankenstein.lib.trading.protocols import IDataProvider
+from frankenstein.lib.trading.schemas import BacktestParams, BacktestResult
+from frankenstein.lib.trading.signals import SignalSeries
+
+TRADE_DTYPE = np.dtype([
+    ('open_step', np.int64),
+    ('close_step', np.int64),
+    ('open_timestamp', np.int64),
+    ('close_timestamp', np.int64),
+    ('is_long', np.bool_),
+    ('open_price', np.float64),
+    ('pl', np.float64),
+    ('profit', np.float64),
+    ('close_reason', np.int8),
+])
+
+CLOSE_REASON_OPEN = 0
+CLOSE_REASON_SIGNAL = 1
+CLOSE_REASON_TP_SL = 2
+
+
+def _first(mask: Callable[[int, int], np.ndarray], start: int, n: int, chunk: int = 256) -> int:
+    """Returns the first position >= start where the lazily computed mask is True, n if there is none"""
+    while start < n:
+        stop = min(n, start + chunk)
+        hits = np.flatnonzero(mask(start, stop))
+        if len(hits):
+            return start + int(hits[0])
+        start = stop
+        chunk *= 2
+    return n
+
+
+def run_backtest(timestamps_ns: np.ndarray, directions: np.ndarray, ask: np.ndarray, bid: np.ndarray, params: BacktestParams) -> BacktestResult:
+    """
+    Replays TradingPolicy's threshold rules and Broker's TP/SL handling for a single symbol over precomputed step arrays.
+    At every step the broker marks the open position to market and closes it on TP/SL first, then the policy acts.
+    Only trades are iterated in Python, the steps in between are scanned with vectorized comparisons.
+    Amounts are not converted: the symbol must be quoted in the account currency, the Broker converts the others.
+    """
+    n = len(timestamps_ns)
+    # NaN means no signal, every comparison with it is False so the policy holds
+    direction = np.asarray(directions, dtype=np.float64)
+    ask = np.asarray(ask, dtype=np.float64)
+    bid = np.asarray(bid, dtype=np.float64)
+    # Broker.tick marks to market with prices rounded to 5 digits, Broker.open fills at the raw prices
+    ask_rounded = np.round(ask, 5)
+    bid_rounded = np.round(bid, 5)
+
+    open_long = direction >= params.long_open_threshold
+    open_short = ~open_long & (direction <= -params.short_open_threshold)
+    close_long = direction <= -params.long_close_threshold
+    close_short = direction >= params.short_close_threshold
+    # Broker.open refuses a position whose margin, at the raw mid, is over the free margin, the whole equity when flat
+    if params.leverage > 0:
+        margin = params.lot_size * params.lot_in_units * (ask + bid) / 2 / params.leverage
+    else:
+        margin = np.zeros(n)
+
+    equity = np.empty(n, dtype=np.float64)
+    balance = float(params.balance)
+    trades: List[Tuple] = []
+
+    step = 0
+    while step < n:
+        entry = _first(lambda a, b: (open_long[a:b] | open_short[a:b]) & (margin[a:b] <= balance), step, n)
+        equity[step:entry] = balance
+        if entry == n:
+            break
+
+        is_long = bool(open_long[entry])
+        price = ask[entry] if is_long else bid[entry]
+        close_signal = close_long if is_long else close_short
+        equity[entry] = balance
+
+        def pl_points(a: int, b: int) -> np.ndarray:
+            pl = bid_rounded[a:b] - price if is_long else price - ask_rounded[a:b]
+            return pl / params.point
+
+        def exit_mask(a: int, b: int) -> np.ndarray:
+            pl = pl_points(a, b)
+            return (pl > params.tp) | (pl < -params.sl) | close_signal[a:b]
+
+        exit_step = _first(exit_mask, entry + 1, n)
+        held = pl_points(entry + 1, min(exit_step + 1, n))
+        # same operation order as Broker.tick so the curve matches it bit for bit
+        equity[entry + 1:entry + 1 + len(held)] = balance + params.lot_size * held * params.point * params.lot_in_units
+
+        if exit_step == n:
+            pl = float(held[-1]) if len(held) else 0.0
+            trades.append((entry, -1, timestamps_ns[entry], -1, is_long, price, pl, float(equity[-1]) - balance, CLOSE_REASON_OPEN))
+            break
+
+        pl = float(held[-1])
+        hit = pl > params.tp or pl < -params.sl
+        profit = float(equity[exit_step]) - balance
+        balance = float(equity[exit_step])
+        trades.append((entry, exit_step, timestamps_ns[entry], timestamps_ns[exit_step], is_long, price, pl, profit,
+                       CLOSE_REASON_TP_SL if hit else CLOSE_REASON_SIGNAL))
+        # after a TP/SL close the policy still acts on the same step, after its own close it waits for the next one
+        step = exit_step if hit else exit_step + 1
+
+    return BacktestResult(
+        trades=np.array(trades, dtype=TRADE_DTYPE),
+        equity=equity,
+        balance=balance,
+        pl=balance - float(params.balance),
+    )
+
+
+def backtest_replay(data_provider: IDataProvider, series: SignalSeries, symbol: str, params: BacktestParams) -> BacktestResult:
+    """Runs the backtest over the steps of the data provider's current replay with precomputed directions"""
+    timestamps = data_provider.replay_timestamps()
+    assert len(timestamps) == len(series) and np.array_equal(timestamps, series.timestamps), "Signals do not match the replay"
+    ask = data_provider.prices(symbol, 'ask', timestamps)
+    bid = data_provider.prices(symbol, 'bid', timestamps)
+    return run_backtest(timestamps, series.directions, ask, bid, params)
@@ -0,0 +1,89 @@
+from typing import Dict, Optional
+import numpy as np
+
+from frankenstein.lib.trading.tick_store import TickStore
+from frankenstein.lib.trading.utils import bucket_starts, timeframe_ns
+
+
+BAR_COLUMNS = ('timestamp', 'open', 'close', 'low', 'high', 'volume')
+
+
+class BarSeries:
+    """
+    Bars of a single timeframe built from a TickStore.
+    The series is aggregated once and then only extended with the ticks appended to the store since the last update,
+    windows up to a timestamp are slices of it with the last, possibly unfinished, bar recomputed from its ticks.
+    """
+
+    def __init__(self, store: TickStore, timeframe: str) -> None:
+        self._store = store
+        self._period_ns = timeframe_ns(timeframe)
+        self._size = 0
+        self._covered = 0
+        self._tick_start = np.empty(0, dtype=np.int64)
+        self._columns: Dict[str, np.ndarray] = {
+            name: np.empty(0, dtype=np.int64 if name == 'timestamp' else np.float64) for name in BAR_COLUMNS
+        }
+
+    def __len__(self) -> int:
+        self.update()
+        return self._size
+
+    def _reserve(self, size: int) -> None:
+        capacity = len(self._tick_start)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity, 16)
+        self._tick_start = np.resize(self._tick_start, capacity)
+        for name, values in self._columns.items():
+            self._columns[name] = np.resize(values, capacity)
+
+    def update(self) -> None:
+        """Aggregates the ticks appended to the store since the last update"""
+        n_ticks = len(self._store)
+        if n_ticks == self._covered:
+            return
+
+        # the last bar may have been unfinished, rebuild it together with the new ticks
+        keep = max(self._size - 1, 0)
+        first = int(self._tick_start[keep]) if self._size > 0 else 0
+
+        store = self._store
+        bid = store.bid[first:n_ticks]
+        keys, starts = bucket_starts(store.timestamps[first:n_ticks], self._period_ns)
+        ends = np.append(starts[1:], n_ticks - first) - 1
+
+        size = keep + len(starts)
+        self._reserve(size)
+        self._tick_start[keep:size] = starts + first
+        self._columns['timestamp'][keep:size] = keys
+        self._columns['open'][keep:size] = bid[starts]
+        self._columns['close'][keep:size] = bid[ends]
+        self._columns['low'][keep:size] = np.minimum.reduceat(bid, starts)
+        self._columns['high'][keep:size] = np.maximum.reduceat(bid, starts)
+        self._columns['volume'][keep:size] = np.add.reduceat(store.volume[first:n_ticks], starts)
+        self._size = size
+        self._covered = n_ticks
+
+    def window(self, timestamp_ns: Optional[int] = None, max_bars: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Returns the bars aggregated from the ticks at or before the timestamp, limited to the last max_bars"""
+        self.update()
+
+        stop = self._covered if timestamp_ns is None else self._store.locate(timestamp_ns) + 1
+        n_bars = int(np.searchsorted(self._tick_start[:self._size], stop - 1, side='right')) if stop > 0 else 0
+        start = 0 if max_bars is None else max(0, n_bars - max_bars)
+
+        window = {name: values[start:n_bars] for name, values in self._columns.items()}
+
+        bar_end = int(self._tick_start[n_bars]) if n_bars < self._size else self._covered
+        if n_bars > start and stop < bar_end:
+            # the last bar is not finished at the timestamp, rebuild it from its ticks
+            first = int(self._tick_start[n_bars - 1])
+            bid = self._store.bid[first:stop]
+            window = {name: values.copy() for name, values in window.items()}
+            window['close'][-1] = bid[-1]
+            window['low'][-1] = bid.min()
+            window['high'][-1] = bid.max()
+            window['volume'][-1] = self._store.volume[first:stop].sum()
+
+        return window
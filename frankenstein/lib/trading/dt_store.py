@@ -0,0 +1,139 @@
+from functools import cached_property
+from typing import Dict, Literal, Optional, Tuple
+import numpy as np
+import pandas as pd
+from datatable import dt, f, by
+
+from frankenstein.lib.trading.tick_store import TickStore, ns_index
+from frankenstein.lib.trading.utils import timeframe_ns
+
+
+def to_dt_frame(df: pd.DataFrame) -> dt.Frame:
+    """
+    Converts a frame indexed by timestamp with ask, bid and volume columns to a datatable Frame.
+    The timestamp column is taken from the index, like TickStore.from_dataframe does: dt.Frame(df) would drop the index
+    and keep the raw timestamp column, which differs from it in MT5 tick exports whose index is floored to the second.
+    """
+    store = TickStore.from_dataframe(df)
+    return dt.Frame({
+        'timestamp': store.timestamps.view('datetime64[ns]'),
+        'ask': store.ask,
+        'bid': store.bid,
+        'volume': store.volume,
+    })
+
+
+class DtTickStore:
+    """
+    Ticks of a single symbol held in a datatable Frame sorted by timestamp.
+    Time lookups are binary searches on its int64 nanosecond column, bars are aggregated with datatable's multithreaded group by.
+    """
+
+    def __init__(self, frame: dt.Frame) -> None:
+        frame = frame[:, ['timestamp', 'ask', 'bid', 'volume']]
+        if frame['timestamp'].stype != dt.stype.time64:
+            frame['timestamp'] = dt.as_type(f.timestamp, dt.Type.time64)
+        frame['ns'] = dt.as_type(f.timestamp, dt.Type.int64)
+
+        # sorted like TickStore.from_dataframe sorts, keying the frame would reject the repeated timestamps of tick exports
+        timestamps = frame['ns'].to_numpy().ravel()
+        if len(timestamps) > 1 and np.any(timestamps[1:] < timestamps[:-1]):
+            order = np.argsort(timestamps, kind='stable')
+            frame = frame[dt.Frame(order.astype(np.int64)), :]
+            timestamps = timestamps[order]
+
+        self.frame: dt.Frame = frame
+        self.timestamps: np.ndarray = np.ascontiguousarray(timestamps, dtype=np.int64)
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> 'DtTickStore':
+        """Builds the store from a frame indexed by timestamp, keyed on the index like TickStore.from_dataframe"""
+        return cls(to_dt_frame(df))
+
+    @cached_property
+    def ask(self) -> np.ndarray:
+        return self.frame['ask'].to_numpy().ravel()
+
+    @cached_property
+    def bid(self) -> np.ndarray:
+        return self.frame['bid'].to_numpy().ravel()
+
+    def __len__(self) -> int:
+        return self.frame.nrows
+
+    def locate(self, timestamp_ns: int) -> int:
+        """Returns the row of the last tick at or before the timestamp, -1 if there is none"""
+        return int(np.searchsorted(self.timestamps, timestamp_ns, side='right')) - 1
+
+    def price(self, price_type: Literal['ask', 'bid'], timestamp_ns: int) -> float:
+        """Returns the latest ask or bid at or before the timestamp, -1 if the price is not available"""
+        idx = self.locate(timestamp_ns)
+        if idx < 0:
+            return -1
+        return self.frame[idx, price_type]
+
+    def prices(self, price_type: Literal['ask', 'bid'], timestamps_ns: np.ndarray) -> np.ndarray:
+        """Vectorized price, -1 where the price is not available"""
+        idx = np.searchsorted(self.timestamps, timestamps_ns, side='right') - 1
+        if len(self.timestamps) == 0:
+            return np.full(len(idx), -1.0)
+        values = (self.ask if price_type == 'ask' else self.bid)[np.maximum(idx, 0)]
+        return np.where(idx >= 0, values, -1.0)
+
+    def bounds(self, timestamp_ns: Optional[int], max_ticks: Optional[int] = None) -> Tuple[int, int]:
+        stop = self.frame.nrows if timestamp_ns is None else self.locate(timestamp_ns) + 1
+        start = 0 if max_ticks is None else max(0, stop - max_ticks)
+        return start, stop
+
+    def to_dataframe(self, start: int = 0, stop: Optional[int] = None) -> pd.DataFrame:
+        stop = self.frame.nrows if stop is None else stop
+        rows = self.frame[start:stop, ['ask', 'bid', 'volume']].to_numpy()
+        index = ns_index(self.timestamps[start:stop])
+        df = pd.DataFrame({
+            'timestamp': index,
+            'ask': rows[:, 0],
+            'bid': rows[:, 1],
+            'volume': rows[:, 2],
+        }, index=index)
+        df.index.name = 'index'
+        return df
+
+    def _aggregate(self, start: int, stop: int, period_ns: int) -> dt.Frame:
+        bucket = f.ns if period_ns == 0 else f.ns // period_ns * period_ns
+        return self.frame[start:stop, :][:, {
+            'open': dt.first(f.bid),
+            'close': dt.last(f.bid),
+            'low': dt.min(f.bid),
+            'high': dt.max(f.bid),
+            'volume': dt.sum(f.volume),
+        }, by(bucket)]
+
+    def bars(self, timeframe: str, timestamp_ns: Optional[int] = None, max_bars: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Aggregates the ticks at or before the timestamp into bars, limited to the last max_bars"""
+        period_ns = timeframe_ns(timeframe)
+        _, stop = self.bounds(timestamp_ns)
+
+        start, span = 0, max_bars
+        if max_bars is not None and stop > 0:
+            # aggregate only the trailing ticks, widening the range until it holds max_bars bars or reaches the start
+            last_key = int(self.timestamps[stop - 1]) if period_ns == 0 else int(self.timestamps[stop - 1]) // period_ns * period_ns
+            while True:
+                if period_ns == 0:
+                    start = max(0, stop - span)
+                else:
+                    start = int(np.searchsorted(self.timestamps[:stop], last_key - (span - 1) * period_ns, side='left'))
+                grouped = self._aggregate(start, stop, period_ns)
+                if start == 0 or grouped.nrows >= max_bars:
+                    break
+                span *= 2
+        else:
+            grouped = self._aggregate(start, stop, period_ns)
+
+        if max_bars is not None:
+            grouped = grouped[-max_bars:, :]
+
+        names = ('timestamp', 'open', 'close', 'low', 'high', 'volume')
+        return {
+            name: grouped[:, i].to_numpy().ravel().astype(np.int64 if name == 'timestamp' else np.float64)
+            for i, name in enumerate(names)
+        }
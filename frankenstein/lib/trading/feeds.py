@@ -0,0 +1,154 @@
+from typing import Any, AsyncIterator, Optional
+import argparse
+import asyncio as aio
+import logging
+import math
+import time
+import numpy as np
+from orjson import loads, dumps
+from websockets import ConnectionClosed
+from websockets.asyncio.client import connect
+from websockets.asyncio.server import Server, ServerConnection, serve
+
+from frankenstein.lib.trading.archive import load_archive
+from frankenstein.lib.trading.schemas import TickBatch
+from frankenstein.lib.trading.tick_store import TickStore
+
+logger = logging.getLogger(__name__)
+
+
+def encode_batch(batch: TickBatch) -> bytes:
+    return dumps({
+        'symbol': batch.symbol,
+        'timestamps': batch.timestamps.tolist(),
+        'ask': batch.ask.tolist(),
+        'bid': batch.bid.tolist(),
+        'volume': batch.volume.tolist(),
+        'origin_ns': batch.origin_ns,
+    })
+
+
+def decode_batch(message: str | bytes) -> TickBatch:
+    data = loads(message)
+    return TickBatch(
+        data['symbol'],
+        np.array(data['timestamps'], dtype=np.int64),
+        np.array(data['ask'], dtype=np.float64),
+        np.array(data['bid'], dtype=np.float64),
+        np.array(data['volume'], dtype=np.float64),
+        int(data['origin_ns']),
+    )
+
+
+class WebsocketTickFeed:
+    """Streams the tick batches a websocket server pushes, a SimulatedExchange or a gateway to a live one"""
+
+    def __init__(self, uri: str) -> None:
+        self._uri = uri
+        self._connection: Any = None
+
+    async def batches(self) -> AsyncIterator[TickBatch]:
+        async with connect(self._uri) as connection:
+            self._connection = connection
+            try:
+                async for message in connection:
+                    yield decode_batch(message)
+            except ConnectionClosed as e:
+                logger.error(f"{e}")
+            finally:
+                self._connection = None
+
+    async def close(self) -> None:
+        if self._connection is not None:
+            await self._connection.close()
+
+
+class SimulatedExchange:
+    """
+    Serves the ticks of a store over websockets, replayed to every connection from its start.
+    Ticks are sent when they are due at speed times real time, in batches of the ticks due at once;
+    an infinite speed sends them as fast as the connection takes them.
+    """
+
+    def __init__(self, store: TickStore, symbol: str, host: str = 'localhost', port: int = 8765, speed: float = 1.0,
+                 start_ns: Optional[int] = None, end_ns: Optional[int] = None, max_batch: int = 1000) -> None:
+        assert speed > 0, "speed must be positive"
+        assert max_batch > 0, "max_batch must be positive"
+        self._store = store
+        self._symbol = symbol
+        self._host = host
+        self._port = port
+        self._speed = speed
+        self._max_batch = max_batch
+        self._start = 0 if start_ns is None else int(np.searchsorted(store.timestamps, start_ns, side='left'))
+        self._stop = len(store) if end_ns is None else int(np.searchsorted(store.timestamps, end_ns, side='right'))
+        self._server: Optional[Server] = None
+
+    async def start(self) -> None:
+        self._server = await serve(self._handler, self._host, self._port)
+
+    def port(self) -> int:
+        """Returns the port the server listens on, the one the system picked if it was started on port 0"""
+        assert self._server is not None, "Server is not started"
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handler(self, connection: ServerConnection) -> None:
+        try:
+            await self.replay(connection)
+        except ConnectionClosed:
+            pass
+
+    async def replay(self, connection: Any) -> None:
+        timestamps = self._store.timestamps
+        position, stop = self._start, self._stop
+        if position >= stop:
+            return
+        first_ns = int(timestamps[position])
+        started = time.perf_counter_ns()
+        while position < stop:
+            if math.isinf(self._speed):
+                due = stop
+            else:
+                replayed_ns = first_ns + int((time.perf_counter_ns() - started) * self._speed)
+                due = int(np.searchsorted(timestamps[position:stop], replayed_ns, side='right')) + position
+            if due == position:
+                wait_ns = (int(timestamps[position]) - first_ns) / self._speed - (time.perf_counter_ns() - started)
+                await aio.sleep(max(wait_ns, 0) / 1e9)
+                continue
+            end = min(due, position + self._max_batch)
+            batch = TickBatch(
+                self._symbol,
+                timestamps[position:end],
+                self._store.ask[position:end],
+                self._store.bid[position:end],
+                self._store.volume[position:end],
+                time.time_ns(),
+            )
+            await connection.send(encode_batch(batch))
+            position = end
+
+
+async def _serve_archive(archive: str, symbol: str, host: str, port: int, speed: float) -> None:
+    exchange = SimulatedExchange(load_archive(archive), symbol, host, port, speed)
+    await exchange.start()
+    logger.info(f"Replaying {archive} as {symbol} on ws://{host}:{exchange.port()} at {speed}x")
+    await aio.Future()
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description="Simulated exchange streaming the ticks of an archive over websockets")
+    argparser.add_argument("archive", help="Path to the archive directory")
+    argparser.add_argument("--symbol", default="EURUSD", help="Symbol of the ticks")
+    argparser.add_argument("--host", default="localhost", help="Host to listen on")
+    argparser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    argparser.add_argument("--speed", type=float, default=1.0, help="Replay speed relative to real time, inf for as fast as possible")
+    args = argparser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    aio.run(_serve_archive(args.archive, args.symbol, args.host, args.port, args.speed))
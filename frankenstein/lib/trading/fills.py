@@ -0,0 +1,24 @@
+from typing import Tuple
+import numpy as np
+
+
+def first_crossing(timestamps: np.ndarray, ask: np.ndarray, bid: np.ndarray, start_ns: int, stop_ns: int,
+                   is_long: bool, price: float, take_profit_pips: float, stop_loss_pips: float, point: float) -> Tuple[int, float]:
+    """
+    Finds the first tick in (start_ns, stop_ns] where the pl of a position goes over its take profit or under its stop loss.
+    The pl is measured as Broker.tick does, longs at the bid and shorts at the ask rounded to 5 digits.
+    Returns the position of the tick and the pl in points at it, (-1, nan) if neither limit is reached.
+    """
+    start = int(np.searchsorted(timestamps, start_ns, side='right'))
+    stop = int(np.searchsorted(timestamps, stop_ns, side='right'))
+    if start >= stop:
+        return -1, np.nan
+
+    if is_long:
+        pl = (np.round(bid[start:stop], 5) - price) / point
+    else:
+        pl = (price - np.round(ask[start:stop], 5)) / point
+    hits = np.flatnonzero((pl > take_profit_pips) | (pl < -stop_loss_pips))
+    if len(hits) == 0:
+        return -1, np.nan
+    return start + int(hits[0]), float(pl[hits[0]])
@@ -0,0 +1,174 @@
+from collections import deque
+from typing import Deque, Dict, Tuple
+import numpy as np
+import pandas as pd
+
+from frankenstein.lib.trading.utils import timeframe_ns
+
+
+class IndicatorTable:
+    """
+    Indicator values aligned with the bars of one timeframe.
+    A bar is visible from the moment it completes, so a lookup at time t returns the latest bar that ended at or before t.
+    """
+
+    def __init__(self, bar_timestamps: np.ndarray, timeframe: str, values: Dict[str, np.ndarray]) -> None:
+        assert all(len(column) == len(bar_timestamps) for column in values.values()), "Values must be aligned with the bars"
+        self._period_ns = timeframe_ns(timeframe)
+        # a bar is complete once its period is over
+        self._complete_at = np.asarray(bar_timestamps, dtype=np.int64) + self._period_ns
+        # copied, the columns ta returns can be read-only and appended bars are written in place after a truncate
+        self._values = {name: np.array(column, dtype=np.float64) for name, column in values.items()}
+        self._size = len(self._complete_at)
+        self._cursor = -1
+
+    @classmethod
+    def from_bars(cls, bars: pd.DataFrame, timeframe: str, values: Dict[str, pd.Series]) -> 'IndicatorTable':
+        timestamps = pd.DatetimeIndex(bars.index).as_unit('ns').asi8
+        return cls(timestamps, timeframe, {name: column.to_numpy(dtype=np.float64) for name, column in values.items()})
+
+    def __len__(self) -> int:
+        return self._size
+
+    def last_bar(self) -> int:
+        """Returns the start of the last bar in nanoseconds, -1 if the table is empty"""
+        return int(self._complete_at[self._size - 1]) - self._period_ns if self._size else -1
+
+    def append(self, bar_timestamp_ns: int, values: Dict[str, float]) -> None:
+        """Appends the values of a newly completed bar, growing the arrays geometrically"""
+        if self._size == len(self._complete_at):
+            capacity = max(16, 2 * self._size)
+            self._complete_at = np.resize(self._complete_at, capacity)
+            self._values = {name: np.resize(column, capacity) for name, column in self._values.items()}
+        self._complete_at[self._size] = bar_timestamp_ns + self._period_ns
+        for name, column in self._values.items():
+            column[self._size] = values[name]
+        self._size += 1
+
+    def truncate(self, size: int) -> None:
+        """Keeps the first size bars only, the bars after them are appended again once they complete"""
+        assert 0 <= size <= self._size, "size must be within the table"
+        self._size = size
+        self._cursor = -1
+
+    def position(self, timestamp_ns: int) -> int:
+        """
+        Returns the index of the latest completed bar at the timestamp, -1 if there is none.
+        Replays move forward, so the previous position is used as a cursor and advanced, falling back to a binary search.
+        """
+        complete_at = self._complete_at
+        cursor = self._cursor
+        n = self._size
+        if cursor < 0 or complete_at[cursor] <= timestamp_ns:
+            # advance by a few bars at most, otherwise jump
+            for _ in range(4):
+                if cursor + 1 < n and complete_at[cursor + 1] <= timestamp_ns:
+                    cursor += 1
+                else:
+                    self._cursor = cursor
+                    return cursor
+        self._cursor = int(np.searchsorted(complete_at[:n], timestamp_ns, side='right')) - 1
+        return self._cursor
+
+    def positions(self, timestamps_ns: np.ndarray) -> np.ndarray:
+        """Returns the index of the latest completed bar for every timestamp, -1 where there is none"""
+        return np.searchsorted(self._complete_at[:self._size], timestamps_ns, side='right') - 1
+
+    def column(self, name: str) -> np.ndarray:
+        return self._values[name][:self._size]
+
+    def value(self, name: str, position: int) -> float:
+        return self._values[name][position]
+
+
+class StreamingBollinger:
+    """Bollinger bands updated in O(1) per bar from a running sum and sum of squares over the window"""
+
+    def __init__(self, window: int, window_dev: float) -> None:
+        self._window = int(window)
+        self._window_dev = float(window_dev)
+        self._closes: Deque[float] = deque()
+        # values are shifted by the first close to keep the sums small and avoid cancellation
+        self._shift: float | None = None
+        self._sum = 0.0
+        self._sum_sq = 0.0
+
+    def update(self, close: float) -> Tuple[float, float, float]:
+        """Adds the close of a completed bar and returns (hband, lband, mband), NaN until the window is full"""
+        if self._shift is None:
+            self._shift = close
+        x = close - self._shift
+        self._closes.append(x)
+        self._sum += x
+        self._sum_sq += x * x
+        if len(self._closes) > self._window:
+            old = self._closes.popleft()
+            self._sum -= old
+            self._sum_sq -= old * old
+        if len(self._closes) < self._window:
+            return np.nan, np.nan, np.nan
+
+        mean = self._sum / self._window
+        std = np.sqrt(max(self._sum_sq / self._window - mean * mean, 0.0))
+        mband = mean + self._shift
+        return mband + self._window_dev * std, mband - self._window_dev * std, mband
+
+
+class StreamingRSI:
+    """RSI with Wilder smoothing of the up and down moves, as computed by ta.momentum.rsi"""
+
+    def __init__(self, window: int) -> None:
+        self._window = int(window)
+        self._alpha = 1 / self._window
+        self._last_close: float | None = None
+        self._ema_up = 0.0
+        self._ema_down = 0.0
+        self._count = 0
+
+    def update(self, close: float) -> float:
+        """Adds the close of a completed bar and returns the RSI, NaN until the window is full"""
+        diff = 0.0 if self._last_close is None else close - self._last_close
+        self._last_close = close
+        up, down = max(diff, 0.0), max(-diff, 0.0)
+        if self._count == 0:
+            self._ema_up, self._ema_down = up, down
+        else:
+            self._ema_up += self._alpha * (up - self._ema_up)
+            self._ema_down += self._alpha * (down - self._ema_down)
+        self._count += 1
+        if self._count < self._window:
+            return np.nan
+        if self._ema_down == 0:
+            return 100.0
+        return 100 - 100 / (1 + self._ema_up / self._ema_down)
+
+
+class StreamingStochastic:
+    """Stochastic %K over the window, the rolling high and low are kept in monotonic deques"""
+
+    def __init__(self, window: int) -> None:
+        self._window = int(window)
+        self._count = 0
+        self._highs: Deque[Tuple[int, float]] = deque()
+        self._lows: Deque[Tuple[int, float]] = deque()
+
+    def update(self, high: float, low: float, close: float) -> float:
+        """Adds a completed bar and returns the stochastic %K, NaN until the window is full"""
+        i = self._count
+        self._count += 1
+        while self._highs and self._highs[-1][1] <= high:
+            self._highs.pop()
+        self._highs.append((i, high))
+        while self._lows and self._lows[-1][1] >= low:
+            self._lows.pop()
+        self._lows.append((i, low))
+        while self._highs[0][0] <= i - self._window:
+            self._highs.popleft()
+        while self._lows[0][0] <= i - self._window:
+            self._lows.popleft()
+        if self._count < self._window:
+            return np.nan
+
+        smax, smin = self._highs[0][1], self._lows[0][1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return float(np.float64(100 * (close - smin)) / np.float64(smax - smin))
@@ -0,0 +1,156 @@
+from functools import wraps
+from pathlib import Path
+from time import perf_counter_ns
+from typing import Any, Callable, Dict, Optional
+import inspect
+import json
+import math
+import numpy as np
+
+
+class LatencyHistogram:
+    """
+    HDR-style histogram of nanosecond durations.
+    Buckets are log-linear, 2**(precision_bits - 1) of them per power of two, so every value is reported
+    within 2**(1 - precision_bits) of itself (under 2% by default) in constant memory and constant recording time.
+    """
+
+    def __init__(self, precision_bits: int = 7) -> None:
+        assert precision_bits >= 2, "precision_bits must be at least 2"
+        self._bits = precision_bits
+        self._half = 1 << (precision_bits - 1)
+        self._counts = [0] * ((64 - precision_bits + 2) * self._half)
+        # the running totals of the counts, summed once for all the percentiles read between two records
+        self._cumulative: Optional[np.ndarray] = None
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value_ns: int) -> None:
+        value_ns = max(int(value_ns), 0)
+        shift = value_ns.bit_length() - self._bits
+        self._counts[value_ns if shift <= 0 else shift * self._half + (value_ns >> shift)] += 1
+        self._cumulative = None
+        self.count += 1
+        self.total += value_ns
+        if value_ns > self.max:
+            self.max = value_ns
+
+    def _highest(self, index: int) -> int:
+        """Returns the highest value of a bucket"""
+        if index < 2 * self._half:
+            return index
+        shift = index // self._half - 1
+        return ((index - shift * self._half + 1) << shift) - 1
+
+    def percentile(self, q: float) -> int:
+        """Returns the highest value of the bucket holding the q-th percentile, 0 for an empty histogram"""
+        if self.count == 0:
+            return 0
+        rank = max(math.ceil(q / 100 * self.count), 1)
+        if self._cumulative is None:
+            self._cumulative = np.cumsum(self._counts)
+        index = int(np.searchsorted(self._cumulative, rank, side='left'))
+        return min(self._highest(index), self.max)
+
+    def merge(self, other: 'LatencyHistogram') -> None:
+        assert other._bits == self._bits, "Histograms must have the same precision"
+        self._counts = [a + b for a, b in zip(self._counts, other._counts)]
+        self._cumulative = None
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def summary(self) -> Dict[str, float]:
+        """Returns the count, the mean, the p50, p99, p999 and the max in microseconds"""
+        return {
+            'count': self.count,
+            'mean': self.total / self.count / 1000 if self.count else 0.0,
+            'p50': self.percentile(50) / 1000,
+            'p99': self.percentile(99) / 1000,
+            'p999': self.percentile(99.9) / 1000,
+            'max': self.max / 1000,
+        }
+
+    def buckets(self) -> Dict[int, int]:
+        """Returns the count of every non-empty bucket keyed by its highest value in nanoseconds"""
+        return {self._highest(index): count for index, count in enumerate(self._counts) if count}
+
+
+class LatencyRecorder:
+    """Histograms of the durations of the stages of a trading pipeline, keyed by stage name"""
+
+    def __init__(self, precision_bits: int = 7) -> None:
+        self._precision_bits = precision_bits
+        self._histograms: Dict[str, LatencyHistogram] = {}
+
+    def record(self, stage: str, value_ns: int) -> None:
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            histogram = self._histograms[stage] = LatencyHistogram(self._precision_bits)
+        histogram.record(value_ns)
+
+    def histogram(self, stage: str) -> Optional[LatencyHistogram]:
+        return self._histograms.get(stage)
+
+    def summary(self, prefix: str = '') -> Dict[str, Dict[str, float]]:
+        """Returns the summary of every stage starting with prefix, in microseconds"""
+        return {stage: histogram.summary() for stage, histogram in self._histograms.items() if stage.startswith(prefix)}
+
+    def reset(self) -> None:
+        self._histograms.clear()
+
+    def dump(self, path: str | Path) -> None:
+        """Writes the summary and the non-empty buckets of every stage as json, to a path that is trusted"""
+        with open(path, 'w', encoding='utf-8') as stream:
+            json.dump({
+                stage: {**histogram.summary(), 'buckets_ns': histogram.buckets()}
+                for stage, histogram in self._histograms.items()
+            }, stream)
+
+
+def dump_path(directory: str | Path, name: str) -> Path:
+    """
+    Returns the path of the file name in directory, creating the directory.
+    Names that are absolute or lead out of the directory are rejected with a ValueError.
+    """
+    directory = Path(directory).resolve()
+    path = (directory / name).resolve()
+    if Path(name).is_absolute() or path == directory or not path.is_relative_to(directory):
+        raise ValueError(f"{name} is not a file name in {directory}")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def timed(fn: Callable, stage: str, recorder: LatencyRecorder) -> Callable:
+    """Wraps a function or a coroutine function to record the duration of every call under stage"""
+    if inspect.iscoroutinefunction(fn):
+        @wraps(fn)
+        async def timed_coroutine(*args: Any, **kwargs: Any) -> Any:
+            started = perf_counter_ns()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                recorder.record(stage, perf_counter_ns() - started)
+        return timed_coroutine
+
+    @wraps(fn)
+    def timed_function(*args: Any, **kwargs: Any) -> Any:
+        started = perf_counter_ns()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            recorder.record(stage, perf_counter_ns() - started)
+    return timed_function
+
+
+def instrument(instance: Any, stages: Dict[str, str], recorder: Optional[LatencyRecorder]) -> None:
+    """
+    Replaces the methods of the instance named in stages by timed wrappers recording under the matching stage.
+    Without a recorder the instance is left untouched, so the hooks cost nothing unless they are configured;
+    components call it before registering their actions so the actions get the timed methods.
+    """
+    if recorder is None:
+        return
+    for name, stage in stages.items():
+        setattr(instance, name, timed(getattr(instance, name), stage, recorder))
@@ -0,0 +1,121 @@
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+TRADE_DTYPE = np.dtype([
+    ('symbol', 'U16'),
+    ('is_long', np.bool_),
+    ('price', np.float64),
+    ('volume', np.float64),
+    ('take_profit_pips', np.float64),
+    ('stop_loss_pips', np.float64),
+    ('open_timestamp', np.int64),
+    ('close_timestamp', np.int64),
+    ('pl', np.float64),
+    ('profit', np.float64),
+    ('is_open', np.bool_),
+])
+
+
+class TradeLedger:
+    """
+    Trades of a broker in a structured array grown geometrically, one row per trade.
+    Timestamps are int64 nanoseconds, -1 while a trade is open. The variable length comments are kept aside in lists.
+    """
+
+    def __init__(self, capacity: int = 1024) -> None:
+        self._rows = np.zeros(max(1, capacity), dtype=TRADE_DTYPE)
+        self._size = 0
+        self._open_comments: List[str] = []
+        self._close_comments: List[Optional[str]] = []
+        # running totals of the closed trades, so the summary does not scan the ledger
+        self._closed_count = 0
+        self._win_count = 0
+        self._loss_count = 0
+        self._gross_profit = 0.0
+        self._gross_loss = 0.0
+        self._pl_sum = 0.0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def rows(self) -> np.ndarray:
+        """The trades so far, a view on the ledger"""
+        return self._rows[:self._size]
+
+    def open(self, symbol: str, timestamp_ns: int, is_long: bool, price: float, volume: float,
+             take_profit_pips: float, stop_loss_pips: float, comment: str, pl: float = 0.0) -> int:
+        """Records a new open trade and returns its index"""
+        if self._size == len(self._rows):
+            self._rows = np.resize(self._rows, 2 * len(self._rows))
+        self._rows[self._size] = (symbol, is_long, price, volume, take_profit_pips, stop_loss_pips, timestamp_ns, -1, pl, 0.0, True)
+        self._open_comments.append(comment)
+        self._close_comments.append(None)
+        self._size += 1
+        return self._size - 1
+
+    def update(self, index: int, pl: float) -> None:
+        self._rows['pl'][index] = pl
+
+    def close(self, index: int, timestamp_ns: int, pl: float, profit: float, comment: str) -> None:
+        rows = self._rows
+        rows['close_timestamp'][index] = timestamp_ns
+        rows['pl'][index] = pl
+        rows['profit'][index] = profit
+        rows['is_open'][index] = False
+        self._close_comments[index] = comment
+
+        self._closed_count += 1
+        self._pl_sum += pl
+        if profit > 0:
+            self._win_count += 1
+            self._gross_profit += profit
+        elif profit < 0:
+            self._loss_count += 1
+            self._gross_loss += profit
+
+    def record(self, index: int) -> Dict[str, Any]:
+        row = self._rows[index]
+        record = {name: row[name].item() for name in TRADE_DTYPE.names}
+        record['open_comment'] = self._open_comments[index]
+        record['close_comment'] = self._close_comments[index]
+        return record
+
+    def recent(self, n: int) -> List[Dict[str, Any]]:
+        """Returns the last n trades as dicts, oldest first"""
+        return [self.record(i) for i in range(max(0, self._size - n), self._size)]
+
+    def summary(self) -> Dict[str, Any]:
+        """Returns the trade counts and the profit statistics of the closed trades"""
+        closed = self._closed_count
+        return {
+            'trade_count': self._size,
+            'open_count': self._size - closed,
+            'closed_count': closed,
+            'win_count': self._win_count,
+            'loss_count': self._loss_count,
+            'win_rate': self._win_count / closed if closed else 0.0,
+            'gross_profit': self._gross_profit,
+            'gross_loss': self._gross_loss,
+            'total_profit': self._gross_profit + self._gross_loss,
+            'average_pl': self._pl_sum / closed if closed else 0.0,
+        }
+
+    def to_arrow(self) -> pa.Table:
+        rows = self.rows
+        columns = {}
+        for name in TRADE_DTYPE.names:
+            if name in ('open_timestamp', 'close_timestamp'):
+                timestamps = rows[name]
+                columns[name] = pa.array(timestamps, mask=timestamps < 0).cast(pa.timestamp('ns', tz='UTC'))
+            else:
+                columns[name] = pa.array(rows[name])
+        columns['open_comment'] = pa.array(self._open_comments[:self._size], type=pa.string())
+        columns['close_comment'] = pa.array(self._close_comments[:self._size], type=pa.string())
+        return pa.table(columns)
+
+    def to_parquet(self, path: str | Path) -> None:
+        pq.write_table(self.to_arrow(), path)
@@ -0,0 +1,113 @@
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+import asyncio as aio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+ENVIRONMENT_PREFIX = 'environment.components.'
+
+
+class StepState:
+    """
+    The state a policy reads in a lock-step step: the agent state, with the last observation of every environment
+    component under environment.components.<component name>.
+    """
+
+    def __init__(self, state: Any) -> None:
+        self._state = state
+        self.components: Dict[str, Any] = {}
+
+    def get_item(self, key: str) -> Any:
+        if key.startswith(ENVIRONMENT_PREFIX):
+            name, _, item = key[len(ENVIRONMENT_PREFIX):].partition('.')
+            component = self.components.get(name)
+            if component is None:
+                return None
+            return component.get_item(item) if item else component
+        return self._state.get_item(key)
+
+    def set_item(self, key: str, value: Any) -> None:
+        self._state.set_item(key, value)
+
+    def remove_item(self, key: str) -> None:
+        self._state.remove_item(key)
+
+    def slice_by_prefix(self, prefix: str) -> Any:
+        return self._state.slice_by_prefix(prefix)
+
+
+class LockStep:
+    """
+    Drives environment components and a policy in lock-step, as fast as they run, without tick loops or a heartbeat.
+    Every step observes all the components at the current time of the data provider, calls the function dispatched
+    for the action the policy returns, looked up by the identity of the action, then ticks the components in their
+    order, the data provider first moving time to the next step. Before the first step the other components are
+    ticked once at the current time, so the first step of the replay is acted on like every other one.
+    The replay is over once the data provider has no time left.
+    """
+
+    def __init__(self, components: Sequence[Any], data_provider: Any, policy: Any, state: Any,
+                 dispatch: Dict[int, Tuple[str, Callable]], context_prefix: str, yield_every: int = 1000) -> None:
+        assert yield_every > 0, "yield_every must be positive"
+        self._components = list(components)
+        self._data_provider = data_provider
+        self._policy = policy
+        self._state = state
+        self._step_state = StepState(state)
+        self._dispatch = dispatch
+        self._context_prefix = context_prefix
+        self._yield_every = yield_every
+        # whether the components other than the data provider have caught up with its current time
+        self._primed = False
+
+    async def step(self) -> Optional[str]:
+        """
+        Runs one step of the replay and moves to the next one,
+        returns the name of the action the policy took, None once the replay is over
+        """
+        if self._data_provider.get_time() is None:
+            return None
+        if not self._primed:
+            for component in self._components:
+                if component is not self._data_provider:
+                    await component.tick()
+            self._primed = True
+
+        caller_context = self._state.slice_by_prefix(self._context_prefix)
+        for component in self._components:
+            self._step_state.components[component.info().name] = await component.observe(caller_context)
+
+        action, args, _ = await self._policy.action(self._step_state)
+        dispatched = self._dispatch.get(id(action))
+        assert dispatched is not None, "The policy returned an action that is not driven in lock-step"
+        name, fn = dispatched
+        await fn(**args)
+
+        for component in self._components:
+            await component.tick()
+        return name
+
+    async def run(self, start: Optional[str] = None, end: Optional[str] = None, freq: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Replays from start to end at freq, or the replay the data provider is already set up with.
+        Returns the number of steps, the wall time and the count of every action the policy took.
+        """
+        if start is not None:
+            assert end is not None and freq is not None, "end and freq are required with start"
+            self._data_provider.reset(start, end, freq)
+        assert not self._data_provider.is_live(), "Lock-step only drives replays"
+        self._primed = False
+
+        steps, actions = 0, {name: 0 for name, _ in self._dispatch.values()}
+        started = time.perf_counter()
+        while (action := await self.step()) is not None:
+            steps += 1
+            actions[action] += 1
+            # gives the other tasks of the loop, the remote control for one, a turn without waiting on a timer
+            if steps % self._yield_every == 0:
+                await aio.sleep(0)
+        seconds = time.perf_counter() - started
+
+        logger.info(f"Replayed {steps} steps in lock-step in {seconds:.2f}s")
+        return {'steps': steps, 'seconds': seconds, 'actions': actions}
@@ -0,0 +1,86 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import numpy as np
+
+from frankenstein.lib.trading.archive import ARCHIVE_COLUMNS, convert_mt5_csv, load_archive
+from frankenstein.lib.trading.tick_store import TickStore
+
+logger = logging.getLogger(__name__)
+
+
+class MarketDataService:
+    """
+    Loads every dataset once and hands out zero-copy read-only views of it.
+    Csv exports are converted once to archives in the cache directory, keyed by their path, size and modification time,
+    and memory-mapped read-only: every view of a dataset, in this process or another one mapping the same cache,
+    shares the same pages of the page cache. Each view is a TickStore of its own, so streamed ticks appended to
+    one of them copy its columns instead of touching the shared ones, and each DataProvider keeps its own cursor.
+    """
+
+    def __init__(self, cache_dir: str | Path = '.market_data') -> None:
+        self._cache_dir = Path(cache_dir)
+        self._stores: Dict[Tuple[str, bool], TickStore] = {}
+        self._lock = threading.Lock()
+
+    def _archive_path(self, filename: Path, bars: bool) -> Path:
+        stat = filename.stat()
+        key = f"{filename.resolve()}:{stat.st_size}:{stat.st_mtime_ns}:{bars}"
+        return self._cache_dir / f"{filename.stem}-{hashlib.sha1(key.encode()).hexdigest()[:16]}"
+
+    def _load(self, filename: Path, bars: bool) -> TickStore:
+        path = self._archive_path(filename, bars)
+        if not path.exists():
+            # converted next to the cache and renamed into it, so concurrent processes never map a partial archive
+            self._cache_dir.mkdir(parents=True, exist_ok=True)
+            staging = Path(tempfile.mkdtemp(dir=self._cache_dir, prefix='.staging-'))
+            try:
+                meta = convert_mt5_csv(filename, staging, bars=bars)
+                os.rename(staging, path)
+                logger.info(f"Converted {meta['rows']} rows from {filename} to {path}")
+            except OSError:
+                # another process renamed its conversion first
+                if not path.exists():
+                    raise
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+        return load_archive(path)
+
+    def store(self, filename: str | Path, bars: bool = False, window: Optional[Tuple[int, int]] = None) -> TickStore:
+        """
+        Returns a read-only view of the ticks or bars of a csv export, loading it on the first request only.
+        window is an optional [start, end] range in nanoseconds, sliced out of the shared columns without copying.
+        """
+        filename = Path(filename)
+        key = (str(filename.resolve()), bars)
+        with self._lock:
+            shared = self._stores.get(key)
+            if shared is None:
+                shared = self._stores[key] = self._load(filename, bars)
+
+        first, stop = 0, len(shared)
+        if window is not None:
+            first = int(np.searchsorted(shared.timestamps, window[0], side='left'))
+            stop = int(np.searchsorted(shared.timestamps, window[1], side='right'))
+
+        columns = []
+        for column in ARCHIVE_COLUMNS:
+            view = getattr(shared, column)[first:stop].view()
+            view.flags.writeable = False
+            columns.append(view)
+        return TickStore(*columns)
+
+    def release(self, filename: str | Path, bars: bool = False) -> None:
+        """Drops the mapping of a dataset, the views already handed out keep it alive until they are gone"""
+        with self._lock:
+            self._stores.pop((str(Path(filename).resolve()), bars), None)
+
+    def datasets(self) -> Dict[Tuple[str, bool], int]:
+        """Returns the row count of every loaded dataset"""
+        with self._lock:
+            return {key: len(store) for key, store in self._stores.items()}
@@ -0,0 +1,158 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+_ARRAYS: Dict[str, Any] = {
+    'is_open': np.bool_,
+    'is_long': np.bool_,
+    'price': np.float64,
+    'volume': np.float64,
+    'take_profit_pips': np.float64,
+    'stop_loss_pips': np.float64,
+    'pl': np.float64,
+    'trade': np.int64,
+    'point': np.float64,
+    'lot_in_units': np.float64,
+    # the rate converting amounts in the quote currency of the symbol to the account currency, at the last mark
+    'conversion': np.float64,
+}
+
+
+def conversion_candidates(symbol: str, account_currency: str) -> List[Tuple[str, bool]]:
+    """
+    Returns the symbols whose mid price converts amounts in the quote currency of a six letter FX symbol to the account
+    currency, each with whether the amounts are divided by it instead of multiplied, in order of preference.
+    An empty list means the amounts already are in the account currency.
+    """
+    base, quote, account = symbol[:3].upper(), symbol[3:6].upper(), account_currency.upper()
+    if quote == account:
+        return []
+    if base == account:
+        return [(symbol, True)]
+    return [(quote + account, False), (account + quote, True)]
+
+
+class PositionBook:
+    """
+    Positions of many symbols in parallel arrays, one slot per symbol that has been traded.
+    The open positions are marked to market together against vectors of ask and bid prices.
+    """
+
+    def __init__(self, capacity: int = 32) -> None:
+        self.symbols: List[str] = []
+        self._slots: Dict[str, int] = {}
+        self._arrays = {name: np.zeros(max(1, capacity), dtype=dtype) for name, dtype in _ARRAYS.items()}
+        self._open_timestamps: List[Optional[datetime]] = []
+        self._open_comments: List[str] = []
+
+    def slot(self, symbol: str) -> int:
+        """Returns the slot of the symbol, adding one if the symbol has not been traded yet"""
+        slot = self._slots.get(symbol)
+        if slot is None:
+            slot = len(self.symbols)
+            if slot == len(self._arrays['is_open']):
+                self._arrays = {name: np.resize(array, 2 * slot) for name, array in self._arrays.items()}
+            for array in self._arrays.values():
+                array[slot] = 0
+            self._slots[symbol] = slot
+            self.symbols.append(symbol)
+            self._open_timestamps.append(None)
+            self._open_comments.append('')
+        return slot
+
+    def is_symbol_open(self, symbol: str) -> bool:
+        slot = self._slots.get(symbol)
+        return slot is not None and bool(self._arrays['is_open'][slot])
+
+    def open(self, symbol: str, is_long: bool, price: float, volume: float, take_profit_pips: float, stop_loss_pips: float,
+             pl: float, trade: int, timestamp: Optional[datetime], comment: str, point: float = 1.0, lot_in_units: float = 1.0,
+             conversion: float = 1.0) -> int:
+        slot = self.slot(symbol)
+        arrays = self._arrays
+        arrays['is_open'][slot] = True
+        arrays['is_long'][slot] = is_long
+        arrays['price'][slot] = price
+        arrays['volume'][slot] = volume
+        arrays['take_profit_pips'][slot] = take_profit_pips
+        arrays['stop_loss_pips'][slot] = stop_loss_pips
+        arrays['pl'][slot] = pl
+        arrays['trade'][slot] = trade
+        arrays['point'][slot] = point
+        arrays['lot_in_units'][slot] = lot_in_units
+        arrays['conversion'][slot] = conversion
+        self._open_timestamps[slot] = timestamp
+        self._open_comments[slot] = comment
+        return slot
+
+    def close(self, symbol: str) -> int:
+        slot = self._slots[symbol]
+        self._arrays['is_open'][slot] = False
+        return slot
+
+    def open_slots(self) -> np.ndarray:
+        return np.flatnonzero(self._arrays['is_open'][:len(self.symbols)])
+
+    def mark_to_market(self, slots: np.ndarray, ask: np.ndarray, bid: np.ndarray, conversion: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Updates and returns the pl in points of the slots, longs are valued at the bid and shorts at the ask.
+        conversion holds the current quote to account currency rates of the slots, the last ones are kept without it.
+        """
+        # prices are rounded to 5 digits as the broker always did
+        ask = np.round(ask, 5)
+        bid = np.round(bid, 5)
+        price = self._arrays['price'][slots]
+        pl = np.where(self._arrays['is_long'][slots], bid - price, price - ask) / self._arrays['point'][slots]
+        self._arrays['pl'][slots] = pl
+        if conversion is not None:
+            self._arrays['conversion'][slots] = conversion
+        return pl
+
+    def set_pl(self, slot: int, pl: float) -> None:
+        self._arrays['pl'][slot] = pl
+
+    def profits(self, slots: np.ndarray) -> np.ndarray:
+        """Returns the unrealized profit of the slots at their last marked pl, in account currency"""
+        arrays = self._arrays
+        return arrays['volume'][slots] * arrays['pl'][slots] * arrays['point'][slots] * arrays['lot_in_units'][slots] * arrays['conversion'][slots]
+
+    def limits_reached(self, slots: np.ndarray) -> np.ndarray:
+        """Returns the mask of the slots whose pl is over their take profit or under their stop loss"""
+        pl = self._arrays['pl'][slots]
+        return (pl > self._arrays['take_profit_pips'][slots]) | (pl < -self._arrays['stop_loss_pips'][slots])
+
+    def margin(self, slots: np.ndarray, ask: np.ndarray, bid: np.ndarray, leverage: float) -> float:
+        """
+        Returns the margin held by the slots, their notional at the mid price over the leverage.
+        Every notional is converted from the quote currency of its symbol to the account currency before they are summed.
+        """
+        if leverage <= 0 or len(slots) == 0:
+            return 0.0
+        arrays = self._arrays
+        notional = arrays['volume'][slots] * arrays['lot_in_units'][slots] * (ask + bid) / 2 * arrays['conversion'][slots]
+        return float(np.sum(notional) / leverage)
+
+    def position(self, slot: int) -> Dict[str, Any]:
+        arrays = self._arrays
+        return {
+            'price': float(arrays['price'][slot]),
+            'volume': float(arrays['volume'][slot]),
+            'is_long': bool(arrays['is_long'][slot]),
+            'take_profit_pips': float(arrays['take_profit_pips'][slot]),
+            'stop_loss_pips': float(arrays['stop_loss_pips'][slot]),
+            'pl': float(arrays['pl'][slot]),
+            'is_open': bool(arrays['is_open'][slot]),
+            'open_timestamp': self._open_timestamps[slot],
+            'open_comment': self._open_comments[slot],
+            'trade': int(arrays['trade'][slot]),
+            'point': float(arrays['point'][slot]),
+            'lot_in_units': float(arrays['lot_in_units'][slot]),
+            'conversion': float(arrays['conversion'][slot]),
+        }
+
+    def positions(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the open positions by symbol"""
+        return {self.symbols[slot]: self.position(slot) for slot in self.open_slots()}
+
+    def trades(self, slots: np.ndarray) -> np.ndarray:
+        """Returns the ledger indices of the trades of the slots"""
+        return self._arrays['trade'][slots]
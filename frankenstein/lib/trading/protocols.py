@@ -1,7 +1,18 @@
-from typing import Protocol, Optional
+from typing import AsyncIterator, Awaitable, Callable, List, Protocol, Optional, Tuple
 from datetime import datetime
+import numpy as np
 import pandas as pd
 
+from frankenstein.lib.trading.schemas import TickBatch
+
+
+class ITickFeed(Protocol):
+    def batches(self) -> AsyncIterator[TickBatch]:
+        ...
+        
+    async def close(self) -> None:
+        ...
+
 
 class IDataProvider(Protocol):
     def ticks(self, symbol: str, timestamp: Optional[datetime], max_ticks: Optional[int] = None) -> pd.DataFrame:
@@ -16,11 +27,41 @@ class IDataProvider(Protocol):
     def bid(self, symbol: str, timestamp: Optional[datetime] = None) -> float:
         ...
         
+    def prices(self, symbol: str, price_type: str, timestamps_ns: np.ndarray) -> np.ndarray:
+        ...
+        
+    def quotes(self, symbols: List[str], timestamp: Optional[datetime] = None) -> Tuple[np.ndarray, np.ndarray]:
+        ...
+        
+    def tick_arrays(self, symbol: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        ...
+        
+    def symbols(self) -> List[str]:
+        ...
+        
+    def replay_timestamps(self) -> np.ndarray:
+        ...
+        
     def get_time(self) -> datetime:
         ...
         
+    def is_live(self) -> bool:
+        ...
+        
+    def on_ticks(self, listener: Callable[[str], Awaitable[None]]) -> None:
+        ...
+        
+    def is_fed(self) -> bool:
+        ...
+        
+    def tick_origin_ns(self) -> Optional[int]:
+        ...
+        
     def step(self) -> None:
         ...
         
+    def seek(self, timestamp: datetime) -> None:
+        ...
+        
     def reset(self, start: str, end: str, freq: str) -> None:
         ...
\ No newline at end of file
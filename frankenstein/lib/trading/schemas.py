@@ -1,6 +1,7 @@
 from dataclasses import dataclass
 from typing import Optional
 from datetime import datetime
+import numpy as np
 
 @dataclass
 class Signal:
@@ -9,4 +10,39 @@ class Signal:
     tp_pips: Optional[int]
     sl_pips: Optional[int]
     comment: str
-    symbol: str
\ No newline at end of file
+    symbol: str
+
+
+@dataclass
+class BacktestParams:
+    long_open_threshold: float
+    long_close_threshold: float
+    short_open_threshold: float
+    short_close_threshold: float
+    tp: float
+    sl: float
+    lot_size: float
+    balance: float = 10000
+    point: float = 1
+    lot_in_units: float = 1
+    # 0 opens every position, otherwise opens needing more margin than the balance are refused like the Broker does
+    leverage: float = 0
+
+
+@dataclass
+class BacktestResult:
+    trades: np.ndarray
+    equity: np.ndarray
+    balance: float
+    pl: float
+
+
+@dataclass
+class TickBatch:
+    symbol: str
+    timestamps: np.ndarray
+    ask: np.ndarray
+    bid: np.ndarray
+    volume: np.ndarray
+    # wall clock nanoseconds when the ticks left their source
+    origin_ns: int
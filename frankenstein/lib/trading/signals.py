@@ -0,0 +1,151 @@
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+import numpy as np
+import pandas as pd
+from ta import volatility, momentum
+
+from frankenstein.lib.trading.indicators import IndicatorTable
+
+SIGNAL_PARAMS = (
+    'bands_enabled', 'bands_timeframe', 'bands_window', 'bands_dev',
+    'rsi_enabled', 'rsi_timeframe', 'rsi_period',
+    'stochastic_enabled', 'stochastic_timeframe', 'stochastic_period', 'stochastic_smooth',
+)
+
+
+def build_indicators(params: Dict[str, Any], bars: Callable[[str], pd.DataFrame]) -> Dict[str, IndicatorTable]:
+    """Computes the enabled indicators, bars returns the bars frame of a timeframe"""
+    indicators = {}
+
+    if params['bands_enabled']:
+        bands_bars = bars(params['bands_timeframe'])
+        window, window_dev = int(params['bands_window']), int(params['bands_dev'])
+        indicators['bands'] = IndicatorTable.from_bars(bands_bars, params['bands_timeframe'], {
+            'hband': volatility.bollinger_hband(bands_bars['close'], window=window, window_dev=window_dev),
+            'lband': volatility.bollinger_lband(bands_bars['close'], window=window, window_dev=window_dev),
+            'mband': volatility.bollinger_mavg(bands_bars['close'], window=window),
+        })
+
+    if params['rsi_enabled']:
+        rsi_bars = bars(params['rsi_timeframe'])
+        indicators['rsi'] = IndicatorTable.from_bars(rsi_bars, params['rsi_timeframe'], {
+            'rsi': momentum.rsi(rsi_bars['close'], window=int(params['rsi_period'])),
+        })
+
+    if params['stochastic_enabled']:
+        stochastic_bars = bars(params['stochastic_timeframe'])
+        indicators['stochastic'] = IndicatorTable.from_bars(stochastic_bars, params['stochastic_timeframe'], {
+            'stoch': momentum.stoch(stochastic_bars['high'], stochastic_bars['low'], stochastic_bars['close'],
+                                    window=int(params['stochastic_period']), smooth_window=int(params['stochastic_smooth'])),
+        })
+
+    return indicators
+
+
+def signal_direction(params: Dict[str, Any], bid: float, hband: float, lband: float, mband: float, rsi: float, stochastic: float) -> Optional[float]:
+    """Combines the indicator values at one step into a direction in [-100, 100], None if no indicator is enabled"""
+    n_indicators = 0
+    direction = 0
+
+    if params['bands_enabled']:
+        n_indicators += 1
+        if bid > hband:
+            direction -= 100
+        elif bid > mband:
+            direction -= 50
+
+        if bid < lband:
+            direction += 100
+        elif bid < mband:
+            direction += 50
+
+    if params['rsi_enabled']:
+        n_indicators += 1
+        direction += 100 - 2 * rsi
+
+    if params['stochastic_enabled']:
+        n_indicators += 1
+        direction += 100 - 2 * stochastic
+
+    if n_indicators == 0:
+        return None
+
+    return direction / n_indicators
+
+
+def compute_directions(params: Dict[str, Any], indicators: Dict[str, IndicatorTable], timestamps_ns: np.ndarray, bid: np.ndarray) -> np.ndarray:
+    """
+    Vectorized signal_direction over a whole replay window.
+    Returns the direction at every timestamp, NaN where there is no signal (an enabled indicator has no completed bar yet).
+    """
+    n = len(timestamps_ns)
+    bid = np.asarray(bid, dtype=np.float64)
+    valid = np.ones(n, dtype=bool)
+    direction = np.zeros(n, dtype=np.float64)
+    n_indicators = 0
+
+    def lookup(name: str, column: str) -> np.ndarray:
+        nonlocal valid
+        table = indicators[name]
+        positions = table.positions(timestamps_ns)
+        valid &= positions >= 0
+        return table.column(column)[np.maximum(positions, 0)]
+
+    if params['bands_enabled']:
+        n_indicators += 1
+        hband = lookup('bands', 'hband')
+        lband = lookup('bands', 'lband')
+        mband = lookup('bands', 'mband')
+        direction -= np.where(bid > hband, 100, np.where(bid > mband, 50, 0))
+        direction += np.where(bid < lband, 100, np.where(bid < mband, 50, 0))
+
+    if params['rsi_enabled']:
+        n_indicators += 1
+        direction += 100 - 2 * lookup('rsi', 'rsi')
+
+    if params['stochastic_enabled']:
+        n_indicators += 1
+        direction += 100 - 2 * lookup('stochastic', 'stoch')
+
+    if n_indicators == 0:
+        return np.full(n, np.nan)
+
+    direction /= n_indicators
+    direction[~valid] = np.nan
+    return direction
+
+
+class SignalSeries:
+    """Directions precomputed for the steps of a replay window, looked up with a forward moving cursor"""
+
+    def __init__(self, timestamps_ns: np.ndarray, directions: np.ndarray) -> None:
+        assert len(timestamps_ns) == len(directions), "Directions must be aligned with the timestamps"
+        self.timestamps: np.ndarray = np.asarray(timestamps_ns, dtype=np.int64)
+        self.directions: np.ndarray = np.asarray(directions, dtype=np.float64)
+        self._cursor = 0
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def index(self, timestamp_ns: int) -> int:
+        """Returns the step at exactly the timestamp, -1 if the timestamp is not a step of the series"""
+        timestamps = self.timestamps
+        cursor = self._cursor
+        if cursor < len(timestamps) and timestamps[cursor] == timestamp_ns:
+            return cursor
+        if cursor + 1 < len(timestamps) and timestamps[cursor + 1] == timestamp_ns:
+            self._cursor = cursor + 1
+            return self._cursor
+        cursor = int(np.searchsorted(timestamps, timestamp_ns, side='left'))
+        if cursor < len(timestamps) and timestamps[cursor] == timestamp_ns:
+            self._cursor = cursor
+            return cursor
+        return -1
+
+    def save(self, path: str | Path) -> None:
+        np.savez(path, timestamps=self.timestamps, directions=self.directions)
+
+    @classmethod
+    def load(cls, path: str | Path) -> 'SignalSeries':
+        with np.load(path) as data:
+            return cls(data['timestamps'], data['directions'])
@@ -0,0 +1,219 @@
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from pathlib import Path
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+import math
+import os
+import numpy as np
+import pandas as pd
+
+from frankenstein.lib.trading.archive import load_archive
+from frankenstein.lib.trading.backtest import run_backtest
+from frankenstein.lib.trading.bar_series import BarSeries
+from frankenstein.lib.trading.indicators import IndicatorTable
+from frankenstein.lib.trading.schemas import BacktestParams
+from frankenstein.lib.trading.signals import SIGNAL_PARAMS, build_indicators, compute_directions
+from frankenstein.lib.trading.tick_store import TickStore
+from frankenstein.lib.trading.utils import bars_dataframe
+
+# defaults of SignalProvider and ConfigProvider, a parameter set only needs the values it changes
+DEFAULT_SIGNAL_PARAMS: Dict[str, Any] = {
+    'bands_enabled': True,
+    'bands_timeframe': 'M10',
+    'bands_window': 7,
+    'bands_dev': 2,
+    'rsi_enabled': True,
+    'rsi_timeframe': 'M10',
+    'rsi_period': 13,
+    'stochastic_enabled': True,
+    'stochastic_timeframe': 'M10',
+    'stochastic_period': 14,
+    'stochastic_smooth': 3,
+}
+
+DEFAULT_CONFIG_PARAMS: Dict[str, Any] = {
+    'lot_size': 0.1,
+    'long_open_threshold': 50,
+    'long_close_threshold': 30,
+    'short_open_threshold': 50,
+    'short_close_threshold': 30,
+    'sl': 100,
+    'tp': 300,
+}
+
+# defaults of Broker.set_params
+DEFAULT_ACCOUNT: Dict[str, Any] = {
+    'balance': 10000,
+    'leverage': 30,
+    'point': 1,
+    'lot_in_units': 1,
+}
+
+RESULT_COLUMNS = ('pl', 'trade_count', 'max_drawdown', 'balance')
+
+
+def param_grid(**axes: Sequence[Any]) -> List[Dict[str, Any]]:
+    """Returns every combination of the values of the axes"""
+    names = list(axes)
+    return [dict(zip(names, values)) for values in product(*(axes[name] for name in names))]
+
+
+def param_samples(n: int, seed: Optional[int] = None, **axes: Sequence[Any] | Tuple[float, float] | Dict[str, float]) -> List[Dict[str, Any]]:
+    """
+    Returns n random parameter sets.
+    A list axis is sampled from its values, a (low, high) tuple or a {low: ..., high: ...} mapping, the form a yaml
+    file can express, uniformly, as integers when both bounds are integers.
+    """
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name, axis in axes.items():
+        if isinstance(axis, (tuple, dict)):
+            low, high = (axis['low'], axis['high']) if isinstance(axis, dict) else axis
+            if isinstance(low, int) and isinstance(high, int):
+                columns[name] = rng.integers(low, high, n, endpoint=True).tolist()
+            else:
+                columns[name] = rng.uniform(low, high, n).tolist()
+        else:
+            columns[name] = [axis[i] for i in rng.integers(0, len(axis), n)]
+    return [{name: column[i] for name, column in columns.items()} for i in range(n)]
+
+
+def max_drawdown(equity: np.ndarray) -> float:
+    """Returns the largest drop of the equity curve from a previous peak"""
+    if len(equity) == 0:
+        return 0.0
+    return float(np.max(np.maximum.accumulate(equity) - equity))
+
+
+class SweepEvaluator:
+    """
+    Evaluates parameter sets over replay steps of a symbol.
+    Bars are aggregated once per timeframe over the whole store and the indicators are cached per signal parameter set,
+    so parameter sets that only differ in the config, or replay windows of the same data, share everything but the backtest.
+    """
+
+    def __init__(self, store: TickStore, account: Optional[Dict[str, Any]] = None, cache_size: int = 8) -> None:
+        self._store = store
+        self._account = {**DEFAULT_ACCOUNT, **(account or {})}
+        self._bars: Dict[str, pd.DataFrame] = {}
+        self._indicators: OrderedDict[Tuple, Dict[str, IndicatorTable]] = OrderedDict()
+        self._cache_size = cache_size
+
+    def bars(self, timeframe: str) -> pd.DataFrame:
+        if timeframe not in self._bars:
+            self._bars[timeframe] = bars_dataframe(BarSeries(self._store, timeframe).window(None))
+        return self._bars[timeframe]
+
+    def indicators(self, signal_params: Dict[str, Any]) -> Dict[str, IndicatorTable]:
+        key = tuple(signal_params[name] for name in SIGNAL_PARAMS)
+        if key not in self._indicators:
+            self._indicators[key] = build_indicators(signal_params, self.bars)
+            if len(self._indicators) > self._cache_size:
+                self._indicators.popitem(last=False)
+        self._indicators.move_to_end(key)
+        return self._indicators[key]
+
+    def evaluate(self, params: Dict[str, Any], timestamps_ns: np.ndarray) -> Dict[str, Any]:
+        """Backtests one parameter set over the steps and returns it with its pl, trade count, max drawdown and final balance"""
+        params = {**DEFAULT_SIGNAL_PARAMS, **DEFAULT_CONFIG_PARAMS, **params}
+        signal_params = {name: params[name] for name in SIGNAL_PARAMS}
+        ask = self._store.prices('ask', timestamps_ns)
+        bid = self._store.prices('bid', timestamps_ns)
+        directions = compute_directions(signal_params, self.indicators(signal_params), timestamps_ns, bid)
+        result = run_backtest(timestamps_ns, directions, ask, bid, BacktestParams(
+            long_open_threshold=float(params['long_open_threshold']),
+            long_close_threshold=float(params['long_close_threshold']),
+            short_open_threshold=float(params['short_open_threshold']),
+            short_close_threshold=float(params['short_close_threshold']),
+            tp=float(params['tp']),
+            sl=float(params['sl']),
+            lot_size=float(params['lot_size']),
+            **self._account,
+        ))
+        return {
+            **params,
+            'pl': result.pl,
+            'trade_count': len(result.trades),
+            'max_drawdown': max_drawdown(result.equity),
+            'balance': result.balance,
+        }
+
+
+_evaluator: Optional[SweepEvaluator] = None
+_schedules: Dict[Hashable, np.ndarray] = {}
+
+
+def _init_worker(archive: str, schedules: Dict[Hashable, np.ndarray], account: Dict[str, Any]) -> None:
+    # the archive is memory mapped, so all the workers read the same pages of the page cache
+    global _evaluator, _schedules
+    _evaluator = SweepEvaluator(load_archive(archive, mmap=True), account)
+    _schedules = schedules
+
+
+def _evaluate_chunk(chunk: List[Tuple[int, Dict[str, Any], Hashable]]) -> List[Tuple[int, Dict[str, Any]]]:
+    assert _evaluator is not None, "Worker is not initialized"
+    return [(i, _evaluator.evaluate(params, _schedules[schedule])) for i, params, schedule in chunk]
+
+
+def _chunks(jobs: List[Tuple[Dict[str, Any], Hashable]], n_chunks: int) -> List[List[Tuple[int, Dict[str, Any], Hashable]]]:
+    """
+    Splits the indexed jobs into about n_chunks chunks,
+    jobs with the same signal parameters are kept next to each other to share their indicators
+    """
+    def signal_key(item: Tuple[int, Dict[str, Any], Hashable]) -> str:
+        return repr(tuple(item[1].get(name, DEFAULT_SIGNAL_PARAMS[name]) for name in SIGNAL_PARAMS))
+
+    ordered = sorted(((i, params, schedule) for i, (params, schedule) in enumerate(jobs)), key=signal_key)
+    size = max(1, math.ceil(len(ordered) / n_chunks))
+    return [ordered[i:i + size] for i in range(0, len(ordered), size)]
+
+
+class SweepPool:
+    """
+    Pool of processes backtesting (parameter set, schedule name) jobs over the replay schedules it was created with.
+    Every worker memory maps the tick archive written by archive.write_archive and keeps its bars and indicators
+    between jobs, nothing but the schedules, the parameters and the results is sent between the processes.
+    """
+
+    def __init__(self, archive: str | Path, schedules: Dict[Hashable, np.ndarray], *,
+                 account: Optional[Dict[str, Any]] = None, max_workers: Optional[int] = None) -> None:
+        self._max_workers = max_workers or os.cpu_count() or 1
+        schedules = {name: np.asarray(timestamps, dtype=np.int64) for name, timestamps in schedules.items()}
+        account = {**DEFAULT_ACCOUNT, **(account or {})}
+        self._executor = ProcessPoolExecutor(max_workers=self._max_workers, initializer=_init_worker,
+                                             initargs=(str(archive), schedules, account))
+
+    def __enter__(self) -> 'SweepPool':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._executor.shutdown()
+
+    def evaluate(self, jobs: Sequence[Tuple[Dict[str, Any], Hashable]]) -> List[Dict[str, Any]]:
+        """Returns the result rows of the jobs in order"""
+        jobs = list(jobs)
+        rows: List[Dict[str, Any]] = [{}] * len(jobs)
+        # a few chunks per worker balances the load while keeping the indicator cache hits of a chunk
+        for chunk_rows in self._executor.map(_evaluate_chunk, _chunks(jobs, 4 * self._max_workers)):
+            for i, row in chunk_rows:
+                rows[i] = row
+        return rows
+
+
+def run_sweep(archive: str | Path, timestamps_ns: np.ndarray, param_sets: Iterable[Dict[str, Any]], *,
+              account: Optional[Dict[str, Any]] = None, max_workers: Optional[int] = None) -> pd.DataFrame:
+    """
+    Backtests the parameter sets over the replay steps in a pool of processes.
+    Returns one row per parameter set, in order, with its parameters, pl, trade_count, max_drawdown and balance.
+    """
+    with SweepPool(archive, {'replay': timestamps_ns}, account=account, max_workers=max_workers) as pool:
+        return results_dataframe(pool.evaluate([(params, 'replay') for params in param_sets]))
+
+
+def results_dataframe(rows: List[Dict[str, Any]]) -> pd.DataFrame:
+    """Returns the result rows as a table with the parameter columns followed by the result columns"""
+    return pd.DataFrame(rows, columns=[*DEFAULT_SIGNAL_PARAMS, *DEFAULT_CONFIG_PARAMS, *RESULT_COLUMNS])
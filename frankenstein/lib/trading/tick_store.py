@@ -0,0 +1,130 @@
+from datetime import datetime, UTC
+from typing import Dict, Literal, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+
+def to_ns(timestamp: datetime) -> int:
+    """Converts a datetime (naive datetimes are treated as UTC) to int64 nanoseconds since epoch"""
+    return int(pd.Timestamp(timestamp).value)
+
+
+def to_utc(timestamp: datetime | str) -> datetime:
+    """Parses an ISO 8601 string or takes a datetime, converting aware ones to UTC and treating naive ones as UTC"""
+    timestamp = datetime.fromisoformat(str(timestamp))
+    return timestamp.astimezone(UTC) if timestamp.tzinfo is not None else timestamp.replace(tzinfo=UTC)
+
+
+def ns_index(timestamps: np.ndarray) -> pd.DatetimeIndex:
+    """Wraps an int64 nanosecond array into a UTC DatetimeIndex without copying"""
+    return pd.DatetimeIndex(np.asarray(timestamps).view('datetime64[ns]')).tz_localize('UTC')
+
+
+class TickStore:
+    """
+    Columnar store of ticks for a single symbol.
+    Holds a sorted int64 nanosecond timestamp array and float64 ask/bid/volume arrays,
+    all lookups are binary searches on the timestamp array.
+    Streamed ticks are appended to buffers grown geometrically, the columns are views of their filled part.
+    """
+
+    def __init__(self, timestamps: np.ndarray, ask: np.ndarray, bid: np.ndarray, volume: np.ndarray) -> None:
+        assert len(timestamps) == len(ask) == len(bid) == len(volume), "All columns must have the same length"
+        self.timestamps: np.ndarray = timestamps
+        self.ask: np.ndarray = ask
+        self.bid: np.ndarray = bid
+        self.volume: np.ndarray = volume
+        # the columns are only copied into growable buffers on the first append, mapped archives stay mapped until then
+        self._buffers: Optional[Dict[str, np.ndarray]] = None
+
+    @classmethod
+    def empty(cls) -> 'TickStore':
+        return cls(np.empty(0, dtype=np.int64), np.empty(0), np.empty(0), np.empty(0))
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> 'TickStore':
+        """Builds the store from a frame indexed by timestamp with ask, bid and volume columns"""
+        index = pd.DatetimeIndex(df.index)
+        if index.tz is None:
+            index = index.tz_localize('UTC')
+        timestamps = index.as_unit('ns').asi8
+        ask = df['ask'].to_numpy(dtype=np.float64)
+        bid = df['bid'].to_numpy(dtype=np.float64)
+        volume = df['volume'].to_numpy(dtype=np.float64)
+
+        if len(timestamps) > 1 and np.any(timestamps[1:] < timestamps[:-1]):
+            order = np.argsort(timestamps, kind='stable')
+            timestamps, ask, bid, volume = timestamps[order], ask[order], bid[order], volume[order]
+
+        return cls(np.ascontiguousarray(timestamps, dtype=np.int64), ask, bid, volume)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def append(self, timestamps: np.ndarray, ask: np.ndarray, bid: np.ndarray, volume: np.ndarray) -> None:
+        """Appends sorted ticks at or after the last one"""
+        n = len(timestamps)
+        assert len(ask) == len(bid) == len(volume) == n, "All columns must have the same length"
+        if n == 0:
+            return
+        assert np.all(timestamps[1:] >= timestamps[:-1]), "Appended ticks must be sorted"
+        assert len(self.timestamps) == 0 or timestamps[0] >= self.timestamps[-1], "Appended ticks must not be older than the last one"
+
+        size = len(self.timestamps)
+        columns = {'timestamps': self.timestamps, 'ask': self.ask, 'bid': self.bid, 'volume': self.volume}
+        if self._buffers is None or size + n > len(self._buffers['timestamps']):
+            capacity = max(size + n, 2 * size, 1024)
+            buffers = {name: np.empty(capacity, dtype=np.int64 if name == 'timestamps' else np.float64) for name in columns}
+            for name, values in columns.items():
+                buffers[name][:size] = values
+            self._buffers = buffers
+
+        for name, values in (('timestamps', timestamps), ('ask', ask), ('bid', bid), ('volume', volume)):
+            self._buffers[name][size:size + n] = values
+        self.timestamps = self._buffers['timestamps'][:size + n]
+        self.ask = self._buffers['ask'][:size + n]
+        self.bid = self._buffers['bid'][:size + n]
+        self.volume = self._buffers['volume'][:size + n]
+
+    def start(self) -> Optional[int]:
+        return int(self.timestamps[0]) if len(self.timestamps) else None
+
+    def end(self) -> Optional[int]:
+        return int(self.timestamps[-1]) if len(self.timestamps) else None
+
+    def locate(self, timestamp_ns: int) -> int:
+        """Returns the position of the last tick at or before the timestamp, -1 if there is none"""
+        return int(np.searchsorted(self.timestamps, timestamp_ns, side='right')) - 1
+
+    def price(self, price_type: Literal['ask', 'bid'], timestamp_ns: int) -> float:
+        """Returns the latest ask or bid at or before the timestamp, -1 if the price is not available"""
+        idx = self.locate(timestamp_ns)
+        if idx < 0:
+            return -1
+        return float((self.ask if price_type == 'ask' else self.bid)[idx])
+
+    def prices(self, price_type: Literal['ask', 'bid'], timestamps_ns: np.ndarray) -> np.ndarray:
+        """Vectorized price, -1 where the price is not available"""
+        idx = np.searchsorted(self.timestamps, timestamps_ns, side='right') - 1
+        if len(self.timestamps) == 0:
+            return np.full(len(idx), -1.0)
+        values = (self.ask if price_type == 'ask' else self.bid)[np.maximum(idx, 0)]
+        return np.where(idx >= 0, values, -1.0)
+
+    def bounds(self, timestamp_ns: Optional[int], max_ticks: Optional[int] = None) -> Tuple[int, int]:
+        """Returns the [start, stop) positions of the ticks up to the timestamp, limited to the last max_ticks"""
+        stop = len(self.timestamps) if timestamp_ns is None else self.locate(timestamp_ns) + 1
+        start = 0 if max_ticks is None else max(0, stop - max_ticks)
+        return start, stop
+
+    def to_dataframe(self, start: int = 0, stop: Optional[int] = None) -> pd.DataFrame:
+        """Materializes the [start, stop) ticks as a frame with timestamp, ask, bid and volume columns"""
+        index = ns_index(self.timestamps[start:stop])
+        df = pd.DataFrame({
+            'timestamp': index,
+            'ask': self.ask[start:stop],
+            'bid': self.bid[start:stop],
+            'volume': self.volume[start:stop],
+        }, index=index)
+        df.index.name = 'index'
+        return df
@@ -5,11 +5,15 @@ import re
 import torch.nn.functional as F
 from datetime import timedelta
 from math import pi
-from typing import Callable, List, Tuple, Union, Any
+from typing import Callable, Dict, Iterator, List, Tuple, Union, Any
 import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pa_csv
 from datatable import f, dt
 from bokeh.plotting import figure, show
 
+from frankenstein.lib.trading.tick_store import TickStore, to_ns
+
 
 def clean_text(text: str) -> str:
     text = re.sub(r'\<.*?\>', '', text)
@@ -74,6 +78,61 @@ def load_mt5_ticks_csv(filename: str):
     
     return df
 
+def _ffill(values: np.ndarray, carry: float) -> np.ndarray:
+    """Forward fills NaNs, leading NaNs are filled with the value carried over from the previous chunk"""
+    values = values.copy()
+    if len(values) and np.isnan(values[0]):
+        values[0] = carry
+    idx = np.where(np.isnan(values), 0, np.arange(len(values)))
+    np.maximum.accumulate(idx, out=idx)
+    return values[idx]
+
+
+def iter_mt5_ticks_csv(filename: str, block_size: int = 64 << 20) -> Iterator[TickStore]:
+    """
+    Streams an MT5 ticks csv export in chunks of about block_size bytes through the pyarrow csv reader.
+    Yields the same ticks as load_mt5_ticks_csv, forward-filled and de-duplicated per second across chunk boundaries.
+    """
+    reader = pa_csv.open_csv(
+        filename,
+        read_options=pa_csv.ReadOptions(block_size=block_size),
+        parse_options=pa_csv.ParseOptions(delimiter='\t'),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=['<DATE>', '<TIME>', '<ASK>', '<BID>', '<VOLUME>'],
+            column_types={'<DATE>': pa.string(), '<TIME>': pa.string(), '<ASK>': pa.float64(), '<BID>': pa.float64(), '<VOLUME>': pa.float64()},
+        ),
+    )
+    
+    carry = {'ask': np.nan, 'bid': np.nan, 'volume': np.nan}
+    # the last second of a chunk may continue in the next one, so it is held back until then
+    pending: Dict[str, np.ndarray] | None = None
+    
+    for batch in reader:
+        if batch.num_rows == 0:
+            continue
+        timestamps = pd.to_datetime(
+            batch.column('<DATE>').to_pandas() + ' ' + batch.column('<TIME>').to_pandas(), utc=True)
+        columns = {'timestamps': pd.DatetimeIndex(timestamps).floor('1s').as_unit('ns').asi8}
+        for name, column in (('ask', '<ASK>'), ('bid', '<BID>'), ('volume', '<VOLUME>')):
+            columns[name] = _ffill(batch.column(column).to_numpy(zero_copy_only=False).astype(np.float64), carry[name])
+            carry[name] = columns[name][-1]
+        
+        if pending is not None:
+            columns = {name: np.concatenate((pending[name], values)) for name, values in columns.items()}
+        
+        keys = columns['timestamps']
+        last = np.append(keys[1:] != keys[:-1], True)
+        tail = int(np.searchsorted(keys, keys[-1], side='left'))
+        
+        pending = {name: values[tail:][last[tail:]] for name, values in columns.items()}
+        chunk = {name: values[:tail][last[:tail]] for name, values in columns.items()}
+        if len(chunk['timestamps']):
+            yield TickStore(chunk['timestamps'], chunk['ask'], chunk['bid'], chunk['volume'])
+    
+    if pending is not None and len(pending['timestamps']):
+        yield TickStore(pending['timestamps'], pending['ask'], pending['bid'], pending['volume'])
+
+
 def load_mt5_bars_csv(filename: str):
     
     df = pd.read_csv(filename, sep='\t', engine="pyarrow")
@@ -106,26 +165,121 @@ def dt_load_mt5_bars_csv(filename: str):
     
     return df
 
-def _fn_timestamp_aggregate(timestamp: datetime, period: str = 'M15') -> datetime:
-    if period == 'D1':
-        return timestamp.replace(minute=0, hour=0, second=0, microsecond=0)
-    if period == 'H1':
-        return timestamp.replace(minute=0, second=0, microsecond=0)
-    if period == 'M1':
-        return timestamp.replace(second=0, microsecond=0)
-    if period == 'M5':
-        return timestamp.replace(minute=timestamp.minute - timestamp.minute % 5, second=0, microsecond=0)
-    if period == 'M15':
-        return timestamp.replace(minute=timestamp.minute - timestamp.minute % 15, second=0, microsecond=0)
-    if period == 'M20':
-        return timestamp.replace(minute=timestamp.minute - timestamp.minute % 20, second=0, microsecond=0)
-    if period == 'M30':
-        return timestamp.replace(minute=timestamp.minute - timestamp.minute % 30, second=0, microsecond=0)
-    return timestamp
-
-def _group(df: pd.DataFrame, period: str) -> 'pd.DataFrameGroupBy':
-    df['timestamp'] = df.timestamp.apply(lambda t: _fn_timestamp_aggregate(t, period))
-    return df.groupby('timestamp')
+TIMEFRAMES: Dict[str, timedelta] = {
+    'Tick': timedelta(microseconds=0),
+    'S1': timedelta(seconds=1),
+    'M1': timedelta(minutes=1),
+    'M5': timedelta(minutes=5),
+    'M10': timedelta(minutes=10),
+    'M15': timedelta(minutes=15),
+    'M20': timedelta(minutes=20),
+    'M30': timedelta(minutes=30),
+    'H1': timedelta(hours=1),
+    'H4': timedelta(hours=4),
+    'D1': timedelta(days=1),
+}
+
+
+def timeframe_ns(period: str) -> int:
+    """Returns the length of the timeframe in nanoseconds, 0 for Tick"""
+    if period not in TIMEFRAMES:
+        raise ValueError(f"Invalid timeframe {period}")
+    return TIMEFRAMES[period] // timedelta(microseconds=1) * 1000
+
+
+DAY_NS = 86400 * 10**9
+
+
+def weekday_ns(timestamp_ns: int) -> int:
+    """Returns the UTC weekday of an int64 nanosecond timestamp, Monday is 0"""
+    # 1970-01-01 was a Thursday
+    return (timestamp_ns // DAY_NS + 3) % 7
+
+
+def replay_schedule(start: datetime, end: datetime, freq: timedelta, tick_timestamps: np.ndarray | None = None) -> np.ndarray:
+    """
+    Returns the int64 nanosecond timestamps of the steps of a replay:
+    one day at a time over weekends, freq otherwise, up to and including the first step past end.
+    At Tick frequency the steps are the tick timestamps between start and end.
+    """
+    start_ns, end_ns = to_ns(start), to_ns(end)
+    if freq == timedelta(0):
+        if tick_timestamps is None:
+            raise ValueError("Replay steps of Tick frequency are the tick timestamps, none were given")
+        first = np.searchsorted(tick_timestamps, start_ns, side='left')
+        last = np.searchsorted(tick_timestamps, end_ns, side='right')
+        return np.asarray(tick_timestamps[first:last], dtype=np.int64)
+    
+    freq_ns = freq // timedelta(microseconds=1) * 1000
+    # one arithmetic run of steps per week, the steps over the weekend in between
+    segments, time = [], start_ns
+    while True:
+        while weekday_ns(time) in (5, 6):
+            segments.append(np.array([time], dtype=np.int64))
+            if time > end_ns:
+                return np.concatenate(segments)
+            time += DAY_NS
+        
+        saturday = (time // DAY_NS + 5 - weekday_ns(time)) * DAY_NS
+        week_steps = -(-(saturday - time) // freq_ns)
+        end_steps = max(0, (end_ns - time) // freq_ns + 1)
+        if end_steps < week_steps:
+            segments.append(time + np.arange(end_steps + 1, dtype=np.int64) * freq_ns)
+            return np.concatenate(segments)
+        segments.append(time + np.arange(week_steps, dtype=np.int64) * freq_ns)
+        time += week_steps * freq_ns
+
+
+def steps_with_ticks(schedule: np.ndarray, tick_timestamps: np.ndarray) -> np.ndarray:
+    """Returns the mask of the steps of a schedule with at least one tick since the previous step, or before the first one"""
+    counts = np.searchsorted(tick_timestamps, schedule, side='right')
+    return np.diff(counts, prepend=0) > 0
+
+
+def bucket_starts(timestamps: np.ndarray, period_ns: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Buckets sorted int64 nanosecond timestamps by floor division on the period.
+    Returns the bucket keys and the position of the first row of every bucket.
+    """
+    keys = timestamps if period_ns == 0 else timestamps // period_ns * period_ns
+    if len(keys) == 0:
+        return keys, np.empty(0, dtype=np.int64)
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    return keys[starts], starts
+
+
+def aggregate_arrays(timestamps: np.ndarray, open: np.ndarray, close: np.ndarray, low: np.ndarray, high: np.ndarray,
+                     volume: np.ndarray, period_ns: int) -> Dict[str, np.ndarray]:
+    """Computes OHLCV bars from sorted int64 nanosecond timestamps with grouped reductions"""
+    keys, starts = bucket_starts(timestamps, period_ns)
+    if len(starts) == 0:
+        empty = np.empty(0, dtype=np.float64)
+        return {'timestamp': keys, 'open': empty, 'close': empty, 'low': empty, 'high': empty, 'volume': empty}
+    ends = np.append(starts[1:], len(timestamps)) - 1
+    return {
+        'timestamp': keys,
+        'open': np.asarray(open)[starts],
+        'close': np.asarray(close)[ends],
+        'low': np.minimum.reduceat(low, starts),
+        'high': np.maximum.reduceat(high, starts),
+        'volume': np.add.reduceat(volume, starts),
+    }
+
+
+def bars_dataframe(bars: Dict[str, np.ndarray], tz: Any = 'UTC') -> pd.DataFrame:
+    """Wraps aggregated bar arrays into a frame indexed by the bar start timestamp"""
+    index = pd.DatetimeIndex(bars['timestamp'].view('datetime64[ns]'), name='timestamp')
+    if tz is not None:
+        index = index.tz_localize('UTC').tz_convert(tz)
+    return pd.DataFrame({
+        'timestamp': index,
+        'open': bars['open'],
+        'close': bars['close'],
+        'low': bars['low'],
+        'high': bars['high'],
+        'volume': bars['volume'],
+    }, index=index)
+
 
 def aggregate_prices(df: pd.DataFrame, period: str, price_col_open='bid', price_col_close='bid', price_col_low='bid', price_col_high='bid') -> pd.DataFrame:
     
@@ -138,20 +292,31 @@ def aggregate_prices(df: pd.DataFrame, period: str, price_col_open='bid', price_
     if price_col_high not in df.columns:
         price_col_high = 'high'
     
-    grouped = _group(df, period)
-
-    result = pd.concat(
-        [grouped.timestamp.first(), grouped[price_col_open].first(), grouped[price_col_close].last(), grouped[price_col_low].min(), grouped[price_col_high].max(),
-            grouped.volume.sum()], axis=1)
-    result.columns = ['timestamp', 'open', 'close', 'low', 'high', 'volume']
-    return result
+    period_ns = timeframe_ns(period)
+    
+    index = pd.DatetimeIndex(df['timestamp'])
+    timestamps = index.as_unit('ns').asi8
+    order = None
+    if len(timestamps) > 1 and np.any(timestamps[1:] < timestamps[:-1]):
+        order = np.argsort(timestamps, kind='stable')
+        timestamps = timestamps[order]
+    
+    def column(name: str) -> np.ndarray:
+        values = df[name].to_numpy(dtype=np.float64)
+        return values if order is None else values[order]
+    
+    bars = aggregate_arrays(
+        timestamps, column(price_col_open), column(price_col_close), column(price_col_low), column(price_col_high),
+        column('volume'), period_ns)
+    
+    return bars_dataframe(bars, index.tz)
 
 
 def plot_candlesticks(df: pd.DataFrame, p: figure, timeframe: str = 'M1'):
     inc = df.close > df.open
     dec = df.open > df.close
 
-    w = {'M1': 1, 'M5': 5, 'M15': 15, 'M30': 30, 'H1': 60, 'H4': 240, 'D1': 24 * 60}[timeframe] * 60 * 1000
+    w = TIMEFRAMES[timeframe] / timedelta(milliseconds=1)
 
     p.xaxis.major_label_orientation = pi / 4
     p.grid.grid_line_alpha = 0.3
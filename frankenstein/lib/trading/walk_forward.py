@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta, UTC
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import argparse
+import numpy as np
+import pandas as pd
+import yaml
+
+from frankenstein.lib.trading.archive import archive_range, load_archive
+from frankenstein.lib.trading.sweep import RESULT_COLUMNS, SweepPool, param_grid, param_samples, results_dataframe
+from frankenstein.lib.trading.tick_store import to_ns
+from frankenstein.lib.trading.utils import TIMEFRAMES, replay_schedule, steps_with_ticks
+
+Window = Tuple[datetime, datetime, datetime]
+
+
+def walk_forward_windows(start: datetime, end: datetime, in_sample: timedelta, out_of_sample: timedelta,
+                         step: Optional[timedelta] = None) -> List[Window]:
+    """
+    Returns the rolling (in_sample_start, in_sample_end, out_of_sample_end) windows that fit between start and end.
+    The windows move by step, the out of sample length by default, so the out of sample periods follow each other.
+    """
+    step = step or out_of_sample
+    assert step > timedelta(0), "Step must be positive"
+    windows, time = [], start
+    while time + in_sample + out_of_sample <= end:
+        windows.append((time, time + in_sample, time + in_sample + out_of_sample))
+        time += step
+    return windows
+
+
+def window_schedule(start: datetime, end: datetime, freq: str, tick_timestamps: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Returns the replay steps of the [start, end) period.
+    With the tick timestamps of the data, only the steps DataProvider replays are kept: the steps with a tick since
+    the previous one, or the ticks themselves at Tick frequency.
+    """
+    if freq not in TIMEFRAMES:
+        raise ValueError(f"Invalid frequency {freq}")
+    timestamps = replay_schedule(start, end, TIMEFRAMES[freq], tick_timestamps)
+    if tick_timestamps is not None and TIMEFRAMES[freq] != timedelta(0):
+        timestamps = timestamps[steps_with_ticks(timestamps, tick_timestamps)]
+    return timestamps[timestamps < to_ns(end)]
+
+
+def run_walk_forward(archive: str | Path, windows: List[Window], freq: str, param_sets: Iterable[Dict[str, Any]], *,
+                     score: Callable[[Dict[str, Any]], float] = lambda row: row['pl'],
+                     account: Optional[Dict[str, Any]] = None, max_workers: Optional[int] = None) -> pd.DataFrame:
+    """
+    Picks the parameter set with the highest in sample score in every window and backtests it out of sample.
+    All the windows are evaluated in one pool of processes, the jobs of a parameter set are grouped across windows
+    so the indicators computed over the archive are reused by every window instead of being recomputed per window.
+    Returns one row per window with its bounds, the chosen parameters, their in sample results (prefixed with
+    in_sample_) and their out of sample results.
+    """
+    param_sets = list(param_sets)
+    assert param_sets, "No parameter sets to optimize"
+    # the windows replay the steps DataProvider would, without the weekends and gaps of the archive
+    tick_timestamps = load_archive(archive).timestamps
+    schedules = {}
+    for i, (in_sample_start, in_sample_end, out_of_sample_end) in enumerate(windows):
+        schedules[('in_sample', i)] = window_schedule(in_sample_start, in_sample_end, freq, tick_timestamps)
+        schedules[('out_of_sample', i)] = window_schedule(in_sample_end, out_of_sample_end, freq, tick_timestamps)
+
+    with SweepPool(archive, schedules, account=account, max_workers=max_workers) as pool:
+        in_sample = pool.evaluate([(params, ('in_sample', i)) for i in range(len(windows)) for params in param_sets])
+        n = len(param_sets)
+        best = [max(in_sample[i * n:(i + 1) * n], key=score) for i in range(len(windows))]
+        out_of_sample = pool.evaluate([
+            ({key: row[key] for key in row if key not in RESULT_COLUMNS}, ('out_of_sample', i)) for i, row in enumerate(best)
+        ])
+
+    table = results_dataframe(out_of_sample)
+    for column in RESULT_COLUMNS:
+        table.insert(len(table.columns) - len(RESULT_COLUMNS), f'in_sample_{column}', [row[column] for row in best])
+    table.insert(0, 'in_sample_start', [window[0] for window in windows])
+    table.insert(1, 'in_sample_end', [window[1] for window in windows])
+    table.insert(2, 'out_of_sample_end', [window[2] for window in windows])
+    return table
+
+
+def _parse_datetime(value: str) -> datetime:
+    timestamp = datetime.fromisoformat(value)
+    return timestamp if timestamp.tzinfo is not None else timestamp.replace(tzinfo=UTC)
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description="Walk-forward optimization of the signal and config parameters over a tick archive")
+    argparser.add_argument("archive", help="Path to the archive directory")
+    argparser.add_argument("grid", help="Path to a yaml file mapping parameter names to lists of values, "
+                           "or with --samples to {low, high} ranges")
+    argparser.add_argument("--freq", default="M1", help="Replay frequency")
+    argparser.add_argument("--start", type=_parse_datetime, help="Start of the first window, the archive start by default")
+    argparser.add_argument("--end", type=_parse_datetime, help="End of the last window, the archive end by default")
+    argparser.add_argument("--in-sample-days", type=float, default=60, help="Length of the in sample periods")
+    argparser.add_argument("--out-of-sample-days", type=float, default=14, help="Length of the out of sample periods")
+    argparser.add_argument("--step-days", type=float, help="Shift between windows, the out of sample length by default")
+    argparser.add_argument("--samples", type=int, help="Evaluate this many random parameter sets instead of the whole grid")
+    argparser.add_argument("--seed", type=int, help="Seed of the random parameter sets")
+    argparser.add_argument("--workers", type=int, help="Number of processes, all cores by default")
+    argparser.add_argument("--output", default="walk_forward.csv", help="Path to the output csv file")
+    args = argparser.parse_args()
+
+    with open(args.grid) as file:
+        axes = yaml.safe_load(file)
+    param_sets = param_grid(**axes) if args.samples is None else param_samples(args.samples, args.seed, **axes)
+
+    archive_start, archive_end = archive_range(args.archive)
+    windows = walk_forward_windows(
+        args.start or archive_start,
+        args.end or archive_end,
+        timedelta(days=args.in_sample_days),
+        timedelta(days=args.out_of_sample_days),
+        timedelta(days=args.step_days) if args.step_days is not None else None,
+    )
+    table = run_walk_forward(args.archive, windows, args.freq, param_sets, max_workers=args.workers)
+    table.to_csv(args.output, index=False)
+    print(f"Wrote {len(table)} windows to {args.output}, out of sample pl {table['pl'].sum():.2f}")
@@ -1,5 +1,6 @@
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, Optional, Tuple
 from agentopy import IAction, IState, IPolicy, WithActionSpaceMixin, EntityInfo, SharedStateKeys
+from frankenstein.lib.trading.latency import LatencyRecorder, instrument
 from frankenstein.lib.trading.schemas import Signal
 
 
@@ -8,6 +9,9 @@ import logging
 logger = logging.getLogger(__name__)
 
 class TradingPolicy(WithActionSpaceMixin, IPolicy):
+    def __init__(self, latency: Optional[LatencyRecorder] = None) -> None:
+        super().__init__()
+        instrument(self, {'action': 'policy.action'}, latency)
 
     async def action(self, state: IState) -> Tuple[IAction, Dict[str, Any], Dict[str, Any]]:
         
@@ -7,12 +7,17 @@ from frankenstein.components.agent.management import Management
 
 logging.getLogger("agent").setLevel(logging.ERROR)
 
-def load_config_from_yaml() -> str:
-    
+def parse_args() -> argparse.Namespace:
     argparser = argparse.ArgumentParser()
     argparser.add_argument(
         "-c", "--config", default=".config.yaml", help="Path to the config file")
+    argparser.add_argument(
+        "--latency-dir", default="latency", help="Directory the latency histograms are dumped to")
     args, _ = argparser.parse_known_args()
+    return args
+
+
+def load_config_from_yaml(args: argparse.Namespace) -> str:
     
     config_path = Path(args.config)
     
@@ -23,8 +28,8 @@ def load_config_from_yaml() -> str:
         return stream.read()
 
 
-async def run(yml_str: str):
-    management = Management()
+async def run(yml_str: str, latency_dir: str):
+    management = Management(latency_dir)
     try:
         tasks = await management.start_tasks(config_str=yml_str)
         await aio.wait(tasks, return_when=aio.FIRST_EXCEPTION)
@@ -33,4 +38,5 @@ async def run(yml_str: str):
         sys.exit()
 
 if __name__ == "__main__":
-    aio.run(run(load_config_from_yaml()))
+    args = parse_args()
+    aio.run(run(load_config_from_yaml(args), args.latency_dir))
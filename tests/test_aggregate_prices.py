@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from frankenstein.lib.trading.utils import aggregate_prices, TIMEFRAMES
+
+
+def _ticks(n: int = 5000, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    index = pd.Timestamp('2024-01-05 21:00', tz='UTC') + pd.to_timedelta(np.cumsum(rng.integers(1, 40, n)), unit='s')
+    bid = 1.1 + np.cumsum(rng.normal(0, 1e-4, n))
+    return pd.DataFrame({
+        'timestamp': index,
+        'ask': bid + 1e-4,
+        'bid': bid,
+        'volume': rng.integers(1, 10, n).astype(float),
+    }, index=index)
+
+
+@pytest.mark.parametrize('period', [p for p in TIMEFRAMES if p != 'Tick'])
+def test_matches_pandas_resample(period):
+    df = _ticks()
+    bars = aggregate_prices(df, period)
+
+    expected = df.set_index('timestamp').resample(pd.Timedelta(TIMEFRAMES[period]), origin='epoch').agg(
+        {'bid': ['first', 'last', 'min', 'max'], 'volume': 'sum'}).dropna()
+    expected.columns = ['open', 'close', 'low', 'high', 'volume']
+
+    assert (bars.index == expected.index).all()
+    assert (bars.timestamp == bars.index).all()
+    for column in expected.columns:
+        np.testing.assert_allclose(bars[column].to_numpy(), expected[column].to_numpy())
+
+
+def test_does_not_mutate_input():
+    df = _ticks(100)
+    original = df.copy()
+    aggregate_prices(df, 'H4')
+    pd.testing.assert_frame_equal(df, original)
+
+
+def test_invalid_timeframe():
+    with pytest.raises(ValueError):
+        aggregate_prices(_ticks(10), 'W1')
@@ -0,0 +1,55 @@
+from datetime import datetime, UTC
+import numpy as np
+
+from frankenstein.lib.trading.archive import convert_mt5_csv, load_archive, archive_range
+from frankenstein.lib.trading.tick_store import TickStore
+from frankenstein.lib.trading.utils import load_mt5_ticks_csv
+
+MT5_TICKS = """<DATE>\t<TIME>\t<BID>\t<ASK>\t<LAST>\t<VOLUME>\t<FLAGS>
+2024.01.02\t00:00:00.120\t1.10010\t1.10020\t\t\t6
+2024.01.02\t00:00:00.870\t1.10012\t\t\t\t2
+2024.01.02\t00:00:01.500\t\t1.10025\t\t\t4
+2024.01.02\t00:00:04.010\t1.10008\t1.10018\t\t\t6
+"""
+
+
+def test_convert_and_load(tmp_path):
+    filename = tmp_path / 'EURUSD.csv'
+    filename.write_text(MT5_TICKS)
+
+    meta = convert_mt5_csv(filename, tmp_path / 'archive')
+    assert meta['rows'] == 3
+
+    store = load_archive(tmp_path / 'archive')
+    expected = TickStore.from_dataframe(load_mt5_ticks_csv(str(filename)))
+
+    assert isinstance(store.timestamps, np.memmap)
+    np.testing.assert_array_equal(store.timestamps, expected.timestamps)
+    np.testing.assert_array_equal(store.ask, expected.ask)
+    np.testing.assert_array_equal(store.bid, expected.bid)
+    assert archive_range(tmp_path / 'archive') == (
+        datetime(2024, 1, 2, 0, 0, 0, tzinfo=UTC), datetime(2024, 1, 2, 0, 0, 4, tzinfo=UTC))
+
+
+def test_streamed_chunks_match_full_load(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 2000
+    seconds = np.cumsum(rng.integers(0, 3, n)) + rng.random(n)
+    lines = ['<DATE>\t<TIME>\t<BID>\t<ASK>\t<LAST>\t<VOLUME>\t<FLAGS>']
+    for second, bid in zip(seconds, 1.1 + rng.normal(0, 1e-3, n)):
+        minutes, seconds_left = divmod(second, 60)
+        time = f"{int(minutes // 60):02d}:{int(minutes % 60):02d}:{seconds_left:06.3f}"
+        ask = '' if rng.random() < 0.3 else f"{bid + 1e-4:.5f}"
+        lines.append(f"2024.01.02\t{time}\t{bid:.5f}\t{ask}\t\t\t6")
+    filename = tmp_path / 'EURUSD.csv'
+    filename.write_text('\n'.join(lines) + '\n')
+
+    expected = TickStore.from_dataframe(load_mt5_ticks_csv(str(filename)))
+
+    meta = convert_mt5_csv(filename, tmp_path / 'archive', block_size=4096)
+    store = load_archive(tmp_path / 'archive')
+
+    assert meta['rows'] == len(expected)
+    np.testing.assert_array_equal(store.timestamps, expected.timestamps)
+    np.testing.assert_array_equal(store.ask, expected.ask)
+    np.testing.assert_array_equal(store.bid, expected.bid)
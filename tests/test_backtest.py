@@ -0,0 +1,213 @@
+import asyncio as aio
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from frankenstein.lib.trading.backtest import CLOSE_REASON_OPEN, CLOSE_REASON_SIGNAL, CLOSE_REASON_TP_SL, backtest_replay, run_backtest
+from frankenstein.lib.trading.schemas import BacktestParams, Signal
+from frankenstein.lib.trading.signals import SignalSeries
+from frankenstein.lib.trading.tick_store import TickStore, to_ns
+
+
+def reference(directions, ask, bid, params):
+    """Step by step port of SignalProvider -> Broker.tick -> TradingPolicy.action"""
+    balance = equity = float(params.balance)
+    position = None
+    curve, trades = [], []
+    for step, direction in enumerate(directions):
+        if position is not None:
+            pl = round(bid[step], 5) - position['price'] if position['is_long'] else position['price'] - round(ask[step], 5)
+            position['pl'] = pl / params.point
+            equity = balance + params.lot_size * position['pl'] * params.point * params.lot_in_units
+            if position['pl'] > params.tp or position['pl'] < -params.sl:
+                trades.append((position['step'], step, position['is_long'], position['pl'], CLOSE_REASON_TP_SL))
+                position, balance = None, equity
+        if not np.isnan(direction):
+            if position is not None:
+                if (position['is_long'] and direction <= -params.long_close_threshold) or \
+                        (not position['is_long'] and direction >= params.short_close_threshold):
+                    trades.append((position['step'], step, position['is_long'], position['pl'], CLOSE_REASON_SIGNAL))
+                    position, balance = None, equity
+            elif params.leverage > 0 and params.lot_size * params.lot_in_units * (ask[step] + bid[step]) / 2 / params.leverage > equity:
+                pass
+            elif direction >= params.long_open_threshold:
+                position = {'step': step, 'is_long': True, 'price': ask[step], 'pl': 0.0}
+            elif direction <= -params.short_open_threshold:
+                position = {'step': step, 'is_long': False, 'price': bid[step], 'pl': 0.0}
+        curve.append(equity)
+    if position is not None:
+        trades.append((position['step'], -1, position['is_long'], position['pl'], CLOSE_REASON_OPEN))
+    return np.array(curve), trades, balance
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('tp, sl', [(200, 100), (10**6, 10**6), (50, 50)])
+@pytest.mark.parametrize('leverage', [0, 30])
+def test_matches_step_by_step_simulation(seed, tp, sl, leverage):
+    rng = np.random.default_rng(seed)
+    n = 3000
+    bid = 1.1 + np.cumsum(rng.normal(0, 1e-4, n))
+    ask = bid + rng.uniform(1e-5, 5e-5, n)
+    directions = np.clip(np.cumsum(rng.normal(0, 15, n)) * 0.2, -100, 100)
+    directions[rng.random(n) < 0.05] = np.nan
+    params = BacktestParams(long_open_threshold=50, long_close_threshold=30, short_open_threshold=50, short_close_threshold=30,
+                            tp=tp, sl=sl, lot_size=0.1, balance=10000, point=1e-5, lot_in_units=100000, leverage=leverage)
+
+    result = run_backtest(np.arange(n, dtype=np.int64), directions, ask, bid, params)
+    curve, trades, balance = reference(directions, ask, bid, params)
+
+    assert len(trades) > 0
+    np.testing.assert_array_equal(result.equity, curve)
+    assert result.balance == balance
+    assert result.pl == pytest.approx(balance - params.balance)
+    assert len(result.trades) == len(trades)
+    for row, (open_step, close_step, is_long, pl, reason) in zip(result.trades, trades):
+        assert (row['open_step'], row['close_step'], row['is_long'], row['close_reason']) == (open_step, close_step, is_long, reason)
+        assert row['pl'] == pl
+
+
+def test_no_signal_holds():
+    n = 10
+    params = BacktestParams(long_open_threshold=0, long_close_threshold=0, short_open_threshold=0, short_close_threshold=0,
+                            tp=1, sl=1, lot_size=1)
+    result = run_backtest(np.arange(n, dtype=np.int64), np.full(n, np.nan), np.ones(n), np.ones(n), params)
+    assert len(result.trades) == 0
+    assert np.all(result.equity == params.balance)
+
+
+def test_opens_without_free_margin_are_refused():
+    n = 100
+    ask, bid = np.full(n, 1.10002), np.full(n, 1.1)
+    params = BacktestParams(long_open_threshold=50, long_close_threshold=50, short_open_threshold=50, short_close_threshold=50,
+                            tp=10**6, sl=10**6, lot_size=1, balance=3000, point=1e-5, lot_in_units=100000, leverage=30)
+    # 1 lot holds 3 667 of margin at 30:1, more than the balance
+    result = run_backtest(np.arange(n, dtype=np.int64), np.full(n, 100.0), ask, bid, params)
+    assert len(result.trades) == 0
+    params.balance = 4000
+    result = run_backtest(np.arange(n, dtype=np.int64), np.full(n, 100.0), ask, bid, params)
+    assert len(result.trades) == 1 and result.trades[0]['open_step'] == 0
+
+
+class Observation(dict):
+    def get_item(self, key):
+        return self.get(key)
+
+
+class ArraySignal:
+    """Stands for the SignalProvider in a fast forward replay, publishing precomputed directions"""
+
+    def __init__(self, data_provider, series: SignalSeries) -> None:
+        self._data_provider = data_provider
+        self._series = series
+
+    async def tick(self) -> None:
+        ...
+
+    async def observe(self, caller_context):
+        timestamp = self._data_provider.get_time()
+        direction = self._series.directions[self._series.index(to_ns(timestamp))]
+        return Observation(signal=None if np.isnan(direction) else Signal(timestamp, direction, None, None, '', 'EURUSD'))
+
+    def info(self):
+        return SimpleNamespace(name='SignalProvider')
+
+
+class Config:
+    """Stands for the ConfigProvider, publishing the backtest parameters"""
+
+    def __init__(self, params: BacktestParams) -> None:
+        self._items = Observation(vars(params), symbol='EURUSD')
+
+    async def tick(self) -> None:
+        ...
+
+    async def observe(self, caller_context):
+        return self._items
+
+    def info(self):
+        return SimpleNamespace(name='ConfigProvider')
+
+
+@pytest.mark.parametrize('leverage', [0, 30])
+def test_matches_the_trading_components(leverage):
+    pytest.importorskip('agentopy')
+    from frankenstein.components.environment.trading.broker import Broker
+    from frankenstein.components.environment.trading.data_provider import DataProvider
+    from frankenstein.components.environment.trading.fast_forward import FastForward
+    from frankenstein.policies.trading_policy import TradingPolicy
+
+    rng = np.random.default_rng(0)
+    n = 4 * 3600
+    timestamps = pd.Timestamp('2024-01-02', tz='UTC').value + np.arange(n, dtype=np.int64) * 10**9
+    bid = 1.1 + np.cumsum(rng.normal(0, 5e-5, n))
+    data_provider = DataProvider()
+    data_provider.load_ticks_store(TickStore(timestamps, bid + rng.uniform(1e-5, 5e-5, n), bid, np.ones(n)), 'EURUSD')
+    data_provider.reset('2024-01-02T00:00:00.0', '2024-01-02T03:59:00.0', 'M1')
+
+    steps = data_provider.replay_timestamps()
+    directions = np.clip(np.cumsum(rng.normal(0, 15, len(steps))) * 0.2, -100, 100)
+    directions[rng.random(len(steps)) < 0.05] = np.nan
+    # the first step of the replay is traded like the others
+    directions[0] = 100
+    # at 30:1 the balance runs out of margin for 0.5 lot after a few losses
+    params = BacktestParams(long_open_threshold=20, long_close_threshold=10, short_open_threshold=20, short_close_threshold=10,
+                            tp=150, sl=100, lot_size=0.5, balance=1850, point=1e-5, lot_in_units=100000, leverage=leverage)
+    expected = backtest_replay(data_provider, SignalSeries(steps, directions), 'EURUSD', params)
+
+    broker = Broker(data_provider)
+    components = [data_provider, broker, ArraySignal(data_provider, SignalSeries(steps, directions)), Config(params)]
+    policy, equity = TradingPolicy(), []
+    action = policy.action
+
+    async def act(state):
+        # the equity the policy acts on, marked at the step before its action
+        equity.append(broker._equity)
+        return await action(state)
+    policy.action = act
+    fast_forward = FastForward(components, policy)
+
+    async def run():
+        await broker.prepare_account(balance=params.balance, leverage=leverage, point=params.point, lot_in_units=params.lot_in_units,
+                                     caller_context=None)
+        await broker.is_on(is_on=True, caller_context=None)
+        return await fast_forward.run()
+
+    data_provider.reset('2024-01-02T00:00:00.0', '2024-01-02T03:59:00.0', 'M1')
+    result = aio.run(run())
+    trades = broker._trades.rows
+
+    assert expected.trades['open_step'][0] == 0 and result['steps'] == len(steps)
+    np.testing.assert_array_equal(equity, expected.equity)
+    assert broker._balance == expected.balance
+    np.testing.assert_array_equal(trades['open_timestamp'], expected.trades['open_timestamp'])
+    np.testing.assert_array_equal(trades['pl'], expected.trades['pl'])
+
+
+def test_fast_forward_prepares_the_environment():
+    pytest.importorskip('agentopy')
+    from frankenstein.components.environment.trading.broker import Broker
+    from frankenstein.components.environment.trading.data_provider import DataProvider
+    from frankenstein.components.environment.trading.fast_forward import FastForward
+    from frankenstein.components.environment.trading.signal_provider import SignalProvider
+    from frankenstein.policies.trading_policy import TradingPolicy
+
+    n = 3600
+    timestamps = pd.Timestamp('2024-01-02', tz='UTC').value + np.arange(n, dtype=np.int64) * 10**9
+    data_provider = DataProvider()
+    data_provider.load_ticks_store(TickStore(timestamps, np.full(n, 1.1002), np.full(n, 1.1), np.ones(n)), 'EURUSD')
+    broker = Broker(data_provider)
+    signal_provider = SignalProvider(data_provider, 'EURUSD')
+    fast_forward = FastForward([data_provider, broker, signal_provider], TradingPolicy())
+
+    signal = dict(bands_enabled=True, bands_timeframe='M5', bands_window=7, bands_dev=2, rsi_enabled=False, rsi_timeframe='M5',
+                  rsi_period=13, stochastic_enabled=False, stochastic_timeframe='M5', stochastic_smooth=3, stochastic_period=14)
+    account = dict(balance=5000, leverage=10, point=1e-5, lot_in_units=100000)
+    aio.run(fast_forward.prepare(account=account, signal=signal))
+    assert broker._is_on and broker._balance == 5000 and broker._leverage == 10
+    assert signal_provider._params['bands_timeframe'] == 'M5'
+
+    with pytest.raises(AssertionError, match='Tick'):
+        aio.run(fast_forward.prepare(signal={**signal, 'bands_timeframe': 'Tick'}, broker_on=False))
+    assert not broker._is_on
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from frankenstein.lib.trading.bar_series import BarSeries
+from frankenstein.lib.trading.tick_store import TickStore
+from frankenstein.lib.trading.utils import aggregate_prices
+
+
+def _ticks(n: int = 3000, seed: int = 1) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    index = pd.Timestamp('2024-01-02', tz='UTC') + pd.to_timedelta(np.cumsum(rng.integers(1, 30, n)), unit='s')
+    bid = 1.1 + np.cumsum(rng.normal(0, 1e-4, n))
+    return pd.DataFrame({'timestamp': index, 'ask': bid + 1e-4, 'bid': bid, 'volume': rng.integers(1, 5, n).astype(float)}, index=index)
+
+
+@pytest.mark.parametrize('timeframe', ['M1', 'M10', 'H1'])
+def test_window_matches_full_aggregation(timeframe):
+    df = _ticks()
+    store = TickStore.from_dataframe(df)
+    series = BarSeries(store, timeframe)
+
+    rng = np.random.default_rng(2)
+    for position in rng.integers(0, len(df), 20):
+        timestamp = df.index[position] + pd.Timedelta(seconds=int(rng.integers(0, 2)))
+        expected = aggregate_prices(df.loc[:timestamp], timeframe).iloc[-50:]
+        window = series.window(timestamp.value, 50)
+        assert (window['timestamp'] == expected.index.asi8).all()
+        for column in ['open', 'close', 'low', 'high', 'volume']:
+            np.testing.assert_allclose(window[column], expected[column].to_numpy())
+
+
+def test_extends_with_appended_ticks():
+    df = _ticks()
+    full = TickStore.from_dataframe(df)
+    store = TickStore(full.timestamps[:1000], full.ask[:1000], full.bid[:1000], full.volume[:1000])
+    series = BarSeries(store, 'M5')
+    series.window()
+
+    store.timestamps, store.ask, store.bid, store.volume = full.timestamps, full.ask, full.bid, full.volume
+    window = series.window()
+
+    expected = aggregate_prices(df, 'M5')
+    assert len(series) == len(expected)
+    np.testing.assert_allclose(window['close'], expected['close'].to_numpy())
+    np.testing.assert_allclose(window['volume'], expected['volume'].to_numpy())
@@ -0,0 +1,126 @@
+import asyncio as aio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('agentopy')
+
+from frankenstein.components.environment.trading.broker import Broker
+from frankenstein.components.environment.trading.data_provider import DataProvider
+from frankenstein.lib.trading.latency import LatencyRecorder
+from frankenstein.lib.trading.schemas import TickBatch
+from frankenstein.lib.trading.tick_store import TickStore
+
+
+def make_broker(**prices) -> Broker:
+    n = 600
+    timestamps = pd.Timestamp('2024-01-02', tz='UTC').value + np.arange(n, dtype=np.int64) * 10**9
+    data_provider = DataProvider()
+    for symbol, bid in prices.items():
+        data_provider.load_ticks_store(TickStore(timestamps, np.full(n, bid + 0.002), np.full(n, float(bid)), np.ones(n)), symbol)
+    data_provider.reset('2024-01-02T00:00:00.0', '2024-01-02T00:09:00.0', 'S1')
+    data_provider.step()
+    broker = Broker(data_provider)
+
+    async def prepare():
+        await broker.prepare_account(balance=10000, leverage=30, point=1e-5, lot_in_units=100000, caller_context=None)
+        await broker.is_on(is_on=True, caller_context=None)
+    aio.run(prepare())
+    return broker
+
+
+def open_long(broker, symbol, volume):
+    return aio.run(broker.open(symbol=symbol, price=0, volume=volume, is_long=True, take_profit_pips=10**6,
+                               stop_loss_pips=10**6, comment='', caller_context=None))
+
+
+def test_margin_is_in_account_currency():
+    broker = make_broker(USDJPY=150.0)
+    aio.run(broker.set_symbol(symbol='USDJPY', point=1e-3, lot_in_units=100000, caller_context=None))
+    # 10 000 dollars of notional at 30:1 hold 333 dollars, not 150 times that
+    assert open_long(broker, 'USDJPY', 0.1).success
+    aio.run(broker.tick())
+    assert broker._margin == pytest.approx(0.1 * 100000 / 30, rel=1e-4)
+    # 2 points of 0.001 yen of spread on 10 000 units, in dollars
+    assert broker._equity == pytest.approx(10000 - 0.1 * 100000 * 0.002 / 150.001, rel=1e-6)
+
+
+def test_cross_is_converted_through_the_loaded_pair():
+    broker = make_broker(EURJPY=160.0, USDJPY=150.0)
+    assert open_long(broker, 'EURJPY', 0.1).success
+    position = broker._book.position(broker._book.slot('EURJPY'))
+    assert position['conversion'] == pytest.approx(1 / 150.001)
+    assert broker._book.margin(np.array([0]), np.array([160.002]), np.array([160.0]), 30) == pytest.approx(0.1 * 100000 * 160.001 / 150.001 / 30)
+
+
+def test_set_balance_refreshes_the_free_margin():
+    broker = make_broker(EURUSD=1.1)
+    aio.run(broker.set_balance(balance=100, caller_context=None))
+    assert broker._equity == 100
+    assert not open_long(broker, 'EURUSD', 0.1).success
+    aio.run(broker.set_balance(balance=10000, caller_context=None))
+    assert open_long(broker, 'EURUSD', 0.1).success
+
+
+class ListFeed:
+    """Pushes its batches then stays attached until it is closed"""
+
+    def __init__(self, batches):
+        self._batches = batches
+        self.pushed = aio.Event()
+        self._closed = aio.Event()
+
+    async def batches(self):
+        for batch in self._batches:
+            yield batch
+        self.pushed.set()
+        await self._closed.wait()
+
+    async def close(self):
+        self._closed.set()
+
+
+def test_loop_ticks_are_skipped_while_a_feed_is_attached():
+    start = pd.Timestamp('2024-01-02', tz='UTC').value
+    batches = [TickBatch('EURUSD', start + np.arange(i, i + 3, dtype=np.int64) * 10**9, np.full(3, 1.1002), np.full(3, 1.1), np.ones(3), 0)
+               for i in (0, 3)]
+
+    async def run():
+        latency = LatencyRecorder()
+        data_provider = DataProvider()
+        broker = Broker(data_provider, latency=latency)
+        feed = ListFeed(batches)
+        task = data_provider.start_feed(feed)
+        await feed.pushed.wait()
+        # every push is handled once, the tick loop does not handle it again
+        await broker.tick()
+        ticks = [latency.histogram('broker.tick').count]
+        await feed.close()
+        await task
+        await broker.tick()
+        ticks.append(latency.histogram('broker.tick').count)
+        return ticks
+
+    assert aio.run(run()) == [2, 3]
+
+
+def test_every_tick_reads_one_quote_of_the_symbols_and_their_crosses():
+    broker = make_broker(EURJPY=160.0, GBPJPY=190.0, USDJPY=150.0, EURUSD=1.1)
+    for symbol in ('EURJPY', 'GBPJPY'):
+        assert open_long(broker, symbol, 0.1).success
+
+    data_provider, calls = broker._data_provider, []
+    quotes, price = data_provider.quotes, data_provider.price
+    data_provider.quotes = lambda symbols, timestamp=None: calls.append(list(symbols)) or quotes(symbols, timestamp)
+    data_provider.price = lambda *args: calls.append('price') or price(*args)
+    data_provider.step()
+    aio.run(broker.tick())
+
+    # the yen crosses are converted by the USDJPY quoted with them
+    assert calls == [['EURJPY', 'GBPJPY', 'USDJPY']]
+    ask, bid, conversions = broker._quotes(['EURJPY', 'GBPJPY', 'EURUSD'], data_provider.get_time())
+    np.testing.assert_array_equal(ask, [160.002, 190.002, 1.102])
+    np.testing.assert_allclose(conversions, [1 / 150.001, 1 / 150.001, 1.0])
+    aio.run(broker.set_symbol(symbol='GBPJPY', point=1e-3, lot_in_units=100000, quote_to_account=0.005, caller_context=None))
+    np.testing.assert_allclose(broker._quotes(['EURJPY', 'GBPJPY'], data_provider.get_time())[2], [1 / 150.001, 0.005])
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+from datatable import dt
+
+from frankenstein.lib.trading.dt_store import DtTickStore, to_dt_frame
+from frankenstein.lib.trading.tick_store import TickStore
+from frankenstein.lib.trading.utils import aggregate_prices
+
+
+def _ticks(n: int = 4000, seed: int = 3) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    index = pd.Timestamp('2024-01-05 20:00', tz='UTC') + pd.to_timedelta(np.cumsum(rng.integers(1, 40, n)), unit='s')
+    bid = 1.1 + np.cumsum(rng.normal(0, 1e-4, n))
+    return pd.DataFrame({'timestamp': index, 'ask': bid + 1e-4, 'bid': bid, 'volume': rng.integers(1, 5, n).astype(float)}, index=index)
+
+
+def test_lookups_match_pandas_store():
+    df = _ticks()
+    dt_store = DtTickStore(dt.Frame(df))
+    pd_store = TickStore.from_dataframe(df)
+
+    for timestamp in [df.index[0].value - 1, df.index[7].value, df.index[7].value + 10**9, df.index[-1].value + 1]:
+        assert dt_store.price('bid', timestamp) == pd_store.price('bid', timestamp)
+        assert dt_store.bounds(timestamp, 5) == pd_store.bounds(timestamp, 5)
+    pd.testing.assert_frame_equal(dt_store.to_dataframe(10, 20), pd_store.to_dataframe(10, 20))
+
+
+@pytest.mark.parametrize('timeframe', ['Tick', 'M1', 'M10', 'H4', 'D1'])
+def test_bars_match_aggregate_prices(timeframe):
+    df = _ticks()
+    store = DtTickStore(dt.Frame(df))
+
+    for position in [10, 2000, len(df) - 1]:
+        timestamp = df.index[position]
+        expected = aggregate_prices(df.loc[:timestamp], timeframe).iloc[-30:]
+        bars = store.bars(timeframe, timestamp.value, 30)
+        np.testing.assert_array_equal(bars['timestamp'], expected.index.asi8)
+        for column in ['open', 'close', 'low', 'high', 'volume']:
+            np.testing.assert_allclose(bars[column], expected[column].to_numpy())
+
+
+def test_keys_on_the_index_like_pandas_store():
+    # MT5 tick exports keep the millisecond timestamps in a column and index the ticks by the second
+    rng = np.random.default_rng(5)
+    n = 3000
+    timestamps = pd.Timestamp('2024-01-05 20:00', tz='UTC') + pd.to_timedelta(np.cumsum(rng.integers(1, 4000, n)), unit='ms')
+    bid = 1.1 + np.cumsum(rng.normal(0, 1e-4, n))
+    df = pd.DataFrame({'timestamp': timestamps, 'ask': bid + 1e-4, 'bid': bid, 'volume': np.ones(n)}, index=timestamps.floor('1s'))
+    df = df[~df.index.duplicated(keep='last')]
+
+    dt_store = DtTickStore(to_dt_frame(df))
+    pd_store = TickStore.from_dataframe(df)
+
+    np.testing.assert_array_equal(dt_store.timestamps, pd_store.timestamps)
+    for position in [0, 100, len(df) - 1]:
+        timestamp = df.index[position].value + 500 * 10**6
+        assert dt_store.price('bid', timestamp) == pd_store.price('bid', timestamp)
+        bars = dt_store.bars('M1', timestamp, 20)
+        expected = aggregate_prices(pd_store.to_dataframe(*pd_store.bounds(timestamp)), 'M1').iloc[-20:]
+        np.testing.assert_array_equal(bars['timestamp'], expected.index.asi8)
+        np.testing.assert_allclose(bars['close'], expected['close'].to_numpy())
+    assert DtTickStore.from_dataframe(df).price('bid', df.index[5].value) == pd_store.price('bid', df.index[5].value)
+
+
+def test_repeated_and_unsorted_timestamps_like_pandas_store():
+    df = _ticks(500)
+    # ticks sharing their timestamp, as MT5 tick exports indexed by the second have, out of order
+    df.index = df.index.floor('1min')
+    df['timestamp'] = df.index
+    df = df.iloc[np.random.default_rng(7).permutation(len(df))]
+    pd_store = TickStore.from_dataframe(df)
+
+    for dt_store in (DtTickStore(to_dt_frame(df)), DtTickStore(dt.Frame(df))):
+        np.testing.assert_array_equal(dt_store.timestamps, pd_store.timestamps)
+        np.testing.assert_array_equal(dt_store.bid, pd_store.bid)
+        for timestamp in [df.index.min().value, df.index[3].value, df.index.max().value + 1]:
+            assert dt_store.price('ask', timestamp) == pd_store.price('ask', timestamp)
+            assert dt_store.bounds(timestamp, 5) == pd_store.bounds(timestamp, 5)
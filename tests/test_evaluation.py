@@ -0,0 +1,107 @@
+import json
+from datetime import datetime
+
+import numpy as np
+import pytest
+from stable_baselines3.ppo.ppo import PPO
+
+from frankenstein.components.environment.trading.ml.environement import TradingEnv
+from frankenstein.components.environment.trading.ml.evaluation import (
+    CsvEnvFactory, evaluate_episode, load_data_provider, market_data, run_evaluation, write_report
+)
+from frankenstein.components.environment.trading.ml.vec_env import TradingVecEnv
+from frankenstein.lib.trading.utils import load_mt5_bars_csv, load_mt5_ticks_csv
+from tests.replays import ArrayReplay
+from tests.test_archive import MT5_TICKS
+
+MT5_BARS = """<DATE>\t<TIME>\t<OPEN>\t<HIGH>\t<LOW>\t<CLOSE>\t<TICKVOL>\t<VOL>\t<SPREAD>
+2024.01.02\t00:00:00\t1.10010\t1.10030\t1.10000\t1.10020\t12\t0\t8
+2024.01.02\t00:01:00\t1.10020\t1.10040\t1.10010\t1.10035\t9\t0\t7
+2024.01.02\t00:02:00\t1.10035\t1.10050\t1.10020\t1.10025\t15\t0\t9
+"""
+
+
+class NpyEnvFactory:
+    def __call__(self, dataset):
+        return TradingEnv(ArrayReplay(np.load(dataset)), '', '', 'M1', 6)
+
+
+def make_checkpoint(path, seed):
+    rng = np.random.default_rng(seed)
+    model = PPO("MlpPolicy", TradingVecEnv(1.1 + np.cumsum(rng.normal(0, 1e-4, 100)), num_envs=2),
+                n_steps=16, batch_size=16, n_epochs=1, seed=seed, policy_kwargs=dict(net_arch=[8]))
+    model.learn(total_timesteps=32)
+    model.save(path)
+    return model
+
+
+def test_evaluate_episode(tmp_path):
+    model = make_checkpoint(tmp_path / 'model', 0)
+    bids = 1.1 + np.cumsum(np.random.default_rng(1).normal(0, 1e-4, 80))
+
+    result = evaluate_episode(model, TradingEnv(ArrayReplay(bids), '', '', 'M1', 6))
+
+    # the episode starts on the step after the warm-up and its last step runs past the last price
+    assert result['steps'] == len(bids) - 7
+    assert sum(result[f'{name}_count'] for name in ('buy', 'sell', 'close', 'hold')) == result['steps']
+    assert len(result['equity']) == result['steps'] and result['final_equity'] == result['equity'][-1]
+    assert result['min_reward'] <= result['mean_reward'] <= result['max_reward']
+
+
+def test_run_evaluation_in_processes(tmp_path):
+    checkpoints = []
+    for seed in range(2):
+        make_checkpoint(tmp_path / f'model_{seed}', seed)
+        checkpoints.append(str(tmp_path / f'model_{seed}.zip'))
+    datasets = []
+    for seed in range(3):
+        np.save(tmp_path / f'bids_{seed}.npy', 1.1 + np.cumsum(np.random.default_rng(seed).normal(0, 1e-4, 60)))
+        datasets.append(str(tmp_path / f'bids_{seed}.npy'))
+
+    results = run_evaluation(checkpoints, datasets, NpyEnvFactory(), max_workers=2)
+
+    assert [(r['checkpoint'], r['dataset']) for r in results] == [(c, d) for c in checkpoints for d in datasets]
+    expected = evaluate_episode(PPO.load(checkpoints[1], device='cpu'), NpyEnvFactory()(datasets[2]))
+    np.testing.assert_array_equal(results[-1]['equity'], expected['equity'])
+    assert results[-1]['total_reward'] == expected['total_reward']
+
+    write_report(results, tmp_path / 'report.json')
+    with open(tmp_path / 'report.json') as file:
+        runs = json.load(file)['runs']
+    assert len(runs) == 6 and runs[0]['equity'] == results[0]['equity'].tolist()
+
+
+def test_datasets_are_cached_under_the_cache_dir(tmp_path):
+    pytest.importorskip('agentopy')
+    filename = tmp_path / 'EURUSD.csv'
+    filename.write_text(MT5_BARS)
+
+    data_provider, _, _ = load_data_provider(str(filename), cache_dir=tmp_path / 'cache')
+    assert len(list((tmp_path / 'cache').iterdir())) == 1
+    # the same directory, however it is spelled, is one service of the process
+    assert market_data(tmp_path / 'cache') is market_data(str(tmp_path / 'cache' / '..' / 'cache'))
+    assert market_data(tmp_path / 'other') is not market_data(tmp_path / 'cache')
+
+    env = CsvEnvFactory('M1', 1, tmp_path / 'cache')(str(filename))
+    assert isinstance(env, TradingEnv) and len(list((tmp_path / 'cache').iterdir())) == 1
+
+
+@pytest.mark.parametrize('bars', [True, False], ids=['bars', 'ticks'])
+def test_load_data_provider_returns_the_range_of_the_dataset(tmp_path, bars):
+    pytest.importorskip('agentopy')
+    filename = tmp_path / 'EURUSD.csv'
+    filename.write_text(MT5_BARS if bars else MT5_TICKS)
+    df = load_mt5_bars_csv(str(filename)) if bars else load_mt5_ticks_csv(str(filename))
+
+    data_provider, start, end = load_data_provider(str(filename), bars=bars, cache_dir=tmp_path / 'cache')
+
+    # the first and last timestamps of the export floored to the second, aware and in UTC as the DataFrame ones
+    assert (start, end) == (df['timestamp'].iloc[0].replace(microsecond=0), df['timestamp'].iloc[-1].replace(microsecond=0))
+    assert start.utcoffset() == end.utcoffset() == df['timestamp'].iloc[0].utcoffset()
+    # and replayed over in full from the strings the environments are built with
+    data_provider.reset(*(datetime.strftime(t, "%Y-%m-%dT%H:%M:%S.0") for t in (start, end)), 'Tick')
+    ticks = 0
+    while data_provider.get_time() is not None:
+        ticks += 1
+        data_provider.step()
+    assert ticks == len(df)
@@ -0,0 +1,51 @@
+import asyncio as aio
+import math
+
+import numpy as np
+import pytest
+
+from frankenstein.lib.trading.bar_series import BarSeries
+from frankenstein.lib.trading.feeds import SimulatedExchange, WebsocketTickFeed
+from frankenstein.lib.trading.tick_store import TickStore
+
+
+def make_store(n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    timestamps = 1_704_182_400 * 10**9 + np.cumsum(rng.integers(1, 2000, n)).astype(np.int64) * 10**6
+    bid = 1.1 + np.cumsum(rng.normal(0, 1e-5, n))
+    return TickStore(timestamps, bid + 2e-5, bid, rng.integers(1, 5, n).astype(np.float64))
+
+
+async def stream(exchange, n_ticks):
+    """Collects the streamed ticks into an empty store, as DataProvider does"""
+    store, batches = TickStore.empty(), 0
+    feed = WebsocketTickFeed(f"ws://localhost:{exchange.port()}")
+    async for batch in feed.batches():
+        assert batch.symbol == 'EURUSD'
+        store.append(batch.timestamps, batch.ask, batch.bid, batch.volume)
+        batches += 1
+        if len(store) == n_ticks:
+            await feed.close()
+    return store, batches
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('speed', [math.inf, 2000.0])
+async def test_streams_the_whole_store(speed):
+    source = make_store()
+    exchange = SimulatedExchange(source, 'EURUSD', port=0, speed=speed, max_batch=500)
+    await exchange.start()
+    try:
+        store, batches = await aio.wait_for(stream(exchange, len(source)), timeout=30)
+    finally:
+        await exchange.close()
+
+    np.testing.assert_array_equal(store.timestamps, source.timestamps)
+    np.testing.assert_array_equal(store.ask, source.ask)
+    np.testing.assert_array_equal(store.bid, source.bid)
+    np.testing.assert_array_equal(store.volume, source.volume)
+    # as fast as possible the ticks go out in full batches, in real time they trickle in as they are due
+    assert batches == len(source) // 500 if math.isinf(speed) else batches > len(source) // 500
+
+    # the bars of the streamed ticks are the bars of the source
+    np.testing.assert_array_equal(BarSeries(store, 'M1').window()['close'], BarSeries(source, 'M1').window()['close'])
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from frankenstein.lib.trading.fills import first_crossing
+
+
+@pytest.mark.parametrize('is_long', [True, False])
+def test_first_crossing_matches_tick_by_tick(is_long):
+    rng = np.random.default_rng(0)
+    n = 5000
+    timestamps = np.cumsum(rng.integers(1, 5, n)).astype(np.int64)
+    bid = 1.1 + np.cumsum(rng.normal(0, 2e-5, n))
+    ask = bid + 2e-5
+    point, take_profit, stop_loss = 1e-5, 150, 100
+
+    for start_ns, stop_ns in [(0, timestamps[-1]), (timestamps[100], timestamps[900]), (timestamps[2000] + 1, timestamps[2100] - 1)]:
+        start = int(np.searchsorted(timestamps, start_ns, side='right'))
+        price = ask[max(start - 1, 0)] if is_long else bid[max(start - 1, 0)]
+        expected = (-1, None)
+        for i in range(start, n):
+            if timestamps[i] > stop_ns:
+                break
+            pl = (round(bid[i], 5) - price if is_long else price - round(ask[i], 5)) / point
+            if pl > take_profit or pl < -stop_loss:
+                expected = (i, pl)
+                break
+
+        index, pl = first_crossing(timestamps, ask, bid, start_ns, stop_ns, is_long, price, take_profit, stop_loss, point)
+        assert index == expected[0]
+        if index >= 0:
+            assert pl == expected[1]
+        else:
+            assert np.isnan(pl)
+
+
+def test_empty_window():
+    timestamps = np.array([10, 20, 30], dtype=np.int64)
+    prices = np.array([1.0, 2.0, 3.0])
+    assert first_crossing(timestamps, prices, prices, 20, 29, True, 1.0, 0.5, 0.5, 1)[0] == -1
+    assert first_crossing(timestamps, prices, prices, 20, 30, True, 1.0, 0.5, 0.5, 1)[0] == 2
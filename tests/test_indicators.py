@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+from ta import momentum, volatility
+
+from frankenstein.lib.trading.indicators import IndicatorTable, StreamingBollinger, StreamingRSI, StreamingStochastic
+
+MINUTE = 60 * 10**9
+
+
+def test_latest_completed_bar():
+    bars = np.arange(0, 10 * 10 * MINUTE, 10 * MINUTE)
+    table = IndicatorTable(bars, 'M10', {'value': np.arange(10.0)})
+
+    assert table.position(0) == -1
+    assert table.position(10 * MINUTE - 1) == -1
+    assert table.position(10 * MINUTE) == 0
+    assert table.position(25 * MINUTE) == 1
+    assert table.position(1000 * MINUTE) == 9
+    # going back in time falls back to a binary search
+    assert table.position(35 * MINUTE) == 2
+    assert table.value('value', table.position(35 * MINUTE)) == 2.0
+
+
+def test_cursor_matches_binary_search():
+    rng = np.random.default_rng(0)
+    bars = np.cumsum(rng.integers(1, 4, 500)) * 5 * MINUTE
+    table = IndicatorTable(bars, 'M5', {'value': rng.random(500)})
+
+    steps = np.sort(rng.integers(0, int(bars[-1]) + 10 * MINUTE, 2000))
+    expected = table.positions(steps)
+    assert [table.position(int(step)) for step in steps] == expected.tolist()
+
+
+def test_append_extends_lookups():
+    table = IndicatorTable(np.array([0, 10 * MINUTE]), 'M10', {'value': np.array([1.0, 2.0])})
+    for i in range(2, 40):
+        table.append(i * 10 * MINUTE, {'value': float(i + 1)})
+
+    assert len(table) == 40
+    assert table.last_bar() == 39 * 10 * MINUTE
+    assert table.value('value', table.position(40 * 10 * MINUTE)) == 40.0
+    assert table.column('value').tolist() == [float(i + 1) for i in range(40)]
+
+
+def test_truncate_then_append_replaces_the_dropped_bar():
+    values = np.array([1.0, 2.0, 3.0])
+    values.flags.writeable = False
+    table = IndicatorTable(np.array([0, 10 * MINUTE, 20 * MINUTE]), 'M10', {'value': values})
+    table.truncate(2)
+    assert table.last_bar() == 10 * MINUTE and table.position(40 * MINUTE) == 1
+
+    table.append(20 * MINUTE, {'value': 30.0})
+    assert table.column('value').tolist() == [1.0, 2.0, 30.0] and values[2] == 3.0
+
+
+def test_streaming_indicators_match_ta():
+    rng = np.random.default_rng(1)
+    close = pd.Series(1.1 + np.cumsum(rng.normal(0, 1e-4, 500)))
+    close[100:110] = close[99]
+    high = close + rng.uniform(0, 1e-4, 500)
+    low = close - rng.uniform(0, 1e-4, 500)
+
+    bollinger, rsi, stochastic = StreamingBollinger(7, 2), StreamingRSI(13), StreamingStochastic(14)
+    streamed = np.array([
+        [*bollinger.update(c), rsi.update(c), stochastic.update(h, l, c)]
+        for c, h, l in zip(close, high, low)
+    ])
+
+    expected = np.column_stack([
+        volatility.bollinger_hband(close, window=7, window_dev=2),
+        volatility.bollinger_lband(close, window=7, window_dev=2),
+        volatility.bollinger_mavg(close, window=7),
+        momentum.rsi(close, window=13),
+        momentum.stoch(high, low, close, window=14, smooth_window=3),
+    ])
+    np.testing.assert_allclose(streamed, expected, rtol=1e-7, atol=1e-9)
@@ -0,0 +1,95 @@
+import asyncio as aio
+import json
+
+import numpy as np
+import pytest
+
+from frankenstein.lib.trading.latency import LatencyHistogram, LatencyRecorder, dump_path, instrument
+
+
+def test_histogram_percentiles_within_precision():
+    values = np.random.default_rng(0).lognormal(10, 1.5, 100_000).astype(np.int64)
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(int(value))
+
+    assert histogram.count == len(values) and histogram.max == values.max()
+    for q in (50, 99, 99.9):
+        exact = np.percentile(values, q, method='inverted_cdf')
+        assert exact <= histogram.percentile(q) <= exact * (1 + 2 ** -6)
+    assert histogram.percentile(100) == values.max()
+
+    small = LatencyHistogram()
+    for value in range(100):
+        small.record(value)
+    assert small.percentile(50) == 49
+
+
+def test_percentiles_sum_the_counts_once_per_record():
+    histogram = LatencyHistogram()
+    for value in (10, 20, 30):
+        histogram.record(value)
+    histogram.summary()
+    cumulative = histogram._cumulative
+    assert histogram.percentile(99) == 30 and histogram._cumulative is cumulative
+    histogram.record(100)
+    assert histogram._cumulative is None
+    assert histogram.percentile(100) == 100
+    histogram.merge(LatencyHistogram())
+    assert histogram._cumulative is None and histogram.percentile(50) == 20
+
+
+def test_merge_and_dump(tmp_path):
+    first, second = LatencyHistogram(), LatencyHistogram()
+    for value in range(1000):
+        (first if value % 2 else second).record(value * 1000)
+    first.merge(second)
+    assert first.count == 1000 and first.max == 999_000
+    assert 499_000 <= first.percentile(50) <= 499_000 * (1 + 2 ** -6)
+
+    recorder = LatencyRecorder()
+    recorder.record('broker.open', 1500)
+    recorder.record('broker.open', 2500)
+    recorder.record('policy.action', 800)
+    assert set(recorder.summary('broker.')) == {'broker.open'}
+
+    recorder.dump(tmp_path / 'latency.json')
+    with open(tmp_path / 'latency.json') as file:
+        dumped = json.load(file)
+    assert dumped['broker.open']['count'] == 2 and dumped['broker.open']['max'] == 2.5
+    assert sum(dumped['policy.action']['buckets_ns'].values()) == 1
+
+
+def test_dump_path_stays_in_the_directory(tmp_path):
+    assert dump_path(tmp_path / 'latency', 'run/1.json') == tmp_path / 'latency' / 'run' / '1.json'
+    assert (tmp_path / 'latency' / 'run').is_dir()
+    for name in ('../latency.json', 'run/../../latency.json', str(tmp_path / 'latency.json'), '.', ''):
+        with pytest.raises(ValueError):
+            dump_path(tmp_path / 'latency', name)
+
+
+class Pipeline:
+    def __init__(self, latency=None):
+        instrument(self, {'price': 'pipeline.price', 'tick': 'pipeline.tick'}, latency)
+
+    def price(self, value):
+        return value * 2
+
+    async def tick(self):
+        await aio.sleep(0)
+        return 'ticked'
+
+
+def test_instrument_times_only_when_configured():
+    untouched = Pipeline()
+    assert 'price' not in vars(untouched) and 'tick' not in vars(untouched)
+
+    recorder = LatencyRecorder()
+    pipeline = Pipeline(recorder)
+    assert pipeline.price(2) == 4
+    assert aio.run(pipeline.tick()) == 'ticked'
+    assert aio.run(pipeline.tick()) == 'ticked'
+
+    assert recorder.histogram('pipeline.price').count == 1
+    assert recorder.histogram('pipeline.tick').count == 2
+    assert recorder.summary()['pipeline.tick']['p50'] > 0
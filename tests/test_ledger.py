@@ -0,0 +1,44 @@
+import numpy as np
+import pyarrow.parquet as pq
+import pytest
+
+from frankenstein.lib.trading.ledger import TradeLedger
+
+
+def test_ledger_growth_and_summary():
+    ledger = TradeLedger(capacity=2)
+    profits = [5.0, -2.0, 3.0, -1.0, 0.0]
+    for i, profit in enumerate(profits):
+        index = ledger.open('EURUSD', i * 10, i % 2 == 0, 1.1, 0.1, 300, 100, f'open {i}')
+        ledger.update(index, profit / 2)
+        ledger.close(index, i * 10 + 5, profit, profit, f'close {i}')
+    ledger.open('GBPUSD', 100, True, 1.3, 0.2, 300, 100, 'still open')
+
+    assert len(ledger) == 6
+    assert ledger.rows['symbol'].tolist() == ['EURUSD'] * 5 + ['GBPUSD']
+    summary = ledger.summary()
+    assert (summary['trade_count'], summary['open_count'], summary['closed_count']) == (6, 1, 5)
+    assert (summary['win_count'], summary['loss_count']) == (2, 2)
+    assert summary['win_rate'] == pytest.approx(0.4)
+    assert summary['gross_profit'] == 8.0 and summary['gross_loss'] == -3.0 and summary['total_profit'] == 5.0
+    assert summary['average_pl'] == pytest.approx(1.0)
+
+    recent = ledger.recent(2)
+    assert [trade['open_comment'] for trade in recent] == ['open 4', 'still open']
+    assert recent[0]['close_comment'] == 'close 4' and recent[0]['close_timestamp'] == 45
+    assert recent[1]['is_open'] and recent[1]['close_timestamp'] == -1 and recent[1]['close_comment'] is None
+
+
+def test_parquet_export(tmp_path):
+    ledger = TradeLedger()
+    ledger.open('EURUSD', 1_700_000_000 * 10**9, True, 1.1, 0.1, 300, 100, 'a')
+    ledger.close(0, 1_700_000_060 * 10**9, 12.0, 1.2, 'b')
+    ledger.open('EURUSD', 1_700_000_120 * 10**9, False, 1.2, 0.1, 300, 100, 'c')
+
+    ledger.to_parquet(tmp_path / 'trades.parquet')
+    df = pq.read_table(tmp_path / 'trades.parquet').to_pandas()
+
+    assert df['close_comment'].iloc[0] == 'b' and df['close_comment'].isna().iloc[1]
+    assert df['open_timestamp'].iloc[1].value == 1_700_000_120 * 10**9
+    assert df['close_timestamp'].isna().tolist() == [False, True]
+    np.testing.assert_array_equal(df['profit'], [1.2, 0.0])
@@ -0,0 +1,152 @@
+import asyncio as aio
+from types import SimpleNamespace
+
+import pytest
+
+from frankenstein.lib.trading.lockstep import LockStep, StepState
+
+
+class DictState(dict):
+    def get_item(self, key):
+        return self.get(key)
+
+    def set_item(self, key, value):
+        self[key] = value
+
+    def remove_item(self, key):
+        self.pop(key, None)
+
+    def slice_by_prefix(self, prefix):
+        return DictState({key: value for key, value in self.items() if key.startswith(prefix)})
+
+
+class Component:
+    def __init__(self, name, log):
+        self._name = name
+        self._log = log
+
+    async def tick(self):
+        self._log.append(('tick', self._name))
+
+    async def observe(self, caller_context):
+        self._log.append(('observe', self._name))
+        return DictState(name=self._name, context=caller_context)
+
+    def info(self):
+        return SimpleNamespace(name=self._name)
+
+
+class Clock(Component):
+    """Stands for the data provider, runs out of time after steps ticks"""
+
+    def __init__(self, log, steps):
+        super().__init__('DataProvider', log)
+        self._steps = steps
+        self.resets = []
+
+    async def tick(self):
+        await super().tick()
+        self._steps -= 1
+
+    def get_time(self):
+        return None if self._steps <= 0 else self._steps
+
+    def is_live(self):
+        return False
+
+    def reset(self, start, end, freq):
+        self.resets.append((start, end, freq))
+
+
+class Action:
+    """Every action equals every other one, only its identity tells it apart"""
+
+    def __eq__(self, other):
+        return True
+
+    __hash__ = object.__hash__
+
+
+class Policy:
+    """Opens on the first step and every other one after, reading the clock through the step state"""
+
+    def __init__(self, log):
+        self._log = log
+        self.actions = {'open': Action(), 'hold': Action()}
+        self.states = []
+
+    async def action(self, state):
+        self.states.append(state)
+        self._log.append(('action', None))
+        name = 'open' if state.get_item('environment.components.DataProvider.name') == 'DataProvider' and len(self.states) % 2 else 'hold'
+        return self.actions[name], {'caller_context': state.slice_by_prefix('agent.context')}, {}
+
+
+def make_lockstep(steps=3):
+    log, calls = [], []
+    clock = Clock(log, steps)
+    components = [clock, Component('Broker', log), Component('SignalProvider', log)]
+    policy = Policy(log)
+
+    def act(name):
+        async def fn(**kwargs):
+            log.append(('act', name))
+            calls.append((name, kwargs))
+        return fn
+
+    dispatch = {id(action): (name, act(name)) for name, action in policy.actions.items()}
+    state = DictState({'agent.context.id': 1, 'agent.memory': 'x'})
+    return LockStep(components, clock, policy, state, dispatch, 'agent.context'), log, calls, clock, policy
+
+
+def test_step_state_reads_the_observations():
+    state = StepState(DictState({'agent.id': 1}))
+    state.components['Broker'] = DictState(equity=10.0)
+
+    assert state.get_item('environment.components.Broker.equity') == 10.0
+    assert state.get_item('environment.components.Broker.margin') is None
+    assert state.get_item('environment.components.Broker') is state.components['Broker']
+    assert state.get_item('environment.components.SignalProvider.signal') is None
+    assert state.get_item('agent.id') == 1
+
+    state.set_item('agent.memory', 'x')
+    assert state.get_item('agent.memory') == 'x' and state.slice_by_prefix('agent.') == {'agent.id': 1, 'agent.memory': 'x'}
+    state.remove_item('agent.memory')
+    assert state.get_item('agent.memory') is None
+
+
+def test_every_step_observes_then_acts_then_ticks_in_order():
+    lockstep, log, calls, _, policy = make_lockstep(steps=2)
+    result = aio.run(lockstep.run())
+
+    ticks = [('tick', 'DataProvider'), ('tick', 'Broker'), ('tick', 'SignalProvider')]
+    observe = [('observe', 'DataProvider'), ('observe', 'Broker'), ('observe', 'SignalProvider'), ('action', None)]
+    # the first step is acted on before time moves, the other components catch up with it first
+    assert log == ticks[1:] + observe + [('act', 'open')] + ticks + observe + [('act', 'hold')] + ticks
+    assert result['steps'] == 2 and result['actions'] == {'open': 1, 'hold': 1}
+    # the policy reads the observations of the step and the actions get the agent context
+    assert policy.states[0].get_item('environment.components.Broker.context') == {'agent.context.id': 1}
+    assert calls == [('open', {'caller_context': {'agent.context.id': 1}}), ('hold', {'caller_context': {'agent.context.id': 1}})]
+
+
+def test_actions_are_dispatched_by_identity():
+    lockstep, _, _, _, policy = make_lockstep(steps=2)
+    opened = []
+
+    async def open_position(**kwargs):
+        opened.append(kwargs)
+
+    # the hold action equals the open one but is not the one registered
+    lockstep._dispatch = {id(policy.actions['open']): ('open', open_position)}
+    assert aio.run(lockstep.step()) == 'open' and len(opened) == 1
+    with pytest.raises(AssertionError):
+        aio.run(lockstep.step())
+
+
+def test_run_resets_the_replay_it_is_given():
+    lockstep, _, _, clock, _ = make_lockstep(steps=0)
+    result = aio.run(lockstep.run('2024-01-02T00:00:00.0', '2024-01-03T00:00:00.0', 'M1'))
+    assert clock.resets == [('2024-01-02T00:00:00.0', '2024-01-03T00:00:00.0', 'M1')]
+    assert result['steps'] == 0
+    with pytest.raises(AssertionError):
+        aio.run(lockstep.run('2024-01-02T00:00:00.0'))
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from frankenstein.lib.trading.market_data import MarketDataService
+from frankenstein.lib.trading.tick_store import TickStore
+from frankenstein.lib.trading.utils import load_mt5_ticks_csv
+from tests.test_archive import MT5_TICKS
+
+
+def test_views_share_one_load(tmp_path):
+    filename = tmp_path / 'EURUSD.csv'
+    filename.write_text(MT5_TICKS)
+    service = MarketDataService(tmp_path / 'cache')
+
+    first = service.store(filename)
+    second = service.store(filename)
+    expected = TickStore.from_dataframe(load_mt5_ticks_csv(str(filename)))
+
+    assert first is not second
+    np.testing.assert_array_equal(first.timestamps, expected.timestamps)
+    np.testing.assert_array_equal(first.bid, expected.bid)
+    for column in ('timestamps', 'ask', 'bid', 'volume'):
+        assert np.shares_memory(getattr(first, column), getattr(second, column))
+    with pytest.raises(ValueError):
+        first.bid[0] = 0.0
+    assert len(list((tmp_path / 'cache').iterdir())) == 1
+
+    # another service, another process in practice, maps the archive the first one converted
+    other = MarketDataService(tmp_path / 'cache').store(filename)
+    np.testing.assert_array_equal(other.bid, expected.bid)
+    assert len(list((tmp_path / 'cache').iterdir())) == 1
+
+
+def test_window_and_append_keep_shared_columns(tmp_path):
+    filename = tmp_path / 'EURUSD.csv'
+    filename.write_text(MT5_TICKS)
+    service = MarketDataService(tmp_path / 'cache')
+
+    shared = service.store(filename)
+    window = service.store(filename, window=(int(shared.timestamps[1]), int(shared.timestamps[-1])))
+    assert len(window) == 2 and np.shares_memory(window.bid, shared.bid)
+
+    window.append(np.array([shared.timestamps[-1] + 1]), np.array([1.2]), np.array([1.1]), np.array([0.0]))
+    assert len(window) == 3 and len(service.store(filename)) == 3
+    np.testing.assert_array_equal(service.store(filename).bid, shared.bid)
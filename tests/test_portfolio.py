@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from frankenstein.lib.trading.portfolio import PositionBook, conversion_candidates
+
+
+def test_mark_to_market_many_symbols():
+    book = PositionBook(capacity=2)
+    rng = np.random.default_rng(0)
+    symbols = [f'PAIR{i}' for i in range(40)]
+    prices = 1 + rng.random(len(symbols))
+    for i, (symbol, price) in enumerate(zip(symbols, prices)):
+        book.open(symbol, i % 2 == 0, price, 0.1 * (i + 1), 300, 100, 0.0, i, None, '', 1e-5, 100000)
+    book.close('PAIR3')
+
+    slots = book.open_slots()
+    assert len(slots) == 39 and 3 not in slots
+    bid = prices[slots] + rng.normal(0, 1e-3, len(slots))
+    ask = bid + 2e-5
+    pl = book.mark_to_market(slots, ask, bid)
+
+    for i, (slot, value) in enumerate(zip(slots, pl)):
+        position = book.position(slot)
+        expected = round(bid[i], 5) - position['price'] if position['is_long'] else position['price'] - round(ask[i], 5)
+        assert value == expected / 1e-5 == position['pl']
+
+    profits = book.profits(slots)
+    np.testing.assert_array_equal(profits, [book.position(slot)['volume'] * book.position(slot)['pl'] * 1e-5 * 100000 for slot in slots])
+    assert np.array_equal(book.limits_reached(slots), (pl > 300) | (pl < -100))
+    assert book.margin(slots, ask, bid, 30) == pytest.approx(
+        sum(book.position(slot)['volume'] * 100000 * (a + b) / 2 for slot, a, b in zip(slots, ask, bid)) / 30)
+    assert set(book.positions()) == set(symbols) - {'PAIR3'}
+
+
+def test_reopen_reuses_slot():
+    book = PositionBook()
+    slot = book.open('EURUSD', True, 1.1, 0.1, 300, 100, 0.0, 0, None, 'a')
+    book.close('EURUSD')
+    assert not book.is_symbol_open('EURUSD') and book.positions() == {}
+    assert book.open('EURUSD', False, 1.2, 0.2, 300, 100, 0.0, 1, None, 'b') == slot
+    assert book.positions()['EURUSD']['trade'] == 1 and not book.positions()['EURUSD']['is_long']
+
+
+def test_amounts_are_converted_per_symbol():
+    book = PositionBook()
+    book.open('EURUSD', True, 1.1, 0.1, 300, 100, 0.0, 0, None, '', 1e-5, 100000)
+    book.open('USDJPY', True, 150.0, 0.1, 300, 100, 0.0, 1, None, '', 1e-3, 100000, 1 / 150.0)
+    slots = book.open_slots()
+    ask, bid = np.array([1.10002, 150.302]), np.array([1.1, 150.298])
+    pl = book.mark_to_market(slots, ask, bid, np.array([1.0, 1 / 150.3]))
+
+    assert pl == pytest.approx([0.0, 298.0])
+    # 298 points of 0.001 yen on 10 000 units, in dollars at the new rate
+    assert book.profits(slots) == pytest.approx([0.0, 0.1 * 298 * 1e-3 * 100000 / 150.3])
+    # 0.1 lot of USDJPY holds 10 000 dollars of notional whatever its yen price
+    assert book.margin(slots, ask, bid, 30) == pytest.approx((0.1 * 100000 * 1.10001 + 0.1 * 100000) / 30)
+
+
+def test_conversion_candidates():
+    assert conversion_candidates('EURUSD', 'USD') == []
+    assert conversion_candidates('USDJPY', 'USD') == [('USDJPY', True)]
+    assert conversion_candidates('EURGBP', 'USD') == [('GBPUSD', False), ('USDGBP', True)]
+    assert conversion_candidates('EURJPY', 'usd') == [('JPYUSD', False), ('USDJPY', True)]
@@ -0,0 +1,91 @@
+from datetime import UTC, datetime, timedelta
+
+import numpy as np
+import pytest
+
+from frankenstein.lib.trading.tick_store import to_ns
+from frankenstein.lib.trading.utils import replay_schedule, steps_with_ticks, weekday_ns
+
+
+def stepped_schedule(start, end, freq):
+    """The steps DataProvider used to walk one datetime at a time"""
+    time, timestamps = start, []
+    while time is not None:
+        timestamps.append(to_ns(time))
+        time = None if time > end else (time + timedelta(days=1) if time.weekday() in (5, 6) else time + freq)
+    return np.array(timestamps, dtype=np.int64)
+
+
+@pytest.mark.parametrize('freq', [timedelta(minutes=1), timedelta(minutes=7), timedelta(hours=4), timedelta(days=1), timedelta(days=3)])
+def test_matches_stepping(freq):
+    rng = np.random.default_rng(0)
+    for _ in range(40):
+        start = datetime(2024, 1, 1, tzinfo=UTC) + timedelta(minutes=int(rng.integers(0, 60 * 24 * 21)), seconds=int(rng.integers(0, 60)))
+        end = start + timedelta(minutes=int(rng.integers(-10, 60 * 24 * 30)))
+        np.testing.assert_array_equal(replay_schedule(start, end, freq), stepped_schedule(start, end, freq))
+
+
+def test_tick_frequency_steps_on_ticks():
+    ticks = np.array([5, 10, 10, 20, 35, 50], dtype=np.int64) * 10**9
+    start, end = (datetime.fromtimestamp(s, UTC) for s in (10, 35))
+    np.testing.assert_array_equal(replay_schedule(start, end, timedelta(0), ticks), ticks[1:5])
+    with pytest.raises(ValueError):
+        replay_schedule(start, end, timedelta(0))
+
+
+def gappy_ticks():
+    """Ticks every 10 seconds on Friday 20:00-22:00 and Monday 00:00-02:00, with a 30 minute hole on Monday at 01:00"""
+    friday = datetime(2024, 1, 5, 20, tzinfo=UTC)
+    monday = datetime(2024, 1, 8, tzinfo=UTC)
+    seconds = np.arange(0, 7200, 10)
+    ticks = np.concatenate([to_ns(friday) + seconds * 10**9, to_ns(monday) + seconds[(seconds < 3600) | (seconds >= 5400)] * 10**9])
+    return ticks.astype(np.int64), friday, monday
+
+
+def test_steps_without_ticks_are_dropped():
+    ticks, friday, monday = gappy_ticks()
+    schedule = replay_schedule(friday, monday + timedelta(hours=3), timedelta(minutes=1))
+    steps = schedule[steps_with_ticks(schedule, ticks)]
+    # two hours of minutes on friday, one and a half on monday, and the minute closing each of the three runs of ticks
+    assert len(steps) == 120 + 1 + 90 + 1 + 1
+    assert not np.any(weekday_ns(steps) >= 5)
+    assert np.all(np.diff(np.searchsorted(ticks, steps, side='right')) > 0)
+
+
+def test_data_provider_replays_only_the_steps_with_ticks():
+    pytest.importorskip('agentopy')
+    from frankenstein.components.environment.trading.data_provider import DataProvider
+    from frankenstein.lib.trading.tick_store import TickStore
+
+    ticks, friday, monday = gappy_ticks()
+    data_provider = DataProvider()
+    data_provider.load_ticks_store(TickStore(ticks, np.ones(len(ticks)), np.ones(len(ticks)), np.ones(len(ticks))), 'EURUSD')
+    data_provider.reset('2024-01-05T00:00:00.0', '2024-01-08T12:00:00.0', 'M1')
+    assert len(data_provider.replay_timestamps()) == 120 + 1 + 90 + 1 + 1
+    data_provider.reset('2024-01-05T00:00:00.0', '2024-01-08T12:00:00.0', 'H1')
+    np.testing.assert_array_equal(data_provider.replay_timestamps(), [to_ns(friday + timedelta(hours=h)) for h in (0, 1, 2)] +
+                                  [to_ns(monday + timedelta(hours=h)) for h in (0, 1, 2)])
+
+
+def test_data_provider_quotes_match_the_prices():
+    pytest.importorskip('agentopy')
+    from frankenstein.components.environment.trading.data_provider import DataProvider
+    from frankenstein.lib.trading.tick_store import TickStore
+
+    rng = np.random.default_rng(2)
+    data_provider = DataProvider()
+    for symbol, offset in (('EURUSD', 0), ('USDJPY', 90)):
+        timestamps = to_ns(datetime(2024, 1, 2, tzinfo=UTC)) + np.sort(rng.integers(offset, 3600, 500)) * 10**9
+        bid = 1 + rng.random(500)
+        data_provider.load_ticks_store(TickStore(timestamps, bid + 1e-4, bid, np.ones(500)), symbol)
+    data_provider.reset('2024-01-02T00:00:00.0', '2024-01-02T01:00:00.0', 'M1')
+
+    symbols = ['USDJPY', 'EURUSD']
+    for _ in range(5):
+        # at the current step, before the USDJPY ticks start, and at a time between steps
+        for timestamp in (None, data_provider.get_time(), data_provider.get_time() + timedelta(seconds=30)):
+            ask, bid = data_provider.quotes(symbols, timestamp)
+            assert ask.tolist() == [data_provider.price(symbol, 'ask', timestamp) for symbol in symbols]
+            assert bid.tolist() == [data_provider.price(symbol, 'bid', timestamp) for symbol in symbols]
+        data_provider.step()
+    assert ask[0] > 0 and data_provider.quotes(symbols)[0][0] > 0
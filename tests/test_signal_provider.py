@@ -0,0 +1,112 @@
+import asyncio as aio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('agentopy')
+
+from frankenstein.components.environment.trading.data_provider import DataProvider
+from frankenstein.components.environment.trading.signal_provider import SignalProvider
+from frankenstein.lib.trading.tick_store import TickStore
+
+
+def make_data_provider(seed: int = 0) -> DataProvider:
+    rng = np.random.default_rng(seed)
+    n = 2 * 24 * 3600
+    timestamps = pd.Timestamp('2024-01-02', tz='UTC').value + np.arange(n, dtype=np.int64) * 10**9
+    bid = 1.1 + np.cumsum(rng.normal(0, 5e-5, n))
+    data_provider = DataProvider()
+    data_provider.load_ticks_store(TickStore(timestamps, bid + 1e-4, bid, np.ones(n)), 'EURUSD')
+    return data_provider
+
+
+async def replay(data_provider, signal_provider, steps):
+    for _ in range(steps):
+        data_provider.step()
+        await signal_provider.tick()
+        yield signal_provider
+
+
+def test_signal_reuses_the_values_of_the_tick():
+    data_provider = make_data_provider()
+    data_provider.reset('2024-01-02T06:00:00.0', '2024-01-03T00:00:00.0', 'M1')
+    signal_provider = SignalProvider(data_provider, 'EURUSD')
+
+    lookups = []
+    values = signal_provider._values
+    signal_provider._values = lambda timestamp: lookups.append(timestamp) or values(timestamp)
+
+    async def run():
+        signals = 0
+        async for _ in replay(data_provider, signal_provider, 600):
+            ticked = len(lookups)
+            first = signal_provider.signal()
+            assert signal_provider.signal() is first
+            assert len(lookups) == ticked
+            signals += first.direction != 0
+        return signals
+
+    assert aio.run(run()) > 0
+
+
+def test_series_is_dropped_when_the_replay_is_reset():
+    data_provider = make_data_provider()
+    data_provider.reset('2024-01-02T06:00:00.0', '2024-01-02T12:00:00.0', 'M1')
+    signal_provider = SignalProvider(data_provider, 'EURUSD')
+    aio.run(signal_provider.precompute(caller_context=None))
+    assert signal_provider._series is not None
+
+    data_provider.reset('2024-01-02T12:00:00.0', '2024-01-02T18:00:00.0', 'M5')
+    reference = SignalProvider(make_data_provider(), 'EURUSD')
+    reference._data_provider.reset('2024-01-02T12:00:00.0', '2024-01-02T18:00:00.0', 'M5')
+
+    async def run():
+        directions = []
+        async for provider in replay(data_provider, signal_provider, 50):
+            reference._data_provider.step()
+            await reference.tick()
+            directions.append((provider._last_direction, reference._last_direction))
+        return directions
+
+    directions = aio.run(run())
+    assert signal_provider._series is None
+    assert all(a == b for a, b in directions)
+
+
+PARAMS = dict(bands_enabled=True, bands_timeframe='M10', bands_window=7, bands_dev=2, rsi_enabled=True, rsi_timeframe='M10',
+              rsi_period=13, stochastic_enabled=True, stochastic_timeframe='M10', stochastic_smooth=3, stochastic_period=14)
+
+
+def test_tick_timeframe_is_rejected():
+    signal_provider = SignalProvider(make_data_provider(), 'EURUSD')
+    result = aio.run(signal_provider.setup(**{**PARAMS, 'rsi_timeframe': 'Tick'}, caller_context=None))
+    assert not result.success and 'rsi' in result.value
+    with pytest.raises(AssertionError):
+        signal_provider._prepare(**{**PARAMS, 'bands_timeframe': 'Tick'})
+
+
+def test_live_warm_up_drops_the_forming_bar():
+    store = make_data_provider()._data['EURUSD']['store']
+    split = int(np.searchsorted(store.timestamps, pd.Timestamp('2024-01-02 10:05:30', tz='UTC').value))
+    stop = int(np.searchsorted(store.timestamps, pd.Timestamp('2024-01-02 10:30:00', tz='UTC').value, side='right'))
+
+    async def run():
+        data_provider = DataProvider()
+        await data_provider.live(is_live=True, caller_context=None)
+        await data_provider.push_ticks('EURUSD', *(column[:split] for column in (store.timestamps, store.ask, store.bid, store.volume)))
+        # prepared while the 10:00 bar is still forming
+        signal_provider = SignalProvider(data_provider, 'EURUSD')
+        await signal_provider.tick()
+        await data_provider.push_ticks('EURUSD', *(column[split:stop] for column in (store.timestamps, store.ask, store.bid, store.volume)))
+        return data_provider, signal_provider
+
+    data_provider, signal_provider = aio.run(run())
+    # indicators computed in one pass over the same, now complete, bars
+    reference = SignalProvider(data_provider, 'EURUSD')
+    timestamp = pd.Timestamp('2024-01-02 10:30:00', tz='UTC').to_pydatetime()
+    for column in ('hband', 'lband', 'mband', 'rsi', 'stoch'):
+        np.testing.assert_allclose(signal_provider.indicator(column, timestamp), reference.indicator(column, timestamp), rtol=1e-9)
+    for minutes in (10, 20):
+        timestamp = pd.Timestamp('2024-01-02 10:00:00', tz='UTC').to_pydatetime() + pd.Timedelta(minutes=minutes)
+        np.testing.assert_allclose(signal_provider.indicator('mband', timestamp), reference.indicator('mband', timestamp), rtol=1e-12)
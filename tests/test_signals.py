@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from frankenstein.lib.trading.indicators import IndicatorTable
+from frankenstein.lib.trading.signals import SignalSeries, compute_directions, signal_direction
+
+MINUTE = 60 * 10**9
+
+
+@pytest.mark.parametrize('enabled', [(True, True, True), (True, False, False), (False, True, True), (False, False, False)])
+def test_vectorized_matches_scalar(enabled):
+    rng = np.random.default_rng(0)
+    params = dict(zip(['bands_enabled', 'rsi_enabled', 'stochastic_enabled'], enabled))
+    bars = np.arange(200) * 10 * MINUTE
+    mband = 1.1 + rng.normal(0, 1e-3, 200)
+    mband[:3] = np.nan
+    indicators = {
+        'bands': IndicatorTable(bars, 'M10', {'hband': mband + 1e-3, 'lband': mband - 1e-3, 'mband': mband}),
+        'rsi': IndicatorTable(bars, 'M10', {'rsi': rng.uniform(0, 100, 200)}),
+        'stochastic': IndicatorTable(bars, 'M10', {'stoch': rng.uniform(0, 100, 200)}),
+    }
+    timestamps = np.arange(0, 200 * 10 * MINUTE, MINUTE)
+    bid = 1.1 + rng.normal(0, 2e-3, len(timestamps))
+
+    directions = compute_directions(params, indicators, timestamps, bid)
+
+    for step in range(len(timestamps)):
+        values = {'bid': bid[step], 'hband': 0, 'lband': 0, 'mband': 0, 'rsi': 0, 'stochastic': 0}
+        missing = False
+        for name, columns in (('bands', ('hband', 'lband', 'mband')), ('rsi', ('rsi',)), ('stochastic', ('stoch',))):
+            if not params[f'{name}_enabled']:
+                continue
+            position = indicators[name].position(int(timestamps[step]))
+            missing |= position < 0
+            for column in columns:
+                values['stochastic' if column == 'stoch' else column] = indicators[name].value(column, position)
+        expected = None if missing else signal_direction(params, **values)
+        if expected is None or np.isnan(expected):
+            assert np.isnan(directions[step])
+        else:
+            assert directions[step] == pytest.approx(expected)
+
+
+def test_series_lookup_and_roundtrip(tmp_path):
+    series = SignalSeries(np.array([10, 20, 30, 40]), np.array([1.0, np.nan, 3.0, 4.0]))
+
+    assert [series.index(t) for t in (10, 20, 30, 40)] == [0, 1, 2, 3]
+    assert series.index(25) == -1
+    assert series.index(10) == 0
+
+    series.save(tmp_path / 'series.npz')
+    loaded = SignalSeries.load(tmp_path / 'series.npz')
+    np.testing.assert_array_equal(loaded.timestamps, series.timestamps)
+    np.testing.assert_array_equal(loaded.directions, series.directions)
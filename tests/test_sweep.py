@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+from frankenstein.lib.trading.archive import write_archive
+from frankenstein.lib.trading.sweep import SweepEvaluator, max_drawdown, param_grid, param_samples, run_sweep
+from frankenstein.lib.trading.tick_store import TickStore
+
+MINUTE = 60 * 10**9
+
+
+def make_store(n=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    timestamps = np.cumsum(rng.integers(1, 4, n)).astype(np.int64) * 10**9
+    bid = 1.1 + np.cumsum(rng.normal(0, 5e-5, n))
+    return TickStore(timestamps, bid + 2e-5, bid, np.ones(n))
+
+
+def test_param_helpers():
+    grid = param_grid(tp=[100, 200], rsi_period=[7, 13, 21])
+    assert len(grid) == 6 and {'tp': 200, 'rsi_period': 21} in grid
+
+    samples = param_samples(50, seed=0, tp=(100, 300), lot_size=(0.1, 1.0), bands_timeframe=['M1', 'M5'])
+    assert len(samples) == 50
+    assert all(isinstance(s['tp'], int) and 100 <= s['tp'] <= 300 for s in samples)
+    assert all(0.1 <= s['lot_size'] <= 1.0 and s['bands_timeframe'] in ('M1', 'M5') for s in samples)
+    # ranges read from yaml are mappings
+    assert param_samples(50, seed=0, tp={'low': 100, 'high': 300}) == param_samples(50, seed=0, tp=(100, 300))
+
+    assert max_drawdown(np.array([10, 12, 9, 11, 8, 13])) == 4
+
+
+def test_pool_matches_in_process(tmp_path):
+    store = make_store()
+    write_archive(tmp_path / 'archive', store)
+    timestamps = np.arange(store.timestamps[0], store.timestamps[-1], MINUTE)
+    account = {'point': 1e-5}
+    param_sets = param_grid(bands_timeframe=['M1', 'M5'], rsi_period=[7, 13], tp=[50, 300], sl=[50, 100])
+
+    results = run_sweep(tmp_path / 'archive', timestamps, param_sets, account=account, max_workers=2)
+
+    evaluator = SweepEvaluator(store, account)
+    expected = pd.DataFrame([evaluator.evaluate(params, timestamps) for params in param_sets])
+    assert len(results) == len(param_sets)
+    assert results['trade_count'].sum() > 0
+    pd.testing.assert_frame_equal(results[expected.columns], expected, check_dtype=False)
+
+
+def test_opens_need_margin_by_default():
+    store = make_store()
+    timestamps = np.arange(store.timestamps[0], store.timestamps[-1], MINUTE)
+    account = {'point': 1e-5, 'balance': 1e-3}
+
+    # the account the Broker starts with, leverage included, refuses the opens the balance does not cover
+    assert SweepEvaluator(store, account).evaluate({}, timestamps)['trade_count'] == 0
+    assert SweepEvaluator(store, {**account, 'leverage': 0}).evaluate({}, timestamps)['trade_count'] > 0
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta, timezone, UTC
+import numpy as np
+import pandas as pd
+
+from frankenstein.lib.trading.tick_store import TickStore, to_ns, to_utc
+
+
+def _ticks() -> pd.DataFrame:
+    index = pd.to_datetime(['2024-01-02 00:00:00', '2024-01-02 00:00:01', '2024-01-02 00:00:05'], utc=True)
+    return pd.DataFrame({
+        'timestamp': index,
+        'ask': [1.2, 1.3, 1.4],
+        'bid': [1.1, 1.2, 1.3],
+        'volume': [1, 2, 3],
+    }, index=index)
+
+
+def test_price_lookup():
+    store = TickStore.from_dataframe(_ticks())
+
+    assert store.timestamps.dtype == np.int64
+    assert store.price('ask', to_ns(datetime(2024, 1, 2, 0, 0, 1, tzinfo=UTC))) == 1.3
+    assert store.price('bid', to_ns(datetime(2024, 1, 2, 0, 0, 3, tzinfo=UTC))) == 1.2
+    assert store.price('bid', to_ns(datetime(2024, 1, 1, tzinfo=UTC))) == -1
+
+
+def test_ticks_slice():
+    store = TickStore.from_dataframe(_ticks())
+
+    start, stop = store.bounds(to_ns(datetime(2024, 1, 2, 0, 0, 1, tzinfo=UTC)), None)
+    df = store.to_dataframe(start, stop)
+    assert len(df) == 2
+    assert df.bid.tolist() == [1.1, 1.2]
+
+    start, stop = store.bounds(None, 1)
+    df = store.to_dataframe(start, stop)
+    assert df.index[0] == pd.Timestamp('2024-01-02 00:00:05', tz='UTC')
+    assert df.timestamp.iloc[0] == df.index[0]
+
+
+def test_append_grows_the_columns():
+    full = TickStore.from_dataframe(_ticks())
+    store = TickStore(full.timestamps[:1], full.ask[:1], full.bid[:1], full.volume[:1])
+
+    store.append(full.timestamps[1:2], full.ask[1:2], full.bid[1:2], full.volume[1:2])
+    buffer = store._buffers['timestamps']
+    store.append(full.timestamps[2:], full.ask[2:], full.bid[2:], full.volume[2:])
+
+    # the second append fits in the buffer of the first
+    assert store._buffers['timestamps'] is buffer
+    np.testing.assert_array_equal(store.timestamps, full.timestamps)
+    np.testing.assert_array_equal(store.bid, full.bid)
+    assert store.price('ask', to_ns(datetime(2024, 1, 2, 0, 0, 5, tzinfo=UTC))) == 1.4
+    assert len(full) == 3
+
+
+def test_to_utc_keeps_the_instant_of_aware_timestamps():
+    expected = datetime(2024, 1, 2, 8, tzinfo=UTC)
+    assert to_utc('2024-01-02T10:00:00+02:00') == expected and to_utc('2024-01-02T10:00:00+02:00').tzinfo is UTC
+    assert to_utc(datetime(2024, 1, 2, 10, tzinfo=timezone(timedelta(hours=2)))) == expected
+    # naive timestamps, as yaml loads the ones without an offset, are UTC
+    assert to_utc('2024-01-02 08:00:00') == expected and to_utc(datetime(2024, 1, 2, 8)) == expected
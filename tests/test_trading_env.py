@@ -0,0 +1,73 @@
+import numpy as np
+
+from frankenstein.components.environment.trading.ml.environement import TradingEnv
+from tests.replays import ArrayReplay
+
+
+def test_env_window_is_a_view_with_extra_features():
+    bids = 1.1 + np.arange(20) * 1e-4
+    n = 4
+    env = TradingEnv(ArrayReplay(bids), '', '', 'M1', n, features=[lambda timestep: timestep.minute * 10.0])
+    assert env.observation_space.shape == (n, 4)
+
+    observation, _ = env.reset()
+    assert observation.shape == (n, 4)
+    np.testing.assert_array_equal(observation[:, 3], np.float16([20, 30, 40, 50]))
+    for step in range(6, 12):
+        observation, _, done, _, _ = env.step(3)
+        assert not done
+        assert np.shares_memory(observation, env._window)
+        np.testing.assert_array_equal(observation[:, 3], np.float16(np.arange(step - n + 1, step + 1) * 10))
+        np.testing.assert_array_equal(observation[:, 0], np.float16(np.full(n, 1e-4 * 10000)))
+
+
+def test_env_fixed_length_episodes_from_random_starts():
+    rng = np.random.default_rng(2)
+    bids = 1.1 + np.cumsum(rng.normal(0, 1e-4, 200))
+    n, length = 5, 10
+    replay = ArrayReplay(bids)
+    env = TradingEnv(replay, '', '', 'M1', n, episode_length=length, start_mode='random')
+
+    starts = set()
+    for seed in range(5):
+        observation, _ = env.reset(seed=seed)
+        start = replay._step
+        assert n + 1 <= start <= len(bids) - 1 - length
+        starts.add(start)
+        np.testing.assert_array_equal(observation[:, 0], np.float16(np.diff(bids[start - n:start + 1] * 10000)))
+        for i in range(length):
+            observation, _, done, truncated, _ = env.step(3)
+            assert not done and truncated == (i == length - 1)
+        assert replay._step == start + length
+    assert len(starts) > 1
+    # the replay is built once, every later episode seeks to its start
+    assert replay.resets == 1
+
+
+def test_env_stratified_starts_visit_every_stratum():
+    bids = 1.1 + np.arange(400) * 1e-5
+    n, length, strata = 6, 20, 4
+    replay = ArrayReplay(bids)
+    env = TradingEnv(replay, '', '', 'M1', n, episode_length=length, start_mode='stratified', strata=strata)
+
+    env.reset(seed=3)
+    bounds = np.linspace(n + 1, len(bids) - length, strata + 1)
+    visited = [int(np.searchsorted(bounds, replay._step, side='right')) - 1]
+    for _ in range(strata - 1):
+        env.reset()
+        visited.append(int(np.searchsorted(bounds, replay._step, side='right')) - 1)
+    assert sorted(visited) == list(range(strata))
+
+
+def test_env_episodes_after_the_first_match_a_fresh_replay():
+    bids = 1.1 + np.cumsum(np.random.default_rng(4).normal(0, 1e-4, 60))
+    replay = ArrayReplay(bids)
+    env = TradingEnv(replay, '', '', 'M1', 5)
+    env.reset()
+    while not env.step(0)[2]:
+        pass
+
+    observation, _ = env.reset()
+    expected, _ = TradingEnv(ArrayReplay(bids), '', '', 'M1', 5).reset()
+    np.testing.assert_array_equal(observation, expected)
+    assert replay.resets == 1 and replay._step == 6
@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+
+from frankenstein.components.environment.trading.ml.environement import TradingEnv
+from frankenstein.components.environment.trading.ml.vec_env import TradingVecEnv
+from tests.replays import ArrayReplay
+
+
+def test_matches_single_env_episode():
+    rng = np.random.default_rng(0)
+    bids = 1.1 + np.cumsum(rng.normal(0, 1e-4, 300))
+    n = 6
+    env = TradingEnv(ArrayReplay(bids), '', '', 'M1', n)
+    vec_env = TradingVecEnv(bids, num_envs=3, n_rolling_observations=n, start_mode='start')
+
+    observation, _ = env.reset()
+    observations = vec_env.reset()
+    for i in range(3):
+        np.testing.assert_array_equal(observations[i], observation)
+
+    for _ in range(len(bids)):
+        action = int(rng.integers(0, 4))
+        observation, reward, done, _, _ = env.step(action)
+        observations, rewards, dones, infos = vec_env.step(np.array([action, action, 3]))
+        assert dones[0] == done and dones[1] == done
+        assert rewards[0] == np.float32(reward)
+        if done:
+            np.testing.assert_array_equal(infos[0]['terminal_observation'], observation)
+            np.testing.assert_array_equal(observations[0], vec_env.reset()[0])
+            break
+        np.testing.assert_array_equal(observations[0], observation)
+        np.testing.assert_array_equal(observations[1], observation)
+        assert vec_env.get_stats(0)['equity'] == env.get_stats()['equity']
+    assert done
+
+
+def test_envs_start_apart_from_their_seeds():
+    rng = np.random.default_rng(3)
+    bids = 1.1 + np.cumsum(rng.normal(0, 1e-4, 500))
+    n = 6
+    vec_env = TradingVecEnv(bids, num_envs=4, n_rolling_observations=n)
+
+    assert vec_env.seed(7) == [7, 8, 9, 10]
+    observations = vec_env.reset()
+    starts = vec_env._cursor.copy()
+    assert len(set(starts)) == 4 and np.all((starts >= n + 1) & (starts <= len(bids) - 1))
+    for env, start in enumerate(starts):
+        np.testing.assert_array_equal(observations[env, :, 0], np.float16(np.diff(bids[start - n:start + 1] * 10000)))
+
+    vec_env.seed(7)
+    vec_env.reset()
+    np.testing.assert_array_equal(vec_env._cursor, starts)
+    vec_env.reset()
+    assert not np.array_equal(vec_env._cursor, starts)
+
+    vec_env.set_options([{'start': 100}, {}, {'start': 200}, {}])
+    vec_env.reset()
+    assert vec_env._cursor[0] == 100 and vec_env._cursor[2] == 200
+    vec_env.reset()
+    assert vec_env._cursor[0] != 100 or vec_env._cursor[2] != 200
+
+
+def test_attributes_are_set_for_all_the_envs():
+    vec_env = TradingVecEnv(1.1 + np.arange(20) * 1e-4, num_envs=2, n_rolling_observations=4)
+    vec_env.set_attr('symbol', 'GBPUSD')
+    assert vec_env.get_attr('symbol', indices=1) == ['GBPUSD']
+    with pytest.raises(AssertionError):
+        vec_env.set_attr('symbol', 'EURUSD', indices=[0])
+
+
+def test_learns_with_sb3():
+    from stable_baselines3.ppo.ppo import PPO
+
+    rng = np.random.default_rng(1)
+    vec_env = TradingVecEnv(1.1 + np.cumsum(rng.normal(0, 1e-4, 200)), num_envs=4)
+    model = PPO("MlpPolicy", vec_env, n_steps=32, batch_size=32, n_epochs=1, seed=0)
+    model.learn(total_timesteps=256)
+    assert len(vec_env.env_method('get_stats')) == 4
+
+
+def test_fixed_length_episodes_match_the_single_env():
+    rng = np.random.default_rng(2)
+    bids = 1.1 + np.cumsum(rng.normal(0, 1e-4, 200))
+    n, length = 5, 10
+    vec_env = TradingVecEnv(bids, num_envs=3, n_rolling_observations=n, episode_length=length)
+    vec_env.seed(4)
+    observations = vec_env.reset()
+    starts = vec_env._cursor.copy()
+    assert np.all((starts >= n + 1) & (starts <= len(bids) - 1 - length))
+
+    replay = ArrayReplay(bids)
+    env = TradingEnv(replay, '', '', 'M1', n)
+    env.reset()
+    replay.seek(replay._timestamps[starts[1]])
+    env._warm_up(int(starts[1]))
+    np.testing.assert_array_equal(observations[1], env._observation())
+    for i in range(length):
+        action = int(rng.integers(0, 4))
+        observation, reward, _, _, _ = env.step(action)
+        observations, rewards, dones, infos = vec_env.step(np.full(3, action))
+        assert rewards[1] == np.float32(reward)
+        assert np.all(dones == (i == length - 1))
+        if i < length - 1:
+            np.testing.assert_array_equal(observations[1], observation)
+    np.testing.assert_array_equal(infos[1]['terminal_observation'], observation)
+    assert all(info['TimeLimit.truncated'] for info in infos)
+
+
+def test_stratified_starts_visit_every_stratum():
+    bids = 1.1 + np.arange(400) * 1e-5
+    n, length, strata = 6, 20, 4
+    vec_env = TradingVecEnv(bids, num_envs=2, n_rolling_observations=n, start_mode='stratified', episode_length=length, strata=strata)
+    bounds = np.linspace(n + 1, len(bids) - length, strata + 1)
+
+    vec_env.seed(3)
+    visited = []
+    for _ in range(strata):
+        vec_env.reset()
+        visited.append(np.searchsorted(bounds, vec_env._cursor, side='right') - 1)
+    for env in range(2):
+        assert sorted(stratum[env] for stratum in visited) == list(range(strata))
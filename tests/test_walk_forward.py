@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta, UTC
+import numpy as np
+
+from frankenstein.lib.trading.archive import write_archive
+from frankenstein.lib.trading.sweep import SweepEvaluator, param_grid
+from frankenstein.lib.trading.tick_store import TickStore, to_ns
+from frankenstein.lib.trading.utils import steps_with_ticks
+from frankenstein.lib.trading.walk_forward import run_walk_forward, walk_forward_windows, window_schedule
+
+
+def test_windows():
+    start = datetime(2024, 1, 1, tzinfo=UTC)
+    windows = walk_forward_windows(start, start + timedelta(days=10), timedelta(days=4), timedelta(days=2))
+    assert windows == [
+        (start, start + timedelta(days=4), start + timedelta(days=6)),
+        (start + timedelta(days=2), start + timedelta(days=6), start + timedelta(days=8)),
+        (start + timedelta(days=4), start + timedelta(days=8), start + timedelta(days=10)),
+    ]
+
+    schedule = window_schedule(start, start + timedelta(hours=1), 'M1')
+    assert len(schedule) == 60 and schedule[-1] < start.timestamp() * 10**9 + 3600 * 10**9
+
+
+def test_window_schedule_skips_the_steps_without_ticks():
+    # ticks every 30 seconds on friday 2024-01-05 and monday 2024-01-08, none from 10:00 to 11:00 on monday
+    friday, monday = datetime(2024, 1, 5, tzinfo=UTC), datetime(2024, 1, 8, tzinfo=UTC)
+    ticks = np.concatenate([int(day.timestamp()) * 10**9 + np.arange(0, 24 * 3600, 30) * 10**9 for day in (friday, monday)])
+    ticks = ticks[(ticks < to_ns(monday + timedelta(hours=10))) | (ticks >= to_ns(monday + timedelta(hours=11)))]
+
+    schedule = window_schedule(friday, monday + timedelta(hours=12), 'M1', ticks)
+    calendar = window_schedule(friday, monday + timedelta(hours=12), 'M1')
+    assert np.array_equal(schedule, calendar[steps_with_ticks(calendar, ticks)])
+    # friday, the saturday step holding the last ticks of friday, and monday up to 10:00 and from 11:00 on
+    assert len(schedule) == 24 * 60 + 1 + 10 * 60 + 1 + 60
+    assert not np.any((schedule > to_ns(monday + timedelta(hours=10))) & (schedule < to_ns(monday + timedelta(hours=11))))
+    assert np.array_equal(window_schedule(friday, monday, 'Tick', ticks), ticks[ticks < to_ns(monday)])
+
+
+def test_matches_in_process(tmp_path):
+    rng = np.random.default_rng(1)
+    n = 30000
+    start = datetime(2024, 1, 2, tzinfo=UTC)
+    timestamps = int(start.timestamp()) * 10**9 + np.cumsum(rng.integers(1, 4, n)).astype(np.int64) * 10**9
+    bid = 1.1 + np.cumsum(rng.normal(0, 5e-5, n))
+    store = TickStore(timestamps, bid + 2e-5, bid, np.ones(n))
+    write_archive(tmp_path / 'archive', store)
+
+    windows = walk_forward_windows(start + timedelta(hours=2), start + timedelta(hours=16), timedelta(hours=4), timedelta(hours=2))
+    param_sets = param_grid(rsi_period=[7, 13], tp=[50, 300], long_open_threshold=[30, 50])
+    account = {'point': 1e-5}
+
+    table = run_walk_forward(tmp_path / 'archive', windows, 'M1', param_sets, account=account, max_workers=2)
+
+    evaluator = SweepEvaluator(store, account)
+    assert len(table) == len(windows) == 5
+    for (_, row), (in_sample_start, in_sample_end, out_of_sample_end) in zip(table.iterrows(), windows):
+        in_sample = [evaluator.evaluate(params, window_schedule(in_sample_start, in_sample_end, 'M1', timestamps)) for params in param_sets]
+        best = max(range(len(param_sets)), key=lambda i: in_sample[i]['pl'])
+        expected = evaluator.evaluate(param_sets[best], window_schedule(in_sample_end, out_of_sample_end, 'M1', timestamps))
+        assert row['in_sample_pl'] == in_sample[best]['pl']
+        assert (row['rsi_period'], row['tp'], row['long_open_threshold']) == tuple(param_sets[best].values())
+        assert (row['pl'], row['trade_count'], row['max_drawdown']) == (expected['pl'], expected['trade_count'], expected['max_drawdown'])
@@ -6,8 +6,8 @@ from stable_baselines3.common.logger import configure
 from stable_baselines3.common.callbacks import BaseCallback
 from stable_baselines3.common.evaluation import evaluate_policy
 from frankenstein.components.environment.trading.ml.environement import TradingEnv
-from frankenstein.components.environment.trading.data_provider import DataProvider
-from frankenstein.lib.trading.utils import load_mt5_bars_csv, load_mt5_ticks_csv
+from frankenstein.components.environment.trading.ml.vec_env import TradingVecEnv
+from frankenstein.components.environment.trading.ml.evaluation import load_data_provider
 
 th.backends.cudnn.deterministic = True
 th.backends.cudnn.benchmark = False
@@ -15,30 +15,6 @@ th.backends.cudnn.benchmark = False
 th.manual_seed(0)
 np.random.seed(0)
 
-def get_data_provider(filename):
-    bars = True
-
-    if bars:
-        df = load_mt5_bars_csv(filename)
-    else:
-        df = load_mt5_ticks_csv(filename)
-
-    symbol = "EURUSD"
-
-    assert symbol is not None, "Symbol is not set"
-
-    try:
-        start, end = df['timestamp'].iloc[0], df['timestamp'].iloc[-1]
-    except:
-        start, end = df['timestamp'][0], df['timestamp'][-1]
-
-    start = start.replace(microsecond=0)
-    end = end.replace(microsecond=0)
-
-    data_provider = DataProvider()
-    data_provider.load_ticks_pd_dataframe(df, symbol)
-    return data_provider, start, end
-
 class TrainCallback(BaseCallback):
  
     def __init__(self, verbose=1):
@@ -61,14 +37,20 @@ env_params = [
     10, # n_rolling_observations
 ]
 
+n_envs = 8
+# every environment replays fixed length episodes from its own start, visiting the whole dataset in turn
+episode_length = 2048
+
 
-data_provider, start, end = get_data_provider("datasets/EURUSD_SB_M1_202001020000_202405292358.csv")
+data_provider, start, end = load_data_provider("datasets/EURUSD_SB_M1_202001020000_202405292358.csv")
 
-env = TradingEnv(
-    *([data_provider, datetime.strftime(start, "%Y-%m-%dT%H:%M:%S.0"), datetime.strftime(end, "%Y-%m-%dT%H:%M:%S.0")] + env_params)
+# the training episodes run side by side over the same precomputed prices
+env = TradingVecEnv.from_data_provider(
+    data_provider, "EURUSD", datetime.strftime(start, "%Y-%m-%dT%H:%M:%S.0"), datetime.strftime(end, "%Y-%m-%dT%H:%M:%S.0"),
+    env_params[0], n_envs, env_params[1], start_mode='stratified', episode_length=episode_length
 )
 
-eval_data_provider, eval_start, eval_end = get_data_provider("datasets/EURUSD_SB_M1_201901020000_201905300000.csv")
+eval_data_provider, eval_start, eval_end = load_data_provider("datasets/EURUSD_SB_M1_201901020000_201905300000.csv")
 eval_env = TradingEnv(
     *([eval_data_provider, datetime.strftime(eval_start, "%Y-%m-%dT%H:%M:%S.0"), datetime.strftime(eval_end, "%Y-%m-%dT%H:%M:%S.0")] + env_params)
 )